@@ -0,0 +1,225 @@
+from astropy.io import fits
+import numpy as np
+import netCDF4 as nc
+import os
+import sys
+
+# DAXSS spectra in the Level-1 file have the 1000 detector channels starting at index 6
+FIRST_CHANNEL_INDEX = 6
+NUM_CHANNELS = 1000
+TIME_ISO_LENGTH = 20
+
+
+class DaxssSpectra:
+    """
+            A set of DAXSS Level-1 spectra, read from the netCDF file with one slice per variable.
+            rate, stat_err and sys_err are (number of spectra x 1000 channels) arrays
+    """
+
+    def __init__(self, indices, time_iso, rate, stat_err, sys_err):
+        self.indices = indices
+        self.time_iso = time_iso
+        self.rate = rate
+        self.stat_err = stat_err
+        self.sys_err = sys_err
+
+    def timeTag(self, i):
+        """
+                Time of spectrum i as it is used in file names, e.g. 2022-03-15T23-20-41Z
+                :return: String
+        """
+        return self.time_iso[i].replace(':', '-')
+
+
+def decodeTimeISO(time_iso_data):
+    """
+            Converts TIME_ISO values (rows of single characters, or strings) to a list of strings
+            :return: List of Strings
+    """
+    time_iso_data = np.ma.filled(time_iso_data, b'')
+    if time_iso_data.ndim == 2:
+        return [b''.join(row[:TIME_ISO_LENGTH]).decode("utf-8") for row in time_iso_data]
+    return [(t.decode("utf-8") if isinstance(t, bytes) else str(t))[:TIME_ISO_LENGTH] for t in time_iso_data]
+
+
+def findSpectraInTimeRange(daxsslevel1, start_time_iso, end_time_iso):
+    """
+            Finds the spectra between two ISO times (inclusive), e.g. '2022-03-15T23:20:00Z'.
+            ISO times sort the same way as strings, so this only needs the TIME_ISO variable.
+            :return: Array of spectrum indices
+    """
+    time_iso = np.array(decodeTimeISO(daxsslevel1['TIME_ISO'][:]))
+    in_range = (time_iso >= start_time_iso[:TIME_ISO_LENGTH]) & (time_iso <= end_time_iso[:TIME_ISO_LENGTH])
+    return np.flatnonzero(in_range)
+
+
+def readSpectra(daxsslevel1, indices):
+    """
+            Reads the spectra at the given indices. Each variable is read once for all of the spectra
+            (a single slice if the indices are consecutive), instead of element by element.
+            :return: DaxssSpectra
+    """
+    indices = np.atleast_1d(np.asarray(indices, dtype=int))
+    unique_indices = np.unique(indices)
+    if len(unique_indices) > 0 and unique_indices[-1] - unique_indices[0] + 1 == len(unique_indices):
+        rows = slice(int(unique_indices[0]), int(unique_indices[-1]) + 1)
+    else:
+        rows = unique_indices
+    # position of each requested index in what was read
+    order = np.searchsorted(unique_indices, indices)
+    channels = slice(FIRST_CHANNEL_INDEX, FIRST_CHANNEL_INDEX + NUM_CHANNELS)
+
+    rate = daxsslevel1['SPECTRUM_CPS'][rows, channels][order]
+    precision = daxsslevel1['SPECTRUM_CPS_PRECISION'][rows, channels][order]
+    accuracy = daxsslevel1['SPECTRUM_CPS_ACCURACY'][rows, channels][order]
+    time_iso = decodeTimeISO(daxsslevel1['TIME_ISO'][rows])
+    time_iso = [time_iso[i] for i in order]
+
+    # Accuracy = Systematic Error, given to XSPEC as a fraction of the rate (0 where the rate is 0)
+    sys_err = np.ma.filled(np.ma.divide(accuracy, rate), 0).astype(np.float32)
+    # Precision = Statistical Error
+    return DaxssSpectra(indices, time_iso, np.ma.filled(rate, np.nan).astype(np.float32),
+                        np.ma.filled(precision, np.nan).astype(np.float32), sys_err)
+
+
+def createHeaders(content):
+    """
+            Primary and SPECTRUM extension headers for a DAXSS PHA file
+            :return: Primary Header, Data Header
+    """
+    hdr_dummy = fits.Header()
+    hdr_data = fits.Header()
+    hdr_dummy['MISSION'] = "InspireSat-1"
+    hdr_dummy['TELESCOP'] = "InspireSat-1"
+    hdr_dummy['INSTRUME'] = "DAXSS"
+    hdr_dummy['ORIGIN'] = "LASP"
+    hdr_dummy['CREATOR'] = "DAXSSPlotterUtility_v1"
+    hdr_dummy['CONTENT'] = content
+
+    #Data Header
+    hdr_data['MISSION'] = "InspireSat-1"
+    hdr_data['TELESCOP'] = "InspireSat-1"
+    hdr_data['INSTRUME'] = "DAXSS"
+    hdr_data['ORIGIN'] = "LASP"
+    hdr_data['CREATOR'] = "DAXSSPlotterUtility_v1"
+    hdr_data['CONTENT'] = "SPECTRUM"
+    hdr_data['HDUCLASS'] = "OGIP"
+    hdr_data['LONGSTRN'] = "OGIP 1.0"
+    hdr_data['HDUCLAS1'] = "SPECTRUM"
+    hdr_data['HDUVERS1'] = "1.2.1"
+    hdr_data['HDUVERS'] = "1.2.1"
+
+    hdr_data['AREASCAL'] = "1"
+    hdr_data['BACKSCAL'] = "1"
+    hdr_data['CORRSCAL'] = "1"
+    hdr_data['BACKFILE'] = "none"
+
+    hdr_data['RESPFILE'] = "FITS_Files/minxss_fm3_RMF.fits"
+    hdr_data['ANCRFILE'] = "FITS_Files/minxss_fm3_ARF.fits"
+
+    hdr_data['CHANTYPE'] = "PHA"
+    hdr_data['POISSERR'] = "F"
+
+    hdr_data['CORRFILE'] = "none"
+    hdr_data['EXTNAME']  = 'SPECTRUM'
+    hdr_data['FILTER']   = "Be/Kapton"
+    hdr_data['EXPOSURE'] = "9"
+    hdr_data['DETCHANS'] = str(NUM_CHANNELS)
+    hdr_data['GROUPING'] = "0"
+    return hdr_dummy, hdr_data
+
+
+def writePHAFile(spectra, i, filename):
+    """
+            Writes spectrum i of spectra to a Type-I PHA file
+            :return: None
+    """
+    hdr_dummy, hdr_data = createHeaders("Type-I PHA file")
+    hdr_dummy['FILENAME'] = 'minxss_fm3_PHA_' + spectra.timeTag(i) + '.pha'
+    hdr_dummy['DATE'] = spectra.timeTag(i)
+    hdr_data['FILENAME'] = hdr_dummy['FILENAME']
+    hdr_data['DATE'] = hdr_dummy['DATE']
+
+    hdu_data = fits.BinTableHDU.from_columns(
+            [fits.Column(name='CHANNEL', format='J', array=np.arange(1, NUM_CHANNELS + 1, dtype=np.int32)),
+             fits.Column(name='RATE', format='E', array=spectra.rate[i]),
+             fits.Column(name='STAT_ERR', format='E', array=spectra.stat_err[i]),
+             fits.Column(name='SYS_ERR', format='E', array=spectra.sys_err[i])], header=hdr_data)
+    hdul = fits.HDUList([fits.PrimaryHDU(header=hdr_dummy), hdu_data])
+    hdul.writeto(filename, overwrite=True)
+
+
+def writePHA2File(spectra, filename):
+    """
+            Writes all of the spectra to one Type-II PHA file (one row per spectrum).
+            XSPEC loads row n with: data filename{n}
+            :return: None
+    """
+    num_spectra = len(spectra.indices)
+    hdr_dummy, hdr_data = createHeaders("Type-II PHA file")
+    hdr_data['HDUCLAS2'] = "TOTAL"
+    hdr_data['HDUCLAS3'] = "RATE"
+    hdr_data['HDUCLAS4'] = "TYPE:II"
+    hdr_dummy['FILENAME'] = os.path.basename(filename)
+    if num_spectra > 0:
+        hdr_dummy['DATE'] = spectra.timeTag(0)
+        hdr_data['DATE-OBS'] = spectra.time_iso[0]
+        hdr_data['DATE-END'] = spectra.time_iso[-1]
+    hdr_data['FILENAME'] = hdr_dummy['FILENAME']
+
+    channel_format = str(NUM_CHANNELS)
+    hdu_data = fits.BinTableHDU.from_columns(
+            [fits.Column(name='SPEC_NUM', format='J', array=np.arange(1, num_spectra + 1, dtype=np.int32)),
+             fits.Column(name='SPEC_INDEX', format='J', array=np.asarray(spectra.indices, dtype=np.int32)),
+             fits.Column(name='TIME_ISO', format=str(TIME_ISO_LENGTH) + 'A', array=np.array(spectra.time_iso)),
+             fits.Column(name='CHANNEL', format=channel_format + 'J',
+                         array=np.tile(np.arange(1, NUM_CHANNELS + 1, dtype=np.int32), (num_spectra, 1))),
+             fits.Column(name='RATE', format=channel_format + 'E', array=spectra.rate),
+             fits.Column(name='STAT_ERR', format=channel_format + 'E', array=spectra.stat_err),
+             fits.Column(name='SYS_ERR', format=channel_format + 'E', array=spectra.sys_err)], header=hdr_data)
+    hdul = fits.HDUList([fits.PrimaryHDU(header=hdr_dummy), hdu_data])
+    hdul.writeto(filename, overwrite=True)
+
+
+def writePHAFiles(daxsslevel1, indices, output_dir, pha2=False):
+    """
+            Writes a PHA file for each of the spectra at the given indices to output_dir
+            (or, with pha2, a single Type-II PHA file holding all of them).
+            :return: List of the file names written
+    """
+    spectra = readSpectra(daxsslevel1, indices)
+    os.makedirs(output_dir, exist_ok=True)
+    if pha2:
+        if len(spectra.indices) == 0:
+            return []
+        filename = os.path.join(output_dir, 'PHA2_' + spectra.timeTag(0) + '_' + spectra.timeTag(-1) + '.pha')
+        writePHA2File(spectra, filename)
+        return [filename]
+
+    filenames = []
+    for i in range(len(spectra.indices)):
+        filename = os.path.join(output_dir, 'PHA_' + spectra.timeTag(i) + '.pha')
+        writePHAFile(spectra, i, filename)
+        filenames.append(filename)
+    return filenames
+
+
+if __name__ == '__main__':
+    # python pha_writer.py <Level-1 file> <first spectrum index or ISO time> <last spectrum index or ISO time> [output dir] [pha2]
+    # e.g. python pha_writer.py daxss_solarSXR_level1_2022-02-14-mission_v2.0.0.ncdf 2022-03-15T23:00:00Z 2022-03-15T23:59:59Z FIT_Results/flare 1
+    if len(sys.argv) < 4:
+        print("Usage: python pha_writer.py <Level-1 file> <first index or ISO time> <last index or ISO time> [output dir] [pha2 (0/1)]")
+        sys.exit()
+    level1_file_path = sys.argv[1]
+    first, last = sys.argv[2], sys.argv[3]
+    output_dir = sys.argv[4] if len(sys.argv) > 4 else 'FIT_Results'
+    pha2 = len(sys.argv) > 5 and int(sys.argv[5]) == 1
+
+    daxsslevel1 = nc.Dataset(level1_file_path)
+    if first.isdigit() and last.isdigit():
+        spectrum_indices = np.arange(int(first), int(last) + 1)
+    else:
+        spectrum_indices = findSpectraInTimeRange(daxsslevel1, first, last)
+    written = writePHAFiles(daxsslevel1, spectrum_indices, output_dir, pha2)
+    print("Wrote " + str(len(written)) + " PHA file(s) for " + str(len(spectrum_indices)) + " spectra to " + output_dir)
+    daxsslevel1.close()
@@ -0,0 +1,490 @@
+from astropy.io import fits
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import netCDF4 as nc
+import os
+import sys
+import time
+import pha_writer
+
+# Headless fitting of many DAXSS spectra (e.g. every spectrum of a flare) with the vvapec model.
+# Spectra are fitted in parallel by a pool of processes. Two backends do the fitting:
+#   xspec - PyXSPEC, the same fit as the GUI (data_fitter.fitModel). Each worker process has its own XSPEC session.
+#   numpy - SciPy least squares of the counts folded through the RMF/ARF, for when XSPEC isn't installed.
+#           vvapec is linear in the abundances, so the model comes from a grid of vvapec spectra over kT
+#           (one for the Feldman abundances, one per element) that is made once with XSPEC (see buildModelGrid).
+
+FIT_ELEMENTS = ['Ne', 'Mg', 'Si', 'S', 'Ca', 'Fe']
+FIT_PARAMETERS = ['kT', 'norm'] + FIT_ELEMENTS
+
+RMF_FILENAME = "FITS_Files/minxss_fm3_RMF.fits"
+ARF_FILENAME = "FITS_Files/minxss_fm3_ARF.fits"
+ABUNDANCE_FILENAME = "FITS_Files/feld_extd"
+MODEL_GRID_FILENAME = "FITS_Files/vvapec_grid.npz"
+
+# vvapec parameter limits in XSPEC
+KT_LIMITS = (0.0808, 68.447)
+ABUNDANCE_LIMITS = (0.0, 1000.0)
+NORM_LIMITS = (0.0, 1e24)
+
+# A warm-started fit whose reduced chi-squared is this many times the previous spectrum's (or 1, if that was smaller)
+# is taken to have diverged, and the spectrum is fitted again from the default starting values
+DIVERGENCE_CHI_SQUARED_FACTOR = 3.0
+
+
+class FitSettings:
+    """
+            The fit parameters that are entered in the GUI's FIT Parameter Menu
+    """
+
+    def __init__(self, e_low, e_high, free_elements=('Mg', 'Si', 'S'), n_iterations=100, selected_model='vvapec'):
+        self.e_low = float(e_low)
+        self.e_high = float(e_high)
+        self.free_elements = [element for element in FIT_ELEMENTS if element in free_elements]
+        self.n_iterations = n_iterations
+        self.selected_model = selected_model
+
+
+def emptyResult():
+    result = {}
+    for name in FIT_PARAMETERS:
+        result[name] = np.nan
+        result[name + '_sigma'] = np.nan
+    result['red_chi_squared'] = np.nan
+    result['dof'] = 0
+    result['n_iterations'] = 0
+    result['fit_seconds'] = 0.0
+    result['warm_start'] = 0
+    result['cold_restart'] = 0
+    result['error'] = ''
+    return result
+
+
+#### XSPEC backend
+
+def initXspecWorker(quiet=True):
+    """
+            Sets up the XSPEC session of a worker process
+            :return: None
+    """
+    from xspec import Xset, Fit
+    if quiet:
+        Xset.chatter = 0
+        Xset.logChatter = 0
+    Xset.abund = 'file ' + ABUNDANCE_FILENAME
+    # don't stop to ask whether to keep going when n_iterations is reached
+    Fit.query = 'no'
+
+
+def fitPHAFileXspec(pha_filename, settings, previous=None):
+    """
+            Fits one PHA file with XSPEC in this process's session. If previous (the results of the previous
+            spectrum) is given, the fit starts from its values, with its sigmas as the fit step sizes.
+            :return: Dictionary of the fit results
+    """
+    from xspec import AllData, AllModels, Fit, Model, Spectrum
+    result = emptyResult()
+    start_time = time.perf_counter()
+    # Clearing Old Data + Models
+    AllData.clear()
+    AllModels.clear()
+    spec = Spectrum(pha_filename)
+    spec.ignore('**-' + str(settings.e_low) + ' ' + str(settings.e_high) + '-**')
+
+    m1 = Model(settings.selected_model)
+    for element in FIT_ELEMENTS:
+        getattr(m1.vvapec, element).frozen = element not in settings.free_elements
+    if previous is not None:
+        for name in ['kT', 'norm'] + settings.free_elements:
+            sigma = previous[name + '_sigma']
+            if np.isfinite(sigma) and sigma > 0:
+                getattr(m1.vvapec, name).values = [previous[name], sigma]
+            else:
+                getattr(m1.vvapec, name).values = previous[name]
+        result['warm_start'] = 1
+
+    Fit.nIterations = settings.n_iterations
+    Fit.perform()
+
+    for name in FIT_PARAMETERS:
+        parameter = getattr(m1.vvapec, name)
+        result[name] = parameter.values[0]
+        result[name + '_sigma'] = parameter.sigma
+    result['red_chi_squared'] = Fit.statistic / Fit.dof
+    result['dof'] = Fit.dof
+    result['fit_seconds'] = time.perf_counter() - start_time
+    return result
+
+
+def buildModelGrid(pha_filename, grid_filename=MODEL_GRID_FILENAME, kT_values=None):
+    """
+            Makes the vvapec model grid used by the numpy backend with XSPEC. The energy bins are those of the
+            response in pha_filename's header. For each kT the grid has the vvapec flux (norm = 1) with every
+            abundance at 1 (Feldman), and the extra flux from each of FIT_ELEMENTS going from abundance 0 to 1.
+            :return: None
+    """
+    from xspec import AllData, AllModels, Model, Spectrum
+    if kT_values is None:
+        kT_values = np.geomspace(0.1, 50.0, 160)
+    initXspecWorker()
+    AllData.clear()
+    AllModels.clear()
+    Spectrum(pha_filename)
+    m1 = Model('vvapec')
+    m1.vvapec.norm.values = 1.0
+    base = []
+    elements = {element: [] for element in FIT_ELEMENTS}
+    for kT in kT_values:
+        m1.vvapec.kT.values = float(kT)
+        base_flux = np.array(m1.values(1))
+        base.append(base_flux)
+        for element in FIT_ELEMENTS:
+            getattr(m1.vvapec, element).values = 0.0
+            elements[element].append(base_flux - np.array(m1.values(1)))
+            getattr(m1.vvapec, element).values = 1.0
+    np.savez(grid_filename, kT=np.asarray(kT_values, dtype=float), base=np.array(base),
+             **{'element_' + element: np.array(elements[element]) for element in FIT_ELEMENTS})
+    print("Saved a " + str(len(kT_values)) + " kT vvapec grid to " + grid_filename)
+
+
+#### NumPy/SciPy backend
+
+class Response:
+    """
+            Detector response (RMF x ARF) as a (energy bins x channels) matrix, and the channel energies
+    """
+
+    def __init__(self, rmf_filename=RMF_FILENAME, arf_filename=ARF_FILENAME):
+        with fits.open(rmf_filename) as rmf:
+            matrix_hdu = [hdu for hdu in rmf[1:] if 'MATRIX' in hdu.columns.names][0]
+            ebounds_hdu = [hdu for hdu in rmf[1:] if 'E_MIN' in hdu.columns.names][0]
+            self.channel_e_min = np.array(ebounds_hdu.data['E_MIN'], dtype=float)
+            self.channel_e_max = np.array(ebounds_hdu.data['E_MAX'], dtype=float)
+            num_channels = len(self.channel_e_min)
+            first_channel = int(matrix_hdu.header.get('TLMIN' + str(matrix_hdu.columns.names.index('F_CHAN') + 1), 1))
+            data = matrix_hdu.data
+            self.energy_lo = np.array(data['ENERG_LO'], dtype=float)
+            self.energy_hi = np.array(data['ENERG_HI'], dtype=float)
+            self.matrix = np.zeros((len(data), num_channels))
+            # each energy bin has N_GRP groups of N_CHAN channels starting at F_CHAN
+            for i in range(len(data)):
+                f_chan = np.atleast_1d(data['F_CHAN'][i])
+                n_chan = np.atleast_1d(data['N_CHAN'][i])
+                values = np.atleast_1d(data['MATRIX'][i])
+                position = 0
+                for group in range(int(data['N_GRP'][i])):
+                    start = int(f_chan[group]) - first_channel
+                    self.matrix[i, start:start + int(n_chan[group])] = values[position:position + int(n_chan[group])]
+                    position += int(n_chan[group])
+        with fits.open(arf_filename) as arf:
+            specresp = np.array(arf[1].data.field(2), dtype=float)
+        self.matrix *= specresp[:, None]
+
+    def channelEnergies(self):
+        return 0.5 * (self.channel_e_min + self.channel_e_max)
+
+
+class ModelGrid:
+    """
+            vvapec grid made by buildModelGrid, interpolated linearly in log(kT)
+    """
+
+    def __init__(self, grid_filename=MODEL_GRID_FILENAME):
+        with np.load(grid_filename) as grid:
+            self.kT = grid['kT']
+            self.base = grid['base']
+            self.elements = np.array([grid['element_' + element] for element in FIT_ELEMENTS])
+        self.log_kT = np.log(self.kT)
+
+    def flux(self, kT, norm, abundances):
+        """
+                vvapec flux in each energy bin, abundances in the order of FIT_ELEMENTS
+                :return: Array
+        """
+        position = np.interp(np.log(kT), self.log_kT, np.arange(len(self.kT)))
+        i = min(int(position), len(self.kT) - 2)
+        weight = position - i
+        base = (1 - weight) * self.base[i] + weight * self.base[i + 1]
+        elements = (1 - weight) * self.elements[:, i] + weight * self.elements[:, i + 1]
+        return norm * (base + (np.asarray(abundances) - 1.0) @ elements)
+
+
+class NumpyFitter:
+    """
+            Fits vvapec to DAXSS spectra by least squares on the channels between e_low and e_high, with the
+            statistical and systematic errors added in quadrature (as XSPEC does with STAT_ERR and SYS_ERR)
+    """
+
+    def __init__(self, settings, response=None, grid=None):
+        self.settings = settings
+        self.response = Response() if response is None else response
+        self.grid = ModelGrid() if grid is None else grid
+        energies = self.response.channelEnergies()
+        self.noticed = (energies >= settings.e_low) & (energies <= settings.e_high)
+        self.free_names = ['kT', 'norm'] + settings.free_elements
+
+    def modelRate(self, kT, norm, abundances):
+        return self.grid.flux(kT, norm, abundances) @ self.response.matrix
+
+    def parametersToModel(self, x):
+        abundances = np.ones(len(FIT_ELEMENTS))
+        for [name, value] in zip(self.free_names[2:], x[2:]):
+            abundances[FIT_ELEMENTS.index(name)] = value
+        return x[0], x[1], abundances
+
+    def startingPoint(self, rate, sigma, use):
+        """
+                XSPEC's starting values (kT 6.5, abundances 1), with the norm that best matches the data at that kT
+                :return: Array of the free parameters
+        """
+        abundances = np.ones(len(FIT_ELEMENTS))
+        model = self.modelRate(6.5, 1.0, abundances)[:len(rate)][use]
+        weight = 1.0 / sigma[use] ** 2
+        norm = np.sum(weight * rate[use] * model) / max(np.sum(weight * model ** 2), 1e-300)
+        return np.array([6.5, max(norm, 1e-10)] + [1.0] * len(self.settings.free_elements))
+
+    def warmStart(self, previous):
+        """
+                Starting point and parameter scales from the results of the previous spectrum: its fitted values,
+                and the square root of the diagonal of its covariance (its sigmas)
+                :return: Array of the free parameters, Array of their scales (or 'jac' if the sigmas aren't usable)
+        """
+        x0 = np.array([previous[name] for name in self.free_names], dtype=float)
+        sigmas = np.array([previous[name + '_sigma'] for name in self.free_names], dtype=float)
+        if np.all(np.isfinite(sigmas)) and np.all(sigmas > 0):
+            return x0, sigmas
+        return x0, 'jac'
+
+    def fit(self, rate, stat_err, sys_err, x0=None, x_scale='jac'):
+        """
+                Fits one spectrum. x0 is the starting point of the free parameters (kT, norm, then the free elements).
+                :return: Dictionary of the fit results, Array of the fitted free parameters, Covariance matrix
+        """
+        from scipy.optimize import least_squares
+        result = emptyResult()
+        start_time = time.perf_counter()
+        num_channels = min(len(rate), self.response.matrix.shape[1])
+        rate = np.asarray(rate[:num_channels], dtype=float)
+        sigma = np.sqrt(np.asarray(stat_err[:num_channels], dtype=float) ** 2 +
+                        (np.asarray(sys_err[:num_channels], dtype=float) * rate) ** 2)
+        use = self.noticed[:num_channels] & np.isfinite(rate) & np.isfinite(sigma) & (sigma > 0)
+        num_free = len(self.free_names)
+        if np.count_nonzero(use) <= num_free:
+            result['error'] = 'not enough channels with data'
+            return result, None, None
+
+        def residuals(x):
+            return (self.modelRate(*self.parametersToModel(x))[:num_channels][use] - rate[use]) / sigma[use]
+
+        lower = [KT_LIMITS[0], NORM_LIMITS[0]] + [ABUNDANCE_LIMITS[0]] * (num_free - 2)
+        upper = [KT_LIMITS[1], NORM_LIMITS[1]] + [ABUNDANCE_LIMITS[1]] * (num_free - 2)
+        if x0 is None:
+            x0 = self.startingPoint(rate, sigma, use)
+        x0 = np.clip(x0, lower, upper)
+        fit = least_squares(residuals, x0, bounds=(lower, upper), x_scale=x_scale, method='trf',
+                            max_nfev=self.settings.n_iterations * num_free)
+
+        dof = int(np.count_nonzero(use) - num_free)
+        try:
+            covariance = np.linalg.inv(fit.jac.T @ fit.jac)
+            sigmas = np.sqrt(np.abs(np.diag(covariance)))
+        except np.linalg.LinAlgError:
+            covariance = None
+            sigmas = np.full(num_free, np.nan)
+        for name in FIT_PARAMETERS:
+            if name in self.free_names:
+                result[name] = fit.x[self.free_names.index(name)]
+                result[name + '_sigma'] = sigmas[self.free_names.index(name)]
+            else:
+                result[name] = 1.0
+                result[name + '_sigma'] = 0.0
+        result['red_chi_squared'] = 2 * fit.cost / dof
+        result['dof'] = dof
+        result['n_iterations'] = int(fit.nfev)
+        result['fit_seconds'] = time.perf_counter() - start_time
+        if not fit.success:
+            result['error'] = fit.message
+        return result, fit.x, covariance
+
+
+#### Worker processes
+
+# each worker process keeps its own fitter (numpy) or XSPEC session
+worker_fitter = None
+
+
+def initWorker(backend, settings, rmf_filename, arf_filename, grid_filename):
+    global worker_fitter
+    if backend == 'xspec':
+        initXspecWorker()
+    else:
+        worker_fitter = NumpyFitter(settings, Response(rmf_filename, arf_filename), ModelGrid(grid_filename))
+
+
+def fitOne(backend, settings, spectrum, previous=None):
+    """
+            Fits one spectrum in a worker process: spectrum is a PHA file name for XSPEC or (rate, stat_err, sys_err)
+            for numpy. previous is the results of the previous spectrum to warm start from, or None.
+            :return: Dictionary of the fit results
+    """
+    try:
+        if backend == 'xspec':
+            return fitPHAFileXspec(spectrum, settings, previous)
+        if previous is None:
+            return worker_fitter.fit(*spectrum)[0]
+        result = worker_fitter.fit(*spectrum, *worker_fitter.warmStart(previous))[0]
+        result['warm_start'] = 1
+        return result
+    except Exception as e:
+        result = emptyResult()
+        result['error'] = str(e)
+        return result
+
+
+def fitTask(task):
+    """
+            Fits one spectrum from the default starting values: task is (backend, settings, spectrum)
+            :return: Dictionary of the fit results
+    """
+    [backend, settings, spectrum] = task
+    return fitOne(backend, settings, spectrum)
+
+
+def isDiverged(result, previous):
+    if len(result['error']) > 0 or not np.isfinite(result['red_chi_squared']):
+        return True
+    if result['red_chi_squared'] > DIVERGENCE_CHI_SQUARED_FACTOR * max(previous['red_chi_squared'], 1.0):
+        return True
+    # ran into the edge of the kT range
+    return not (KT_LIMITS[0] * 1.001 < result['kT'] < KT_LIMITS[1] * 0.999)
+
+
+def fitSequenceTask(task):
+    """
+            Fits a run of consecutive spectra in order in a worker process, starting each fit from the previous
+            spectrum's results. If a warm-started fit diverges, the spectrum is fitted again from the default
+            starting values, and that fit is kept if it worked and has a lower chi-squared. Either way the result
+            has warm_start and cold_restart set, and n_iterations and fit_seconds add up both fits.
+            :return: List of Dictionaries of the fit results
+    """
+    [backend, settings, spectra] = task
+    results = []
+    previous = None
+    for spectrum in spectra:
+        if previous is None:
+            result = fitOne(backend, settings, spectrum)
+        else:
+            result = fitOne(backend, settings, spectrum, previous)
+            if isDiverged(result, previous):
+                cold_result = fitOne(backend, settings, spectrum)
+                # (a NaN warm chi-squared never compares as lower, so any cold fit that worked replaces it)
+                if len(cold_result['error']) == 0 and np.isfinite(cold_result['red_chi_squared']) and \
+                        not cold_result['red_chi_squared'] >= result['red_chi_squared']:
+                    [result, other] = [cold_result, result]
+                else:
+                    other = cold_result
+                result['n_iterations'] += other['n_iterations']
+                result['fit_seconds'] += other['fit_seconds']
+                result['warm_start'] = 1
+                result['cold_restart'] = 1
+        results.append(result)
+        # start the next fit from this one, unless it failed
+        previous = result if len(result['error']) == 0 and np.isfinite(result['red_chi_squared']) else None
+    return results
+
+
+def printWarmStartSummary(table):
+    """
+            Prints how many fits were warm started, how many had to start over, and (numpy) about how many
+            iterations the warm starts saved compared with the cold starts. The iterations of the spectra that
+            diverged (both fits) count against the warm starts.
+            :return: None
+    """
+    warm = table[table['warm_start'] == 1]
+    cold = table[table['warm_start'] == 0]
+    print("Warm started " + str(len(warm)) + " fits, " + str(int(table['cold_restart'].sum())) +
+          " diverged and were started over, " + str(len(cold)) + " cold starts")
+    if len(warm) > 0 and len(cold) > 0 and cold['n_iterations'].sum() > 0:
+        cold_iterations = cold['n_iterations'].mean()
+        saved = cold_iterations * len(warm) - warm['n_iterations'].sum()
+        print("Iterations: {0:.1f} per warm start vs {1:.1f} per cold start, about {2:.0f} saved".format(
+            warm['n_iterations'].mean(), cold_iterations, saved))
+
+
+def fitSpectra(daxsslevel1, indices, settings, backend='numpy', num_workers=None, output_dir='FIT_Results/batch',
+               rmf_filename=RMF_FILENAME, arf_filename=ARF_FILENAME, grid_filename=MODEL_GRID_FILENAME,
+               warm_start=False):
+    """
+            Fits the spectra at the given indices of the Level-1 file in parallel. With warm_start the spectra
+            (which should be in time order) are split into one consecutive run per worker, and each fit in a run
+            starts from the previous spectrum's results (see fitSequenceTask).
+            :return: pandas DataFrame with one row per spectrum
+    """
+    spectra = pha_writer.readSpectra(daxsslevel1, indices)
+    if backend == 'xspec':
+        # XSPEC reads the spectra from PHA files
+        inputs = pha_writer.writePHAFiles(daxsslevel1, spectra.indices, output_dir)
+    else:
+        inputs = [(spectra.rate[i], spectra.stat_err[i], spectra.sys_err[i]) for i in range(len(spectra.indices))]
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=num_workers, initializer=initWorker,
+                             initargs=(backend, settings, rmf_filename, arf_filename, grid_filename)) as executor:
+        if warm_start:
+            runs = [run for run in np.array_split(np.arange(len(inputs)), num_workers) if len(run) > 0]
+            tasks = [(backend, settings, [inputs[i] for i in run]) for run in runs]
+            results = [result for run_results in executor.map(fitSequenceTask, tasks) for result in run_results]
+        else:
+            tasks = [(backend, settings, spectrum) for spectrum in inputs]
+            results = list(executor.map(fitTask, tasks, chunksize=max(1, len(tasks) // (8 * num_workers))))
+    print("Fitted " + str(len(results)) + " spectra with " + backend + " in " +
+          "{0:.1f}".format(time.perf_counter() - start_time) + " s")
+    table = resultsTable(spectra, results, backend)
+    if warm_start:
+        printWarmStartSummary(table)
+    return table
+
+
+def resultsTable(spectra, results, backend):
+    table = pd.DataFrame(results)
+    table.insert(0, 'time_iso', spectra.time_iso)
+    table.insert(0, 'spectrum_index', spectra.indices)
+    table['backend'] = backend
+    return table
+
+
+if __name__ == '__main__':
+    # python spectral_fit_engine.py <Level-1 file> <first index or ISO time> <last index or ISO time> <e_low keV> <e_high keV> [free elements] [backend] [workers] [output csv] [warm start (0/1)]
+    # e.g. python spectral_fit_engine.py daxss_solarSXR_level1_2022-02-14-mission_v2.0.0.ncdf 2022-03-15T23:00:00Z 2022-03-15T23:59:59Z 0.7 6 Mg,Si,S numpy
+    # The numpy backend needs the vvapec grid, which is made once (with XSPEC) from any DAXSS PHA file:
+    #      python spectral_fit_engine.py makegrid <PHA file> [grid file]
+    if len(sys.argv) > 2 and sys.argv[1] == 'makegrid':
+        buildModelGrid(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else MODEL_GRID_FILENAME)
+        sys.exit()
+    if len(sys.argv) < 6:
+        print("Usage: python spectral_fit_engine.py <Level-1 file> <first index or ISO time> <last index or ISO time> "
+              "<e_low keV> <e_high keV> [free elements, e.g. Mg,Si,S] [backend (numpy/xspec)] [workers] [output csv] "
+              "[warm start (0/1)]")
+        sys.exit()
+    first, last = sys.argv[2], sys.argv[3]
+    free_elements = sys.argv[6].split(',') if len(sys.argv) > 6 else ['Mg', 'Si', 'S']
+    backend = sys.argv[7] if len(sys.argv) > 7 else 'numpy'
+    num_workers = int(sys.argv[8]) if len(sys.argv) > 8 else None
+    output_filename = sys.argv[9] if len(sys.argv) > 9 else 'FIT_Results/fit_results.csv'
+    warm_start = len(sys.argv) > 10 and int(sys.argv[10]) == 1
+
+    daxsslevel1 = nc.Dataset(sys.argv[1])
+    if first.isdigit() and last.isdigit():
+        spectrum_indices = np.arange(int(first), int(last) + 1)
+    else:
+        spectrum_indices = pha_writer.findSpectraInTimeRange(daxsslevel1, first, last)
+    fit_settings = FitSettings(sys.argv[4], sys.argv[5], free_elements)
+    fit_results = fitSpectra(daxsslevel1, spectrum_indices, fit_settings, backend, num_workers,
+                             os.path.join(os.path.dirname(output_filename), 'batch'), warm_start=warm_start)
+    daxsslevel1.close()
+    os.makedirs(os.path.dirname(output_filename) or '.', exist_ok=True)
+    fit_results.to_csv(output_filename, index=False)
+    print("Saved fit results for " + str(len(fit_results)) + " spectra to " + output_filename)
@@ -2,39 +2,161 @@
 from tkinter import *
 from tkinter.ttk import *
 from tkinter import ttk
+import os
+import csv
+import pickle
+import difflib
+import hashlib
 import pandas as pd
+import numpy as np
  
 # importing strftime function to
 # retrieve system's time
 from time import strftime
 from datetime import datetime
 
+pass_file = '/Users/gs-ops/Dropbox/minxss_dropbox/tle/Boulder/passes_manual_BOULDER.csv'
+#pass_file = '/home/adbr6125/cubesat/ground_station/Boulder/passes_manual_BOULDER.csv'
+# The last parsed pass file is saved here, so the clock comes up right away instead of waiting on the csv
+cache_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'passes_manual_cache.pkl')
+check_seconds = 5  # how often to look for edits to the pass file
+
 # Globals
 increment_sec = 0
+pass_file_stat = None  # (mtime, size) of the pass file the last time it was read
+pass_file_hash = ''
+pass_lines = []  # data lines of the pass file, in file order
+parsed_lines = {}  # line of the pass file -> parsed pass (None for deleted passes and lines that don't parse)
 df = pd.DataFrame()
+# Pass times as sorted datetime64 arrays, so each tick can find the current/next pass with a binary search
+start_times = np.array([], dtype='datetime64[ns]')
+end_times = np.array([], dtype='datetime64[ns]')
+max_end_times = np.array([], dtype='datetime64[ns]')  # latest end time of this pass and every pass before it
+listbox_first_pass = 0  # index (into the arrays above) of the pass at the top of the listbox
 #sats_ignored = "CSIM|IS-1"
 
 
 
+# Returns (satellite, start, end, peak elevation, sunlight) for one line of the pass file,
+# or None if the pass was deleted or the line can't be read
+def parse_pass_line(line):
+    # Satellite, Start Time, End Time, Duration [Minutes], Peak Elevation, Rise Azimuth, Set Azimuth, Sunlight,
+    # UHF Priority, S-Band Priority, Manually Edited
+    fields = next(csv.reader([line]))
+    if len(fields) < 11:
+        return None
+    # passes with no UHF priority were always left out too (pandas read them as NaN)
+    if len(fields[8]) == 0 or 'Delete' in fields[8]:
+        return None
+    try:
+        return (fields[0],
+                pd.Timestamp(fields[1]).to_datetime64(),
+                pd.Timestamp(fields[2]).to_datetime64(),
+                int(round(float(fields[4]))),
+                fields[7])
+    except ValueError:
+        return None
+
+
+def load_cache():
+    global pass_file_hash, pass_lines, parsed_lines
+    try:
+        with open(cache_file, 'rb') as f:
+            cache = pickle.load(f)
+        pass_file_hash = cache['pass_file_hash']
+        pass_lines = cache['pass_lines']
+        parsed_lines = cache['parsed_lines']
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError):
+        pass
+
+
+def save_cache():
+    cache = {'pass_file_hash': pass_file_hash, 'pass_lines': pass_lines, 'parsed_lines': parsed_lines}
+    try:
+        with open(cache_file + '.tmp', 'wb') as f:
+            pickle.dump(cache, f)
+        os.replace(cache_file + '.tmp', cache_file)
+    except OSError as e:
+        print('Could not save the pass cache ' + cache_file + ': ' + str(e))
+
+
+# Re-reads the pass file if it has changed since last time, parsing only the lines that are new.
+# Returns True if the passes changed.
+def check_pass_file():
+    global pass_file_stat, pass_file_hash, pass_lines
+    try:
+        st = os.stat(pass_file)
+    except OSError:
+        return False
+    if (st.st_mtime_ns, st.st_size) == pass_file_stat:
+        return False
+    pass_file_stat = (st.st_mtime_ns, st.st_size)
+    with open(pass_file, 'rb') as f:
+        data = f.read()
+    # Dropbox touches the file without changing it now and then
+    file_hash = hashlib.blake2b(data).hexdigest()
+    if file_hash == pass_file_hash:
+        return False
+    pass_file_hash = file_hash
+
+    lines = [line for line in data.decode('utf-8', errors='replace').splitlines() if len(line.strip()) > 0]
+    # first line is a title and the second is the column names; the last line isn't a pass
+    pass_lines = lines[2:-1]
+    new_lines = [line for line in pass_lines if line not in parsed_lines]
+    for line in new_lines:
+        parsed_lines[line] = parse_pass_line(line)
+    kept_lines = set(pass_lines)
+    for line in [line for line in parsed_lines if line not in kept_lines]:
+        del parsed_lines[line]
+    print(strftime('%Y-%m-%d %H:%M:%S') + ' local time: pass file changed, ' + str(len(new_lines)) + ' new or edited rows')
+    save_cache()
+    return True
+
+
+def listbox_text(i):
+    return df.loc[i,"Satellite"] + "     AOS     " + df.loc[i,"Start Time"].strftime('%Y-%m-%d %H:%M:%S') + ' UTC  ' + str(df.loc[i,"Peak Elevation"]) + 'º'
+
+
+# Rebuilds the pass arrays from the parsed lines, and changes only the listbox rows that are different
+def apply_pass_times():
+    global df, start_times, end_times, max_end_times, listbox_first_pass
+    rows = sorted([parsed_lines[line] for line in pass_lines if parsed_lines.get(line) is not None], key=lambda row: row[1])
+    df = pd.DataFrame(rows, columns=['Satellite', 'Start Time', 'End Time', 'Peak Elevation', 'Sunlight'])
+    start_times = np.array([row[1] for row in rows], dtype='datetime64[ns]')
+    end_times = np.array([row[2] for row in rows], dtype='datetime64[ns]')
+    max_end_times = np.maximum.accumulate(end_times)
+
+    now = np.datetime64(datetime.utcnow())
+    listbox_first_pass = np.searchsorted(start_times, now, side='right')
+    new_items = [listbox_text(i) for i in range(listbox_first_pass, len(df))]
+    old_items = list(lbl_listbox.get(0, END))
+    # go from the bottom up so the row numbers of the changes still to come don't move
+    opcodes = difflib.SequenceMatcher(None, old_items, new_items, autojunk=False).get_opcodes()
+    for [tag, i1, i2, j1, j2] in reversed(opcodes):
+        if tag == 'replace' or tag == 'delete':
+            lbl_listbox.delete(i1, i2 - 1)
+        if tag == 'replace' or tag == 'insert':
+            lbl_listbox.insert(i1, *new_items[j1:j2])
+
+
 def read_new_pass_times():
-    global df
     print(strftime('%Y-%m-%d %H:%M:%S') + ' local time: loading new pass times')
-    pass_file = '/Users/gs-ops/Dropbox/minxss_dropbox/tle/Boulder/passes_manual_BOULDER.csv'
-    #pass_file = '/home/adbr6125/cubesat/ground_station/Boulder/passes_manual_BOULDER.csv'
-    df_all = pd.read_csv(pass_file, skiprows=1)
-    df_all.columns = ['Satellite', 'Start Time', 'End Time', 'Duration [Minutes]', 'Peak Elevation', 'Rise Azimuth','Set Azimuth','Sunlight', 'UHF Priority', 'S-Band Priority','Manually Edited']
-    df_all = df_all.iloc[:-1]
-    df_all = df_all[df_all['UHF Priority'].str.contains("Delete") == False]
-    df_all['Peak Elevation'] = df_all['Peak Elevation'].round().astype(int)
-    df_all['Start Time'] = pd.to_datetime(df_all['Start Time'])
-    df_all['End Time'] = pd.to_datetime(df_all['End Time'])
-    df = df_all
-    lbl_listbox.delete(0,END)
-    now = datetime.utcnow()
-    for i in list(df_all.index.values):
-        if now < df_all.loc[i,"Start Time"]:
-            listbox_str = df_all.loc[i,"Satellite"] + "     AOS     " + df_all.loc[i,"Start Time"].strftime('%Y-%m-%d %H:%M:%S') + ' UTC  ' + str(df_all.loc[i,"Peak Elevation"]) + 'º'
-            lbl_listbox.insert(i,listbox_str)
+    # show what we had last time, then bring it up to date with the pass file
+    load_cache()
+    apply_pass_times()
+    if check_pass_file():
+        apply_pass_times()
+
+
+# Returns the index of the earliest-starting pass in progress at now, or -1 if there isn't one
+def find_current_pass(now):
+    # the passes that started before now are 0..num_started-1. The first of them whose end is after now is the
+    # first one where the running max of the end times goes past now
+    num_started = np.searchsorted(start_times, now, side='left')
+    i = np.searchsorted(max_end_times[:num_started], now, side='right')
+    if i < num_started:
+        return i
+    return -1
 
 
  
@@ -46,33 +168,44 @@ root.configure(background='black')
 
 
 def time():
-    global increment_sec, df
+    global increment_sec, df, listbox_first_pass
     increment_sec += 1
-    if increment_sec >= 86400:
+    if increment_sec >= check_seconds:
         increment_sec = 0
-        read_new_pass_times()
+        if check_pass_file():
+            apply_pass_times()
 
-    utc_time = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S') + ' UTC'
+    now = datetime.utcnow()
+    utc_time = now.strftime('%Y-%m-%d %H:%M:%S') + ' UTC'
     local_time = strftime('%Y-%m-%d %H:%M:%S') + ' local'
     
     lbl_t_utc.config(text=utc_time)
-    lbl_t_utc.after(1000, time)
+    # schedule the next tick for just after the next whole second, so the clock doesn't drift
+    lbl_t_utc.after(1000 - now.microsecond // 1000 + 5, time)
     lbl_t_local.config(text=local_time)
     # Figure out when we are
-    now = datetime.utcnow()
-    if df[(now > df['Start Time']) & (now <= df['End Time'])].empty:
-        bla = df[df['Start Time'] > now]
-        df_pass = bla.iloc[0]
+    now64 = np.datetime64(now)
+
+    # take passes that have started off the top of the listbox
+    next_pass = np.searchsorted(start_times, now64, side='right')
+    while listbox_first_pass < next_pass:
+        lbl_listbox.delete(0)
+        listbox_first_pass += 1
+
+    current_pass = find_current_pass(now64)
+    if current_pass < 0:
+        if next_pass >= len(start_times):
+            lbl_countdown.config(text='No upcoming passes', foreground='white')
+            return
+        df_pass = df.loc[next_pass]
         countdown = df_pass['Start Time'] - now
         hours, remainder = divmod(countdown.seconds, 3600)
         minutes, seconds = divmod(remainder, 60)
         aos_los = 'AOS'
         countdown_color = 'white'
-        if int(countdown.total_seconds()) == 0:
-            lbl_listbox.delete(0)
 
     else:
-        df_pass = df[(now > df['Start Time']) & (now < df['End Time'])].iloc[0]
+        df_pass = df.loc[current_pass]
         countdown = df_pass['End Time'] - now
         hours, remainder = divmod(countdown.seconds, 3600)
         minutes, seconds = divmod(remainder, 60)
@@ -12,21 +12,34 @@ import time
 from datetime import datetime
 from shutil import copyfile
 import os
+import re
 import sys
-from scipy.io.idl import readsav
-from subprocess import Popen
+import glob
+import socket
+import threading
+from subprocess import Popen, TimeoutExpired
 import signal
-import pyautogui
+import numpy as np
 
 import minxss_email
 import jd_utc_time
 import pass_config
 import rundir_analysis
-
-from operator import attrgetter
+import pass_scheduler
+import post_pass_pipeline
+from pass_metrics import PassMetrics
+from rundir_index import RundirIndex
+from tle_distribution import TleDistributor, FileFingerprint
+from pass_schedule import IdlDataClass, PassScheduleCache, next_monitored_index, resolve_pass_conflicts
 
 __version__ = 'v3.0.0'
 
+# ExeManagement process supervision settings
+ready_check_seconds = 0.2  # how often to check whether a program is up yet (log file or TCP port)
+restart_backoff_seconds = 5  # wait before restarting a crashed program; doubles with each crash in a row
+restart_backoff_max_seconds = 120
+restart_backoff_reset_seconds = 300  # a program that stayed up this long starts over at restart_backoff_seconds
+
 mydir = os.path.dirname(__file__)
 if len(mydir) == 0:
     mydir = os.getcwd()
@@ -44,19 +57,22 @@ def main(script):  # This is what calls the minxss_monitor_pass_times code and s
     if p.cfg.use_satpc == 1:
         p.satpc_monitor()  # calling this twice because it creates a lot of junk in the console on startup
     print("\r\n\r\n **************** Setup completed successfully ***************\r\n\r\n")
-    while 1:
+    if p.cfg.use_async_scheduler == 1:
+        pass_scheduler.AsyncPassScheduler(p).run()
+    else:
+        run_polling_loop(p)
+
+
+# The original main loop: checks the schedule every 60 seconds and runs passes as they come up.
+# Runs forever unless stop_jd is given (the pass manager simulator uses that to stop a replay).
+def run_polling_loop(p, stop_jd=None):
+    while stop_jd is None or jd_utc_time.now_in_jd() < stop_jd:
         if p.cfg.use_satpc == 1:
             p.satpc_monitor()
 
         [minutes_before_pass, info_list] = p.get_next_pass_info()
         if minutes_before_pass <= p.cfg.setup_minutes_before_pass or p.cfg.enable_rapidfire_test == 1:
-            # print a warning about ignored satellites
-            if len(p.ignored_sats) > 0:
-                txt = "\r\nWARNING: Ignoring the following satellites since they do not have config ini files: "
-                for sat in p.ignored_sats:
-                    txt += sat + ", "
-                txt = txt[0:-2]
-                print(txt)
+            p.print_ignored_sats()
             # If we have multiple adjacent passes, we should run them back-to-back.
             # Note that the sat pass manager automatically waits until the pass is complete before returning
             for pass_num in range(len(info_list)):
@@ -68,25 +84,23 @@ def main(script):  # This is what calls the minxss_monitor_pass_times code and s
 
         # check if we're less than a minute away, and if so, sleep for less
         elif minutes_before_pass-1 <= p.cfg.setup_minutes_before_pass:
-            time.sleep((minutes_before_pass - p.cfg.setup_minutes_before_pass)*60)
+            jd_utc_time.sleep((minutes_before_pass - p.cfg.setup_minutes_before_pass)*60)
 
         # otherwise, check in and print stuff out every 60 seconds
         else:
-            time.sleep(60)
+            jd_utc_time.sleep(60)
 
 
 class PassManagerTests:
     def __init__(self):
         self.testnum = 0
 
-    def test_add_pass_conflicts(self, pass_manager, info_list, idl_data_old):
+    # returns a test schedule built from idl_data_old. Its first pass (pass_index 0) is the one to run.
+    def test_add_pass_conflicts(self, idl_data_old):
         # Priorities for test: MINXSS1=5, MINXSS2=4, QB50=3
 
-        info = MyPassInfo()
         idl_data = IdlDataClass()
 
-        info.index = 0
-
         print("\r\n\r\n")
         print("********** Executing pass manager test #{0} **********".format(self.testnum))
         print("\r\n\r\n")
@@ -141,13 +155,6 @@ class PassManagerTests:
             idl_data.end_jd[i] += jd_utc_time.now_in_jd()
         print("idl_data.start_jd", idl_data.start_jd)
 
-        info.priority = pass_manager.sat_cfgs[idl_data.sat_names[0]].priority
-        info.sat_name = idl_data.sat_names[0]
-        info.start_jd = idl_data.start_jd[0]
-        info.start_jd_adjusted = info.start_jd
-        info.end_jd = idl_data.end_jd[0]
-        info.end_jd_adjusted = info.end_jd
-
         idl_data.elevation = []
         idl_data.length_minutes = []
         idl_data.sunlight = []
@@ -158,20 +165,17 @@ class PassManagerTests:
             idl_data.sunlight.append(idl_data_old.sunlight[i])
             idl_data.station_names.append(idl_data_old.station_names[i])
 
-        info_list[0] = info
-        #self.add_pass_conflicts(info_list,idl_data)
-
-        return [idl_data,info_list]
+        return idl_data
 
 
 class PassManager:
-    def __init__(self):
+    def __init__(self, ini_filename='pass_config.ini'):
         # testing
         if test_pass_conflicts_enabled == 1:
             self.tester = PassManagerTests()
 
         # create the generic config ini file
-        self.cfg = pass_config.GenericConfig('pass_config.ini')
+        self.cfg = pass_config.GenericConfig(ini_filename)
         # for the overall config, the email list for error and no error are the same
         self.email = minxss_email.email(self.cfg.email_list, self.cfg.email_list, "[No_Specific_Satellite]", self.cfg)
 
@@ -196,76 +200,94 @@ class PassManager:
                 self.sat_pass_managers[tmp_sat_cfg.sat_name].kill_hydra()
 
         # SATPC variables
-        self.tle_contents = None
+        self.tle_distributor = None
+        self.satpc_tle_fingerprint = None
         if self.cfg.use_satpc == 1:
             self.satpc32_exe = ExeManagement(self.cfg.satpc_dir, self.cfg.satpc_exe_name, 1)
             self.satpc32_server_exe = ExeManagement(self.cfg.satpc_dir, self.cfg.satpc_server_exe_name, 0)
             self.satpc_tle_name = 'satellites_' + self.cfg.station_name + '.tle'
-
-        # a list of satelites we're ignoring
-        self.ignored_sats = []
+            self.satpc_tle_file_dropbox = os.path.join(self.cfg.idl_tle_dir, self.cfg.station_name, self.satpc_tle_name)
+            self.satpc_tle_file_dest = os.path.join(self.cfg.satpc_tle_dir, self.satpc_tle_name)
+            # the TLE file SATPC reads, and any other copies we've been asked to keep current
+            tle_dests = [self.satpc_tle_file_dest]
+            for tle_dir in self.cfg.extra_tle_dirs:
+                tle_dests.append(os.path.join(tle_dir, self.satpc_tle_name))
+            self.tle_distributor = TleDistributor(self.satpc_tle_file_dropbox, tle_dests)
+            self.satpc_tle_fingerprint = FileFingerprint(self.satpc_tle_file_dest)
+
+        # the satellites we're ignoring (a set, so it doesn't grow every time we look up the next pass)
+        self.ignored_sats = set()
+
+        # parsed copy of passes_latest_<STATION>.sav, only re-read when the file changes
+        self.schedule_cache = PassScheduleCache()
+        # next_monitored_index() result for the schedule currently in the cache: (sat_names array, indices)
+        self.next_monitored_lookup = (None, None)
+        # resolve_pass_conflicts() result for the whole schedule currently in the cache: (idl_data, ResolvedSchedule)
+        self.resolved_schedule = (None, None)
+
+        # post-pass analysis and emails run in the background (unless post_pass_workers = 0)
+        self.post_pass_queue = None
+        if self.cfg.post_pass_workers > 0:
+            self.post_pass_queue = post_pass_pipeline.PostPassQueue(os.path.join(self.cfg.post_pass_queue_dir, self.cfg.station_name.upper()),
+                                                                   self.cfg.post_pass_workers, self.sat_pass_managers)
+            for sat_name in self.sat_pass_managers:
+                self.sat_pass_managers[sat_name].post_pass_queue = self.post_pass_queue
+            self.post_pass_queue.resume()
 
     def satpc_monitor(self):
+        self.update_satpc_tle()
+        self.restart_satpc_if_new_tle()
+
+    # copies the station's TLE file from Dropbox to where SATPC reads it (only when the Dropbox copy has changed)
+    def update_satpc_tle(self):
         if self.cfg.use_satpc == 1:
             if self.cfg.do_update_satpc_tle == 1:
-                satpc_tle_file_dropbox = os.path.join(self.cfg.idl_tle_dir, self.cfg.station_name)
-                satpc_tle_file_dropbox = os.path.join(satpc_tle_file_dropbox, self.satpc_tle_name)
-
-                if os.path.exists(self.cfg.satpc_tle_dir) and os.path.exists(satpc_tle_file_dropbox):
-                    satpc_tle_file_dest = os.path.join(self.cfg.satpc_tle_dir, self.satpc_tle_name)
-                    copyfile(satpc_tle_file_dropbox, satpc_tle_file_dest)
+                if os.path.exists(self.cfg.satpc_tle_dir) and os.path.exists(self.satpc_tle_file_dropbox):
+                    try:
+                        if self.tle_distributor.update() == 1 and len(self.tle_distributor.changed_sats) > 0:
+                            print("New TLEs for: {0}".format(', '.join(self.tle_distributor.changed_sats)))
+                    except OSError as e:
+                        print("ERROR: Couldn't copy the TLE file: {0}".format(e))
                 else:
                     print("One of these locations does not exist:")
-                    print(satpc_tle_file_dropbox)
+                    print(self.satpc_tle_file_dropbox)
                     print(self.cfg.satpc_tle_dir)
                     self.email("NoFile")
 
+    def restart_satpc_if_new_tle(self):
+        if self.cfg.use_satpc == 1:
             if self.cfg.disable_restart_programs == 0:
                 # Normally we only reset SATPC32 if there's a new TLE.
                 # However, if we think SATPC32 is not running, kill the process just in case it does exist so that we have a handle on it
                 if self.check_if_new_tle() == 1 or self.satpc32_exe.is_running() == 0:
                     print("**************** New TLE info (or exe not running)!! Restarting SATPC ****************")
                     self.satpc32_exe.kill()
-                    time.sleep(5)
+                    self.satpc32_exe.wait_until_stopped(5)
                     self.satpc32_server_exe.kill()
-                    time.sleep(10)
+                    jd_utc_time.sleep(10)  # we didn't launch ServerSDX, so we can't watch it exit; give SATPC time to close it
                     self.satpc32_exe.start()
 
+    # returns 1 if SATPC's TLE file has changed since the last call. The file is only re-read (and hashed) when
+    # its mtime or size changes.
     def check_if_new_tle(self):
         if self.cfg.use_satpc == 1:
-            current_tle_data = ""
-            # get the file data
-            satpc_tle_file_dest = os.path.join(self.cfg.satpc_tle_dir, self.satpc_tle_name)
-            if os.path.exists(satpc_tle_file_dest):
-                file_handle = open(satpc_tle_file_dest, 'r')
-                current_tle_data = file_handle.read()
-                file_handle.close()
-            else:
-                print("ERROR: No SATPC TLE file at {0}".format(satpc_tle_file_dest))
+            if not os.path.exists(self.satpc_tle_file_dest):
+                print("ERROR: No SATPC TLE file at {0}".format(self.satpc_tle_file_dest))
                 self.email("NoFile")
                 return 1  # if we don't have the file path we have to assume it updates every time
-
-            if self.tle_contents is None:
-                self.tle_contents = current_tle_data
-                return 1
-            else:
-                if len(self.tle_contents) == len(current_tle_data):
-                    # if the lengths match, check each character
-                    i = 0
-                    for char in self.tle_contents:
-                        if char != current_tle_data[i]:
-                            self.tle_contents = current_tle_data
-                            return 1
-                        else:
-                            i += 1
-                else:
-                    self.tle_contents = current_tle_data
-                    return 1
-
-            self.tle_contents = current_tle_data
+            return self.satpc_tle_fingerprint.update()
         # if we made it here, we're good to go
         return 0
 
+    # print a warning about ignored satellites
+    def print_ignored_sats(self):
+        if len(self.ignored_sats) > 0:
+            txt = "\r\nWARNING: Ignoring the following satellites since they do not have config ini files: "
+            for sat in sorted(self.ignored_sats):
+                txt += sat + ", "
+            txt = txt[0:-2]
+            print(txt)
+
     # returns a struct with info on the next pass (how long until, is in sun, max el, length)
     def get_next_pass_info(self):
         # get the right IDL pass file. Folder structure is:
@@ -278,146 +300,53 @@ class PassManager:
         passes_idl_file = os.path.join(passes_idl_file, 'passes_latest_' + self.cfg.station_name.upper() + '.sav')
 
         try:
-            idl_data_raw = readsav(passes_idl_file)
-        except:
+            idl_data = self.schedule_cache.load(passes_idl_file)
+        except Exception:
             print("File '" + passes_idl_file + "' is not an IDL .sav file!")
             self.email("NoFile")
-
-        #print(idl_data_raw.PASSES.SATELLITE_NAME)
-        # DURATION_MINUTES	10.349999
-        # END_DATE	2016032.0851736106
-        # END_JD	2457419.5851736111
-        # END_TIME	7358.9999556541443
-        # MAX_DATE	2016032.0815972220
-        # MAX_ELEVATION	38.373653
-        # MAX_JD	2457419.5815972220
-        # MAX_TIME	7049.9999821186066
-        # START_DATE	2016032.0779861109
-        # START_JD	2457419.5779861109
-        # START_TIME	6737.9999846220016
-        # SUNLIGHT	0 [0=none, 1=sun]
-        # DIR_EW    (passing east [0] or passing west [1] of the station)
-        # DIR_NS   (passing North [0] or passing South [1] of the station)
-        # SATELLITE_NAME    b'MINXSS1'
-        # STATION_NAME      b'BOULDER'
-
-        idl_data = IdlDataClass()
-        idl_data.elevation = idl_data_raw.PASSES.MAX_ELEVATION.tolist()
-        idl_data.length_minutes = idl_data_raw.PASSES.DURATION_MINUTES.tolist()
-        idl_data.sunlight = idl_data_raw.PASSES.SUNLIGHT.tolist()
-        idl_data.sat_names = idl_data_raw.PASSES.SATELLITE_NAME.tolist()
-        for i in range(len(idl_data.sat_names)):
-            idl_data.sat_names[i] = str(idl_data.sat_names[i])
-            idl_data.sat_names[i] = idl_data.sat_names[i][2:-1]  # Filter out weird b' at start and ' at end of text string
-        idl_data.station_names = idl_data_raw.PASSES.STATION_NAME.tolist()
-        for i in range(len(idl_data.station_names)):
-            idl_data.station_names[i] = str(idl_data.station_names[i])
-            idl_data.station_names[i] = idl_data.station_names[i][2:-1]  # Filter out weird b' at start and ' at end of text string
-        idl_data.start_jd = idl_data_raw.PASSES.START_JD.tolist()
-        idl_data.end_jd = idl_data_raw.PASSES.END_JD.tolist()
+            # keep going with the last schedule we were able to read (if any)
+            idl_data = self.schedule_cache.idl_data
+            if idl_data is None:
+                return [99999, []]
 
         #print(idl_data.start_jd)
         #print(jd_utc_time.now_in_jd())
 
-        # pass info from pre-pass calcs (elevation, length, etc)
-        info_list = []
-        info_list.append(MyPassInfo())
         if test_pass_conflicts_enabled == 0:
             [pass_index, minutes] = self.minutes_until_next_pass(idl_data.start_jd, idl_data.sat_names)
         else:
             minutes = 0
             pass_index = 0
-            [idl_data, info_list] = self.tester.test_add_pass_conflicts(self, info_list, idl_data)
+            idl_data = self.tester.test_add_pass_conflicts(idl_data)
 
+        # pass info from pre-pass calcs (elevation, length, etc)
+        info_list = []
         if pass_index >= 0:
-            self.store_pass_info(info_list[0], idl_data, pass_index)
-            info_list = self.add_pass_conflicts(info_list, idl_data)
+            info_list = self.add_pass_conflicts(idl_data, pass_index)
             print_pass_info(info_list[0], minutes, 1)
 
         return [minutes, info_list]
 
-    def add_pass_conflicts(self, info_list, idl_data):
-        starts = idl_data.start_jd.copy()
-        sat_names = idl_data.sat_names.copy()
+    # returns the list of passes to run back-to-back starting with pass_index, with start/end times adjusted for priorities
+    def add_pass_conflicts(self, idl_data, pass_index):
+        resolved = self.get_resolved_schedule(idl_data)
 
-        #============ First we get a list of conflicting satellites ============#
-        i = info_list[0].index+1  # first compare to the next pass
-        endcompare = info_list[0].end_jd_adjusted
+        # The whole-schedule timeline only applies if this pass starts its conflict group. If an earlier pass in the
+        # group is already over (e.g. the manager was just started), re-resolve from this pass onward.
+        if self.cfg.enable_rapidfire_test == 1 or not resolved.is_group_start(pass_index):
+            resolved = self.resolve_schedule_tail(idl_data, pass_index, resolved)
 
-        # adjust for testing
-        if self.cfg.enable_rapidfire_test == 1:
-            starts[i] = starts[i-1] + .0001
-            starts[i+1] = starts[i-1] + .0002
-            starts[i+2] = starts[i-1] + .0003
-        while i < len(starts):
-            # make sure this isn't a satellite we're supposed to ignore
-            if sat_names[i] in self.sat_cfgs:
-                # if maximum pass end time (+ the setup minutes) ends after the next starts, add the "interrupting" satellite to the list
-                if endcompare + jd_utc_time.secs_to_jd(self.cfg.setup_minutes_before_pass/60) > starts[i]:
-                    info_list.append(MyPassInfo())
-                    self.store_pass_info(info_list[-1], idl_data, i)
-                    # update the maximum end time of our list
-                    endcompare = max(endcompare, info_list[-1].end_jd_adjusted)
-                else:
-                    break
-            else:
-                # we skip this satellite since we're not supposed to monitor it
-                self.ignored_sats.append(sat_names[i])
-            i += 1
-
-        # sort the list by priority as well as start time (handles start
-        # note sure how to reverse sort one item but not the other
-        for info in info_list:
-            info.priority = -info.priority
-        info_list = sorted(info_list, key=attrgetter('start_jd_adjusted', 'priority'))
-        for info in info_list:
-            info.priority = -info.priority
-
-        #============ Now go through the list of satellites we have and modify their start/end times based on priorities ============#
-        #Note: We're not worried about what happens if a satellite's start time goes beyond its end time.
-        #This will cause the satellite_pass_manager to send a warning email about the pass being skipped
-        for active_sat in range(len(info_list)-1):
-            # for this satellite, go through all following satellites
-            i = active_sat+1
-            j = 0
-            while j < len(info_list)+100:
-                # check for overlap
-                if info_list[active_sat].end_jd_adjusted > info_list[i].start_jd_adjusted:
-                    # check priorities
-                    if info_list[i].priority > info_list[active_sat].priority:
-                        print("Next sat {0} is higher than {1}".format(i, active_sat))
-                        # if the next is higher, set the previous to end before the next begins
-                        info_list[active_sat].end_jd_adjusted = info_list[i].start_jd_adjusted - jd_utc_time.secs_to_jd(self.cfg.buffer_seconds_transition_high_priority)
-                        info_list[active_sat].is_shortened = 1
-                        break  # we're done evaluating this current satellite, since it has a defined start/end time now
-                    else:
-                        if info_list[i].priority == info_list[active_sat].priority:
-                            print("WARNING: Satellites {0} and {1} have the same priority of {2}! Defaulting to prioritizing the first satellite to get a pass".format(info_list[i].sat_name,info_list[active_sat].sat_name, info_list[i].priority))
-                        # if the next is lower (or equal), set the next to start when the previous finishes
-                        info_list[i].start_jd_adjusted = info_list[active_sat].end_jd_adjusted
-                        info_list[i].is_shortened = 1
-                        # ensure info_list stays sorted by start time (and then by index in case there are identical start times).
-                        # This should automatically cause this satellite to move on if sorting doesn't change things.
-
-                        #print("===============")
-                        #for info in info_list:
-                        #    print(info.sat_name)
-                        #print("to")
-
-                        for info in info_list:
-                            info.priority = -info.priority
-                        info_list = sorted(info_list, key=attrgetter('start_jd_adjusted','priority'))
-                        for info in info_list:
-                            info.priority = -info.priority
-
-                        #for info in info_list:
-                        #    print(info.sat_name)
-                else:
-                    # if there was no overlap, we move on to the next satellite to have a pass start, looking for its overlaps.
-                    break
-                j += 1
-                if j >= len(info_list) + 100:
-                    print("CODING ERROR: Avoided infinite loop in function 'add_pass_conflicts'. Contact developer!")
+        info_list = []
+        for i in resolved.group_members(pass_index):
+            info_list.append(MyPassInfo())
+            self.store_pass_info(info_list[-1], idl_data, i)
+            info_list[-1].start_jd_adjusted = float(resolved.start_jd_adjusted[i])
+            info_list[-1].end_jd_adjusted = float(resolved.end_jd_adjusted[i])
+            info_list[-1].is_shortened = int(resolved.is_shortened[i])
+
+        for [i, j] in resolved.same_priority_conflicts:
+            if resolved.group[i] == resolved.group[pass_index]:
+                print("WARNING: Satellites {0} and {1} have the same priority of {2}! Defaulting to prioritizing the first satellite to get a pass".format(idl_data.sat_names[j], idl_data.sat_names[i], self.sat_cfgs[str(idl_data.sat_names[i])].priority))
 
         #============ Finally, print out a message on the console if there's a conflict ============#
         if len(info_list) > 1:
@@ -427,17 +356,46 @@ class PassManager:
             print(warning_str[0:-2])  # cuts off the extra ", "
         return info_list
 
+    # returns the priority-resolved timeline for the whole schedule, only recomputing it when the schedule has been reloaded
+    def get_resolved_schedule(self, idl_data):
+        if self.resolved_schedule[0] is not idl_data:
+            self.resolved_schedule = (idl_data, resolve_pass_conflicts(idl_data.start_jd, idl_data.end_jd, idl_data.sat_names,
+                                                                       self.get_sat_priorities(),
+                                                                       self.cfg.setup_minutes_before_pass,
+                                                                       self.cfg.buffer_seconds_transition_high_priority))
+        return self.resolved_schedule[1]
+
+    # resolves only the passes from pass_index to the end of its conflict group in the whole-schedule timeline
+    def resolve_schedule_tail(self, idl_data, pass_index, resolved):
+        start_jd = np.array(idl_data.start_jd, dtype=np.float64)
+        last_index = int(resolved.group_members(pass_index).max(initial=pass_index)) + 1
+
+        # adjust for testing: force the next few passes to overlap with this one
+        if self.cfg.enable_rapidfire_test == 1:
+            last_index = min(pass_index + 4, len(start_jd))
+            start_jd[pass_index+1:last_index] = start_jd[pass_index] + .0001 * np.arange(1, last_index - pass_index)
+
+        return resolve_pass_conflicts(start_jd, idl_data.end_jd, idl_data.sat_names, self.get_sat_priorities(),
+                                      self.cfg.setup_minutes_before_pass, self.cfg.buffer_seconds_transition_high_priority,
+                                      first_index=pass_index, last_index=last_index)
+
+    def get_sat_priorities(self):
+        priorities = {}
+        for sat_name in self.sat_cfgs:
+            priorities[sat_name] = self.sat_cfgs[sat_name].priority
+        return priorities
+
     def store_pass_info(self, info, idl_data, pass_index):
         # store info on the incoming pass
-        info.elevation = idl_data.elevation[pass_index]
-        info.length_minutes = idl_data.length_minutes[pass_index]
-        info.sunlight = idl_data.sunlight[pass_index]
+        info.elevation = float(idl_data.elevation[pass_index])
+        info.length_minutes = float(idl_data.length_minutes[pass_index])
+        info.sunlight = int(idl_data.sunlight[pass_index])
         info.sat_name = str(idl_data.sat_names[pass_index])
-        info.station_name = idl_data.station_names[pass_index]
-        info.index = pass_index
-        info.start_jd = idl_data.start_jd[pass_index]
+        info.station_name = str(idl_data.station_names[pass_index])
+        info.index = int(pass_index)
+        info.start_jd = float(idl_data.start_jd[pass_index])
         info.start_jd_adjusted = info.start_jd
-        info.end_jd = idl_data.end_jd[pass_index]
+        info.end_jd = float(idl_data.end_jd[pass_index])
         info.end_jd_adjusted = info.end_jd
         if info.sat_name in self.sat_cfgs:
             info.priority = self.sat_cfgs[info.sat_name].priority
@@ -446,33 +404,41 @@ class PassManager:
     # Assumes the list is sorted.
     # Ignores satellites that aren't in the list of used satellites (configurable by INI file)
     def minutes_until_next_pass(self, start_times, sat_names):
-        ind = 0
         now_jd = jd_utc_time.now_in_jd()  # in fractional days
         #print("current time",now_jd)
         #print("current time in UTC",datetime.datetime.utcnow())
-        passfound = 0
-        for start_time in start_times:
-            # find the first time in the list that's in the future or recent past
-            tdiff = start_time - now_jd
-            acceptable_minutes_from_pass_start = self.cfg.buffer_seconds_after_pass_end / 60 + 1  # if the pass 1 minute ago + our buffer period, we can probably start it
-            acceptable_minutes_from_pass_start = min(8, acceptable_minutes_from_pass_start)  # don't run passes older than ~8 minutes, otherwise we could could run the same pass twice!
-            if tdiff*24*60 > -acceptable_minutes_from_pass_start:
-                if sat_names[ind] in self.sat_cfgs:
-                    passfound = 1
-                    break
-                else:
-                    # we skip this satellite since we're not supposed to monitor it
-                    self.ignored_sats.append(sat_names[ind])
-            ind += 1
+        acceptable_minutes_from_pass_start = self.cfg.buffer_seconds_after_pass_end / 60 + 1  # if the pass 1 minute ago + our buffer period, we can probably start it
+        acceptable_minutes_from_pass_start = min(8, acceptable_minutes_from_pass_start)  # don't run passes older than ~8 minutes, otherwise we could could run the same pass twice!
+        earliest_start_jd = now_jd - acceptable_minutes_from_pass_start / 24 / 60
+
+        # first pass in the list that's in the future or recent past, then the first monitored satellite from there on
+        start_times = np.asarray(start_times)
+        first_ind = int(np.searchsorted(start_times, earliest_start_jd, side='right'))
+        next_monitored = self.get_next_monitored_lookup(sat_names)
+        if first_ind < len(start_times):
+            ind = int(next_monitored[first_ind])
+        else:
+            ind = len(start_times)
+
+        # we skip these satellites since we're not supposed to monitor them
+        for sat_name in np.unique(np.asarray(sat_names)[first_ind:ind]):
+            self.ignored_sats.add(str(sat_name))
 
-        if passfound == 0:
+        if ind >= len(start_times):
             self.email("NoPassTimes")
             minutes = 99999  # Just a large value so that we don't do anything
             ind = -1  # indicates an error to the calling function
         else:
-            minutes = tdiff * 24 * 60  # tdiff is in fractions of a julian day
+            tdiff = start_times[ind] - now_jd
+            minutes = float(tdiff) * 24 * 60  # tdiff is in fractions of a julian day
         return [ind, minutes]
 
+    # returns the next_monitored_index() array for sat_names, only recomputing it when the schedule has been reloaded
+    def get_next_monitored_lookup(self, sat_names):
+        if self.next_monitored_lookup[0] is not sat_names:
+            self.next_monitored_lookup = (sat_names, next_monitored_index(sat_names, self.sat_cfgs.keys()))
+        return self.next_monitored_lookup[1]
+
 
 # creating a struct (not sure if this is "pythonic" or not)
 class MyPassInfo:
@@ -491,17 +457,6 @@ class MyPassInfo:
         self.is_shortened = 0
 
 
-class IdlDataClass:
-    def __init__(self):
-        self.elevation = []
-        self.length_minutes = []
-        self.sunlight = []
-        self.sat_names = []
-        self.station_names = []
-        self.start_jd = []
-        self.end_jd = []
-
-
 # prints out pass information - use "is_prepass" to define whether the pass has started or not
 def print_pass_info(info, minutes, is_prepass):
     txt = "{0} {1}: ".format(timestamp(), info.station_name.capitalize())
@@ -521,6 +476,12 @@ class SatellitePassManager:
         self.email = email_module
         # store a variable for whether or not we're in a pass
         self.is_in_pass = 0
+        # where the Hydra script for the latest pass was archived to (empty if we aren't running Hydra scripts)
+        self.wasrun_scriptloc = ""
+        # set by the PassManager if post-pass work should go to the background pipeline
+        self.post_pass_queue = None
+        # timing of the pass in progress (see pass_metrics.py), written out once the programs are stopped
+        self.pass_metrics = None
 
         if self.cfg.do_monitor_hydra:
             self.hydra_scripts = os.path.join(self.cfg.hydra_dir, 'Scripts')
@@ -532,7 +493,6 @@ class SatellitePassManager:
             self.hydra_script_dest_file = os.path.join(self.hydra_scripts, 'script_to_run_automatically_on_hydra_boot.prc')
             self.hydra_script_src_folder = os.path.join(self.hydra_scripts, 'scripts_to_run_automatically')
             self.default_pass_script = "default_auto_script.prc"
-            self.wasrun_scriptloc = ""
             if not os.path.exists(os.path.join(self.hydra_script_src_folder, self.default_pass_script)):
                 print("\r\nERROR: Initial configuration failed!")
                 print("You should have a 'scripts_to_run_automatically' folder in your Hydra/Scripts directory")
@@ -546,10 +506,29 @@ class SatellitePassManager:
             self.hydra_exe = ExeManagement(self.cfg.hydra_exe_dir,
                                            self.cfg.hydra_exe_name,
                                            1,
-                                           hydra_options=self.cfg.hydra_options)
+                                           hydra_options=self.cfg.hydra_options,
+                                           ready_port=self.cfg.hydra_ready_port,
+                                           ready_log=self.cfg.hydra_ready_log,
+                                           ready_pattern=self.cfg.hydra_ready_pattern,
+                                           supervise=1,
+                                           restart_on_crash=self.cfg.restart_crashed_programs)
+            self.hydra_exe.on_crash = self.program_crashed
+            self.rundir_index = RundirIndex(os.path.join(self.cfg.hydra_dir, 'Rundirs'))
+        # the rundir Hydra made when it was launched for the current pass, and how many times Hydra had been
+        # restarted after a crash at that point
+        self.active_rundir = None
+        self.hydra_restarts_at_launch = 0
 
         if self.cfg.do_monitor_sdr:
-            self.sdr_exe = ExeManagement(self.cfg.sdr_dir, self.cfg.sdr_script_starter_name, 1)
+            # without a readiness check configured, give the SDR a fixed 15 seconds -- it typically takes 8 seconds
+            self.sdr_exe = ExeManagement(self.cfg.sdr_dir, self.cfg.sdr_script_starter_name, 1,
+                                         ready_port=self.cfg.sdr_ready_port,
+                                         ready_log=self.cfg.sdr_ready_log,
+                                         ready_pattern=self.cfg.sdr_ready_pattern,
+                                         ready_delay_seconds=15,
+                                         supervise=1,
+                                         restart_on_crash=self.cfg.restart_crashed_programs)
+            self.sdr_exe.on_crash = self.program_crashed
 
         if self.cfg.do_run_pre_pass_script:
             self.pre_pass_script_exe = ExeManagement(self.cfg.script_dir, self.cfg.pre_pass_script, 1)
@@ -558,9 +537,25 @@ class SatellitePassManager:
             self.post_pass_script_exe = ExeManagement(self.cfg.script_dir, self.cfg.post_pass_script, 1)
 
     def run_pass(self, info, is_quick_exit):
+        self.start_pass(info)
+        self.sleep_until_pass_is_done(info)
+
+        if is_quick_exit == 0:
+            jd_utc_time.sleep(self.global_cfg.buffer_seconds_after_pass_end)
+
+        self.stop_pass_programs()
+        [wasrun_scriptloc, script_name, rundir_path] = self.take_post_pass_inputs()
+        self.queue_post_pass(info, wasrun_scriptloc, script_name, rundir_path)
+
+    # picks and installs the Hydra script for this pass, then launches the pass programs
+    def start_pass(self, info):
         print("\r\n\r\n======================== {0} Prepping for a {1} pass! ========================\r\n".format(timestamp(), info.sat_name))
+        self.pass_metrics = PassMetrics(info, 'pass')
+        self.pass_metrics.set('setup_lead_seconds', (info.start_jd_adjusted - jd_utc_time.now_in_jd()) * 86400)
+        self.pass_metrics.start_span('setup_to_ready')
         if self.cfg.do_send_prepass_email == 1:
-            self.email("PassAboutToOccur")
+            with self.pass_metrics.span('prepass_email'):
+                self.email("PassAboutToOccur")
 
         # Figure out what the next Hydra script to run is
         if self.cfg.do_run_hydra_scripts == 1:
@@ -616,37 +611,85 @@ class SatellitePassManager:
             if self.cfg.do_run_pre_pass_script == 1:
                 self.pre_pass_script_exe.start()
             if self.cfg.do_monitor_sdr == 1:
-                self.sdr_exe.start()
-                time.sleep(15)  # Gives the SDR time to start up -- typically takes 8 seconds
-                self.engage_doppler_correction()
+                with self.pass_metrics.span('sdr_startup'):
+                    self.sdr_exe.start()
+                    self.sdr_exe.wait_until_ready()  # Gives the SDR time to start up
+                with self.pass_metrics.span('doppler_engage'):
+                    self.engage_doppler_correction()
             if self.cfg.do_monitor_hydra == 1:
-                self.hydra_exe.start()  # TODO: Make sure Hydra script has a brief wait in startup script so that the SDR bridges can be sure to be up
-
-        self.sleep_until_pass_is_done(info)
-
-        if is_quick_exit == 0:
-            time.sleep(self.global_cfg.buffer_seconds_after_pass_end)
+                previous_rundir = self.rundir_index.latest()
+                with self.pass_metrics.span('hydra_startup'):
+                    self.hydra_exe.start()  # TODO: Make sure Hydra script has a brief wait in startup script so that the SDR bridges can be sure to be up
+                    self.hydra_exe.wait_until_ready()
+                self.hydra_restarts_at_launch = self.hydra_exe.num_restarts
+                # remember the rundir Hydra just made (if it has made it yet; if not, we look it up after the pass)
+                self.active_rundir = self.rundir_index.latest()
+                if self.active_rundir == previous_rundir:
+                    self.active_rundir = None
+
+        self.pass_metrics.end_span('setup_to_ready')
+        self.pass_metrics.set('ready_lead_seconds', (info.start_jd_adjusted - jd_utc_time.now_in_jd()) * 86400)
+        self.pass_metrics.start_span('pass')
+
+    def stop_pass_programs(self):
+        if self.pass_metrics is not None:
+            self.pass_metrics.end_span('pass')
+            self.pass_metrics.start_span('program_shutdown')
 
         if self.global_cfg.disable_restart_programs == 0:
             if self.cfg.do_monitor_hydra == 1:
                 self.hydra_exe.kill()
-                time.sleep(10)  # give Hydra time to shut down
+                self.hydra_exe.wait_until_stopped(10)  # give Hydra time to shut down
             if self.cfg.do_monitor_sdr == 1:
                 self.sdr_exe.kill()
-                time.sleep(10)  # give the SDR and ruby bridges time to shut down
+                self.sdr_exe.wait_until_stopped(10)  # give the SDR and ruby bridges time to shut down
             if self.cfg.do_run_pre_pass_script == 1:
                 self.pre_pass_script_exe.kill()
 
+        if self.pass_metrics is not None:
+            self.pass_metrics.end_span('program_shutdown')
+            self.pass_metrics.write(self.global_cfg.metrics_file)
+            self.pass_metrics = None
+
+    # returns [wasrun_scriptloc, script_name, rundir_path] for the pass that just ended. Call this as soon as the
+    # programs are stopped, before the next pass can start and replace them.
+    def take_post_pass_inputs(self):
+        rundir_path = None
         if self.cfg.do_monitor_hydra:
-            self.pass_analysis(info)
+            rundir_path = self.active_rundir
+            # Hydra makes a new rundir each time it starts, so if it was restarted after a crash during the pass,
+            # the telemetry and EventLog since the restart are in the latest one
+            if rundir_path is None or self.hydra_exe.num_restarts != self.hydra_restarts_at_launch:
+                rundir_path = self.find_latest_rundir()
+            self.active_rundir = None
+        return [self.wasrun_scriptloc, self.email.script_name, rundir_path]
+
+    # hands the post-pass work for the pass that just ended to the background pipeline (or does it now if there isn't one)
+    def queue_post_pass(self, info, wasrun_scriptloc, script_name, rundir_path):
+        if self.post_pass_queue is not None:
+            self.post_pass_queue.submit(self, info, wasrun_scriptloc, script_name, rundir_path)
+        else:
+            self.post_pass(info, wasrun_scriptloc, rundir_path, script_name)
+
+    # analysis, emails and the post pass script. The script and rundir are passed in because the next pass may
+    # already have replaced them by the time this runs (see post_pass_pipeline.py)
+    def post_pass(self, info, wasrun_scriptloc, rundir_path=None, script_name=None):
+        metrics = PassMetrics(info, 'post_pass')
+        if self.cfg.do_monitor_hydra:
+            self.pass_analysis(info, wasrun_scriptloc, rundir_path, metrics, script_name)
 
         if self.cfg.do_run_post_pass_script:
             print('Starting post pass script: {0} {1}'.format(self.cfg.script_dir, self.cfg.post_pass_script))
-            self.post_pass_script_exe.start()
+            with metrics.span('post_pass_script_start'):
+                self.post_pass_script_exe.start()
+
+        metrics.set('end_to_done_seconds', (jd_utc_time.now_in_jd() - info.end_jd_adjusted) * 86400)
+        metrics.write(self.global_cfg.metrics_file)
 
         print("\r\n********************** {0} Done with {1} pass! **********************\r\n\r\n".format(timestamp(), info.sat_name))
 
     def engage_doppler_correction(self):
+        import pyautogui  # only needed (and only works) on a station PC with a display
         try:
             x, y = pyautogui.locateCenterOnScreen(os.path.join(self.cfg.sdr_dir, 'engage_button.png'), grayscale=True, confidence=0.9)
             pyautogui.click(x + 50, y)  # X-offset accounts for screenshot of button including neighboring UI for unique identification
@@ -654,51 +697,87 @@ class SatellitePassManager:
             print('GPredict Radio Controller must be visible on screen! Click Engage if it is not already and leave the window visible to continue automation.')
             self.email("DopplerEngage")
 
+    def print_pass_status(self, info):
+        t = jd_utc_time.now_in_jd()
+        # check to see if pass has started yet
+        if t < info.start_jd_adjusted:
+            minutes = (info.start_jd_adjusted-t)*24*60
+            print_pass_info(info, minutes, 1)
+        # if it has started, we must not be done waiting yet
+        else:
+            minutes = (info.end_jd_adjusted-t)*24*60
+            print_pass_info(info, minutes, 0)
+
     def sleep_until_pass_is_done(self, info):
         while 1:
-            t = jd_utc_time.now_in_jd()
-            # check to see if pass has started yet
-            if t < info.start_jd_adjusted:
-                minutes = (info.start_jd_adjusted-t)*24*60
-                print_pass_info(info, minutes, 1)
-            # if it has started, we must not be done waiting yet
-            else:
-                minutes = (info.end_jd_adjusted-t)*24*60
-                print_pass_info(info, minutes, 0)
+            self.print_pass_status(info)
 
             # print a message every 60 seconds, but check for pass completion every second
             for i in range(0,60):
-                time.sleep(1)
+                jd_utc_time.sleep(1)
                 if jd_utc_time.now_in_jd() > info.end_jd_adjusted:
                     return
                 if self.global_cfg.enable_rapidfire_test == 1:
-                    time.sleep(10)
+                    jd_utc_time.sleep(10)
                     return
 
     # restarts Hydra
     def kill_hydra(self):
         print("Killing the Hydra process!")
-        time.sleep(1)
         self.hydra_exe.kill()
-        time.sleep(1)
+        self.hydra_exe.wait_until_stopped(10)
 
-    # gets a path to the rundir for the current pass and then has it analyzed
-    def pass_analysis(self, info):
-        rundirs_dir = os.path.join(self.cfg.hydra_dir, 'Rundirs')
-        rundir_list = [f for f in os.listdir(rundirs_dir) if not(os.path.isfile(os.path.join(rundirs_dir, f)))]
-        rundir_list.sort()
+    # called (from the process watcher thread) when Hydra or the SDR exits without us killing it
+    def program_crashed(self, exe):
+        print("WARNING: {0} stopped running in the middle of the pass!".format(exe.exec_name))
+        self.email("ProgramStopped")
 
-        # populate the path in the analysis object
-        results = rundir_analysis.Rundir(os.path.join(rundirs_dir, rundir_list[-1]), os.path.basename(self.wasrun_scriptloc))
-        results.analyze(info, self.cfg)
+    # gets a path to the rundir for the current pass
+    def find_latest_rundir(self):
+        return self.rundir_index.latest()
+
+    # has the rundir for the pass analyzed (the latest rundir, if rundir_path isn't given)
+    def pass_analysis(self, info, wasrun_scriptloc, rundir_path=None, metrics=None, script_name=None):
+        if metrics is None:
+            metrics = PassMetrics(info, 'post_pass')
+        if rundir_path is None:
+            rundir_path = self.find_latest_rundir()
 
-        self.email.PassResults(results, info)
+        # populate the path in the analysis object
+        with metrics.span('analysis'):
+            results = rundir_analysis.Rundir(rundir_path, os.path.basename(wasrun_scriptloc))
+            results.analyze(info, self.cfg)
+        metrics.set('bytes_downlinked', results.bytes_downlinked_data)
+        if results.packet_stats is not None:
+            metrics.set('packets_realtime', results.packet_stats.num_realtime)
+            metrics.set('packets_playback', results.packet_stats.num_playback)
+            metrics.set('packets_corrupted', results.packet_stats.num_corrupted)
+            for packet_type in results.packet_stats.type_counts:
+                metrics.set('packets_{0}'.format(packet_type), results.packet_stats.type_counts[packet_type])
+        metrics.set('num_errors', len(results.errors_array))
+
+        with metrics.span('email'):
+            self.email.PassResults(results, info, script_name, wasrun_scriptloc)
 
 
 # Tracks executables that need to be launched and killed.
 # If the exe is not launchable, set is_launchable to 0. (Example: SATPC32's ServerSDX)
+#
+# Programs that should stay up for the whole pass (Hydra and the SDR) are started with supervise=1. Each process
+# they start gets a watcher thread that blocks on the process exiting (waitpid on Unix, the process handle on
+# Windows), so a crash is noticed the moment it happens rather than on the next poll. If the process exits with a
+# nonzero exit code without kill() being called, on_crash(exe) is called and, if restart_on_crash is 1, the program
+# is restarted after a backoff that doubles with each crash in a row. An exit code of 0 isn't a crash: launcher
+# scripts (like the SDR's) exit once they have started the real programs.
+#
+# wait_until_ready() returns as soon as the program is up, judged by any of these that are configured:
+#   ready_port    - a TCP port on this machine accepts connections
+#   ready_log     - a log file (glob pattern, relative to the exe dir) written since the start contains ready_pattern
+# With neither configured it just waits ready_delay_seconds. A launcher exiting with 0 doesn't stop the checks.
+# The start-to-ready time of every start is kept in ready_latencies.
 class ExeManagement:
-    def __init__(self, dir, name, is_launchable, hydra_options='None'):
+    def __init__(self, dir, name, is_launchable, hydra_options='None', ready_port=0, ready_log='', ready_pattern='',
+                 ready_delay_seconds=0, ready_timeout_seconds=60, supervise=0, restart_on_crash=0):
         self.process = None
         self.exec_dir = dir
         self.exec_name = name
@@ -715,11 +794,71 @@ class ExeManagement:
         if hydra_options is not 'None':
             self.exec_full_path += ' /o {}'.format(hydra_options)
 
+        # readiness checks
+        self.ready_port = ready_port
+        self.ready_log = ready_log
+        self.ready_regex = re.compile(ready_pattern) if len(ready_pattern) > 0 else None
+        self.ready_delay_seconds = ready_delay_seconds
+        self.ready_timeout_seconds = ready_timeout_seconds
+        self.ready_latencies = []
+        self.start_time = 0
+        self.start_perf_counter = 0
+        self.ready_log_filename = None
+        self.ready_log_offset = 0
+        self.ready_log_tail = ''
+
+        # crash handling
+        self.supervise = supervise
+        self.restart_on_crash = restart_on_crash
+        self.on_crash = None
+        self.is_stopping = 0
+        self.num_crashes_in_a_row = 0
+        self.num_restarts = 0
+        self.exit_code = None
+
     def start(self):
+        self.is_stopping = 0
+        self.exit_code = None
+        self.start_time = time.time()
+        self.start_perf_counter = time.perf_counter()
+        self.ready_log_filename = None
+        self.ready_log_offset = 0
+        self.ready_log_tail = ''
         if os.name == 'posix':  # It's Unix (Linux or macOS)
             self.process = Popen(self.exec_full_path, cwd=self.exec_dir, preexec_fn=os.setsid)
         else:
             self.process = Popen(self.exec_full_path, cwd=self.exec_dir)
+        if self.supervise == 1:
+            threading.Thread(target=self.watch_process, args=(self.process,), daemon=True).start()
+
+    # runs in its own thread for each process we start (if supervise is 1)
+    def watch_process(self, process):
+        exit_code = process.wait()
+        if process is not self.process:
+            return
+        self.exit_code = exit_code
+        if self.is_stopping == 1:
+            return
+        if exit_code == 0:
+            print("{0} {1} exited normally".format(timestamp(), self.exec_name))
+            return
+
+        up_seconds = time.perf_counter() - self.start_perf_counter
+        print("{0} {1} exited unexpectedly after {2:.1f} s (exit code {3})".format(timestamp(), self.exec_name, up_seconds, exit_code))
+        if up_seconds > restart_backoff_reset_seconds:
+            self.num_crashes_in_a_row = 0
+        self.num_crashes_in_a_row += 1
+        if self.on_crash is not None:
+            self.on_crash(self)
+
+        if self.restart_on_crash == 1:
+            backoff_seconds = min(restart_backoff_seconds * 2 ** (self.num_crashes_in_a_row - 1), restart_backoff_max_seconds)
+            print("{0} Restarting {1} in {2} s".format(timestamp(), self.exec_name, backoff_seconds))
+            jd_utc_time.sleep(backoff_seconds)
+            # don't restart if we were told to stop (or someone else restarted it) in the meantime
+            if self.is_stopping == 0 and process is self.process:
+                self.num_restarts += 1
+                self.start()
 
     def is_running(self):
         # Check to see if the process identifier exists
@@ -732,10 +871,68 @@ class ExeManagement:
         else:
             return 1
 
+    # blocks until the program is up (see the class comments). Returns 1 if it is, 0 if it exited or timed out.
+    def wait_until_ready(self):
+        if self.ready_port <= 0 and self.ready_regex is None:
+            jd_utc_time.sleep(self.ready_delay_seconds)
+            self.ready_latencies.append(time.perf_counter() - self.start_perf_counter)
+            return 1
+
+        while time.perf_counter() - self.start_perf_counter < self.ready_timeout_seconds:
+            if self.process is not None and self.process.poll() not in [None, 0]:
+                print("{0} {1} exited before it was ready (exit code {2})".format(timestamp(), self.exec_name, self.process.returncode))
+                return 0
+            if self.is_ready():
+                latency = time.perf_counter() - self.start_perf_counter
+                self.ready_latencies.append(latency)
+                print("{0} {1} is ready ({2:.1f} s after start)".format(timestamp(), self.exec_name, latency))
+                return 1
+            time.sleep(ready_check_seconds)
+
+        print("{0} WARNING: {1} was not ready within {2} s. Continuing anyway.".format(timestamp(), self.exec_name, self.ready_timeout_seconds))
+        return 0
+
+    def is_ready(self):
+        if self.ready_port > 0 and not self.is_port_open():
+            return False
+        if self.ready_regex is not None and not self.is_ready_in_log():
+            return False
+        return True
+
+    def is_port_open(self):
+        try:
+            with socket.create_connection(('127.0.0.1', self.ready_port), timeout=ready_check_seconds):
+                return True
+        except OSError:
+            return False
+
+    # reads whatever has been added to the log since the last check and looks for the ready pattern in it
+    def is_ready_in_log(self):
+        if self.ready_log_filename is None:
+            log_files = [f for f in glob.glob(os.path.join(self.exec_dir, self.ready_log)) if os.path.getmtime(f) >= self.start_time - 1]
+            if len(log_files) == 0:
+                return False
+            self.ready_log_filename = max(log_files, key=os.path.getmtime)
+        try:
+            with open(self.ready_log_filename, 'r', errors='replace') as file:
+                file.seek(self.ready_log_offset)
+                new_text = file.read()
+                self.ready_log_offset = file.tell()
+        except OSError:
+            return False
+        # keep the end of the previous read in case the ready line was split between reads
+        text = self.ready_log_tail + new_text
+        self.ready_log_tail = text[-1000:]
+        return self.ready_regex.search(text) is not None
+
     def kill(self):
         if self.process is not None:
+            self.is_stopping = 1
             if os.name == 'posix':  # It's Unix (Linux or macOS)
-                os.killpg(self.process.pid, signal.SIGINT)
+                try:
+                    os.killpg(self.process.pid, signal.SIGINT)
+                except ProcessLookupError:  # it had already exited (e.g. crashed and waiting to be restarted)
+                    pass
             else:  # It's Windows
                 if self.process.poll() is None:  # Will be "None" if nothing has terminated the process
                     self.process.terminate()  # this is the nice way to terminate a Windows process
@@ -744,6 +941,24 @@ class ExeManagement:
 
             print("{0} {1} process was terminated. Will restart before next pass.".format(timestamp(), self.exec_name))
 
+    # blocks until the process has exited (and its ready_port has closed, if it has one), up to timeout_seconds.
+    # Returns 1 if it stopped in time, 0 if not.
+    def wait_until_stopped(self, timeout_seconds):
+        start = time.perf_counter()
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=timeout_seconds)
+            except TimeoutExpired:
+                print("{0} WARNING: {1} did not stop within {2} s".format(timestamp(), self.exec_name, timeout_seconds))
+                return 0
+        if self.ready_port > 0:
+            while self.is_port_open():
+                if time.perf_counter() - start > timeout_seconds:
+                    print("{0} WARNING: port {1} of {2} is still open after {3} s".format(timestamp(), self.ready_port, self.exec_name, timeout_seconds))
+                    return 0
+                time.sleep(ready_check_seconds)
+        return 1
+
 
 if __name__ == '__main__':
     main(*sys.argv)
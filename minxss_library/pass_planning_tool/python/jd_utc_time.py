@@ -1,14 +1,35 @@
 import datetime
+import time
 import jdcal
 
 manual_test = 0
 t_offset = 0
 
+
+# The clock behind now_in_jd() and sleep(). pass_manager_sim.py swaps in a simulated clock so that
+# schedules can be replayed faster than real time.
+class WallClock:
+    @staticmethod
+    def utcnow():
+        return datetime.datetime.utcnow()
+
+    @staticmethod
+    def sleep(seconds):
+        time.sleep(seconds)
+
+
+clock = WallClock()
+
+
+def sleep(seconds):
+    clock.sleep(max(seconds, 0))
+
+
 def now_in_jd():
-    now_utc = datetime.datetime.utcnow()
+    now_utc = clock.utcnow()
     now_jd = jdcal.gcal2jd(now_utc.year, now_utc.month, now_utc.day) #TODO
     now_jd = now_jd[0] + now_jd[1]
-    now_jd = now_jd + now_utc.hour/24 + now_utc.minute/24/60 + now_utc.second/24/60/60
+    now_jd = now_jd + now_utc.hour/24 + now_utc.minute/24/60 + (now_utc.second + now_utc.microsecond/1e6)/24/60/60
 
     now_jd -= t_offset
     return(now_jd)
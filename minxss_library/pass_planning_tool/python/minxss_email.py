@@ -21,6 +21,7 @@ class email(object):
         self.errPassAboutToOccur_jd = 0
         self.errNoPassScript_jd = 0
         self.errNoFile_jd = 0 #generic, couldn't find a file errors
+        self.errProgramStopped_jd = 0 #Hydra/SDR exited in the middle of a pass
         self.script_name = "unchanged, there is a code error"
         self.script_file_location = ""
         #populate email list with default values
@@ -69,11 +70,21 @@ class email(object):
                 email_type = "critical_error"
                 emailtext = "Pass Automation could not engage the Doppler correction. Make sure that the Gpredict Radio Controller window is visible on screen. Click Engage if it is not already. Leave the Radio Controller window visible to continue automation."
 
+        if texttype == "ProgramStopped":
+            tdiff = now_in_jd() - self.errProgramStopped_jd
+            if tdiff * 24 > num_hours_between_emails:
+                self.errProgramStopped_jd = now_in_jd()
+                email_type = "critical_error"
+                emailtext = "A pass program (Hydra or the SDR) stopped running in the middle of a pass! Please check the ground station."
+
         if emailtext != None:
             print(emailtext)
             self.SendEmail(emailtext,email_type,"","")
 
-    def PassResults(self, results, info):
+    # script_name and script_file_location are of the pass being reported, and default to the ones stored last
+    def PassResults(self, results, info, script_name=None, script_file_location=None):
+        if script_name is None:
+            script_name = self.script_name
         #construct the body of the email
         email_body = "{0} Pass completed at station {1}.\r\n".format(info.sat_name, info.station_name)
         if(info.is_shortened == 1):
@@ -89,7 +100,10 @@ class email(object):
         else:
             email_body = email_body + "Length: " + str(round(info.length_minutes,2)) + " minutes\r\n"
         email_body = email_body + "kB data downlinked: " + str(results.bytes_downlinked_data/1000) + "\r\n"
-        email_body = email_body + "Script: " + self.script_name + "\r\n\r\n"
+        if results.packet_stats is not None:
+            email_body = email_body + "Packets: {0} realtime, {1} playback\r\n".format(results.packet_stats.num_realtime, results.packet_stats.num_playback)
+            email_body = email_body + "Packet types: " + results.packet_stats.summary_text() + "\r\n"
+        email_body = email_body + "Script: " + script_name + "\r\n\r\n"
 
         if(len(results.errors_array)>0):
             email_type = "errors_during_pass"
@@ -114,7 +128,7 @@ class email(object):
         #    email_body = email_body + line
         #email_body = email_body + "============================================\r\n\r\n"
 
-        self.SendEmail(email_body, email_type, results.eventlog_filepath, results.csv_filepath)
+        self.SendEmail(email_body, email_type, results.eventlog_filepath, results.csv_filepath, script_file_location)
 
     def StoreScriptName(self,script_name):
         self.script_name = script_name
@@ -123,7 +137,9 @@ class email(object):
         self.script_file_location = script_file_location
 
     # Taken, in part, from: https://docs.python.org/3/library/email-examples.html#email-examples
-    def SendEmail(self, email_body, email_type, eventlog_filepath, csv_filepath):
+    def SendEmail(self, email_body, email_type, eventlog_filepath, csv_filepath, script_file_location=None):
+        if script_file_location is None:
+            script_file_location = self.script_file_location
 
         if(email_type == "critical_error" or email_type == "errors_during_pass"):
             iserror = 1
@@ -184,10 +200,10 @@ class email(object):
                     part['Content-Disposition'] = 'attachment; filename="%s"' % os.path.basename(csv_filepath)
                     msg.attach(part)
 
-            if(os.path.isfile(self.script_file_location)):
-                with open(self.script_file_location, "rb") as file:
-                    part = MIMEApplication(file.read(), Name=os.path.basename(self.script_file_location))
-                    part['Content-Disposition'] = 'attachment; filename="%s"' % os.path.basename(self.script_file_location)
+            if(os.path.isfile(script_file_location)):
+                with open(script_file_location, "rb") as file:
+                    part = MIMEApplication(file.read(), Name=os.path.basename(script_file_location))
+                    part['Content-Disposition'] = 'attachment; filename="%s"' % os.path.basename(script_file_location)
                     msg.attach(part)
 
             if(enable_email == 1):
@@ -0,0 +1,108 @@
+### Runs the automatic pass manager for several ground stations from a single process
+# Usage: python multi_station_manager.py [multi_station_config.ini]
+#
+# Each station listed in multi_station_config.ini gets its own PassManager (its own pass_config-style ini file,
+# satellite configs, Hydra/SDR programs and passes_latest_<STATION>.sav), and each one is driven by its own
+# pass_scheduler.AsyncPassScheduler. All of the schedulers share one event loop, so the stations run their
+# passes concurrently.
+# The stations' resolved schedules are also merged into one timeline (pass_schedule.MergedSchedule), which is
+# printed whenever any station's schedule changes, along with the cross-station handoffs coming up.
+# The handoffs are only reported. Nothing acts on them yet: each station still sets up and tears down its side of
+# a handoff on its own schedule, so the stations can overlap on the same satellite (or leave a gap) around it.
+
+import sys
+import asyncio
+
+import jd_utc_time
+import pass_config
+import pass_scheduler
+import auto_pass_manager
+from pass_schedule import MergedSchedule
+
+# how far ahead the merged schedule printout looks
+merged_schedule_print_hours = 24
+
+
+class MultiStationPassManager:
+    def __init__(self, ini_filename):
+        self.cfg = pass_config.MultiStationConfig(ini_filename)
+
+        self.pass_managers = {}
+        for station_ini_file in self.cfg.station_ini_files:
+            p = auto_pass_manager.PassManager(station_ini_file)
+            station_name = p.cfg.station_name.upper()
+            if station_name in self.pass_managers:
+                print("\r\nERROR: Initial configuration failed!")
+                print("Station {0} is listed more than once (see {1})".format(station_name, station_ini_file))
+                sys.exit()
+            self.pass_managers[station_name] = p
+
+        # the merged schedule and the (idl_data, resolved) pairs it was built from
+        self.merged_schedule = None
+        self.merged_schedule_sources = {}
+
+    def run(self):
+        asyncio.run(self.main_loop())
+
+    async def main_loop(self):
+        tasks = [self.monitor_merged_schedule()]
+        for station_name in self.pass_managers:
+            tasks.append(pass_scheduler.AsyncPassScheduler(self.pass_managers[station_name]).main_loop())
+        await asyncio.gather(*tasks)
+
+    # returns the merged schedule, rebuilding it if any station has loaded a new schedule since the last call
+    def get_merged_schedule(self):
+        station_schedules = {}
+        for station_name in self.pass_managers:
+            p = self.pass_managers[station_name]
+            idl_data = p.schedule_cache.idl_data
+            if idl_data is not None:
+                station_schedules[station_name] = (idl_data, p.get_resolved_schedule(idl_data))
+
+        is_changed = self.merged_schedule is None or station_schedules.keys() != self.merged_schedule_sources.keys()
+        for station_name in station_schedules:
+            if station_name in self.merged_schedule_sources and station_schedules[station_name][1] is not self.merged_schedule_sources[station_name][1]:
+                is_changed = True
+        if is_changed:
+            self.merged_schedule = MergedSchedule(station_schedules)
+            self.merged_schedule_sources = station_schedules
+            self.print_merged_schedule()
+        return self.merged_schedule
+
+    def print_merged_schedule(self):
+        merged = self.merged_schedule
+        now_jd = jd_utc_time.now_in_jd()
+        upcoming = merged.passes_between(now_jd, now_jd + merged_schedule_print_hours / 24)
+        print("\r\n==================== Merged schedule for the next {0} hours ====================".format(merged_schedule_print_hours))
+        for k in upcoming:
+            print("{0:>10s}  {1:>10s}  starts in {2:9.1f} min  length {3:5.1f} min".format(
+                merged.station_names[k], merged.sat_names[k],
+                jd_utc_time.jd_to_minutes(merged.start_jd_adjusted[k] - now_jd),
+                max(jd_utc_time.jd_to_minutes(merged.end_jd_adjusted[k] - merged.start_jd_adjusted[k]), 0)))
+
+        for [k, next_k] in merged.find_handoffs(self.cfg.handoff_minutes):
+            if k in upcoming:
+                print("HANDOFF: {0} from {1} to {2} ({3:.1f} min between the end of one pass and the start of the next)".format(
+                    merged.sat_names[k], merged.station_names[k], merged.station_names[next_k],
+                    jd_utc_time.jd_to_minutes(merged.start_jd_adjusted[next_k] - merged.end_jd_adjusted[k])))
+        print("")
+
+    async def monitor_merged_schedule(self):
+        while 1:
+            self.get_merged_schedule()
+            await asyncio.sleep(pass_scheduler.schedule_check_seconds)
+
+
+def main(script, ini_filename='multi_station_config.ini'):
+    print("\r\n\r\n **************** Initializing Multi-Station Pass Manager ({}) ***************\r\n\r\n".format(auto_pass_manager.__version__))
+    m = MultiStationPassManager(ini_filename)
+    for station_name in m.pass_managers:
+        p = m.pass_managers[station_name]
+        if p.cfg.use_satpc == 1:
+            p.satpc_monitor()
+    print("\r\n\r\n **************** Setup completed successfully for stations: {0} ***************\r\n\r\n".format(', '.join(m.pass_managers.keys())))
+    m.run()
+
+
+if __name__ == '__main__':
+    main(*sys.argv)
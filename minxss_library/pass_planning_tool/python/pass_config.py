@@ -33,7 +33,7 @@ class GenericConfig:
             self.error_handle()
 
         # [computer_config]
-        self.use_satpc = config['computer_config']['use_satpc']
+        self.use_satpc = int(config['computer_config']['use_satpc'])
         
         # [email_config]
         self.email_server = config['email_config']['email_server']
@@ -44,6 +44,13 @@ class GenericConfig:
         self.setup_minutes_before_pass = int(config['pass_config']['setup_minutes_before_pass'])
         self.buffer_seconds_after_pass_end = float(config['pass_config']['buffer_seconds_after_pass_end'])
         self.buffer_seconds_transition_high_priority = float(config['pass_config']['buffer_seconds_transition_high_priority'])
+        # optional so older ini files keep using the original polling main loop
+        self.use_async_scheduler = int(config['pass_config'].get('use_async_scheduler', '0'))
+        # worker threads for post-pass analysis and emails (0 runs them inline, like before) and where their queue is kept
+        self.post_pass_workers = int(config['pass_config'].get('post_pass_workers', '2'))
+        self.post_pass_queue_dir = config['pass_config'].get('post_pass_queue_dir', 'post_pass_queue')
+        # where per-pass timing metrics are appended (see pass_metrics.py). Empty to turn them off
+        self.metrics_file = config['pass_config'].get('metrics_file', 'pass_metrics.jsonl')
 
         # [testing_only]
         self.disable_restart_programs = int(config['testing_only']['disable_restart_programs'])
@@ -56,11 +63,14 @@ class GenericConfig:
             self.satpc_exe_name = config['directories']['satpc_exe_name']
             self.satpc_server_exe_name = config['directories']['satpc_server_exe_name']
             self.satpc_tle_dir = config['directories']['satpc_tle_dir']
+            # optional comma-separated list of other directories that should get a copy of the station's TLE file
+            self.extra_tle_dirs = [d.strip() for d in config['directories'].get('extra_tle_dirs', '').split(',') if len(d.strip()) > 0]
         else: 
             self.satpc_dir = ''
             self.satpc_exe_name = ''
             self.satpc_server_exe_name = ''
             self.satpc_tle_dir = ''
+            self.extra_tle_dirs = []
 
         # [behavior]
         if self.use_satpc == 1:
@@ -102,6 +112,47 @@ class GenericConfig:
             self.error_handle()
 
 
+# Lists the pass_config-style ini files (one per station) to run from a single multi_station_manager process
+class MultiStationConfig(GenericConfig):
+
+    def __init__(self, ini_filename):
+        config = configparser.ConfigParser()
+        print('Reading configuration file: {}/{}'.format(os.getcwd(), ini_filename))
+        config.read(ini_filename)
+
+        # [station_list]
+        self.station_ini_files = []
+        try:
+            for station in config['station_list']:
+                self.station_ini_files.append(config['station_list'][station])
+        except:
+            print("ERROR:", ini_filename, "lacks the section '[station_list]'. This section must list at least one station ini file!")
+            self.error_handle()
+
+        # [handoff_config]
+        self.handoff_minutes = 10.0
+        if config.has_section('handoff_config'):
+            self.handoff_minutes = float(config['handoff_config'].get('handoff_minutes', '10'))
+
+        self.error_check(ini_filename)
+
+    def error_check(self, ini_filename):
+        iserr = 0
+        if len(self.station_ini_files) == 0:
+            print("\r\nERROR: Initial configuration failed!")
+            print("[" + ini_filename + "] No station ini files are listed under [station_list]\r\n")
+            iserr = 1
+        for station_ini_file in self.station_ini_files:
+            if not os.path.exists(station_ini_file):
+                print("\r\nERROR: Initial configuration failed!")
+                print("[" + ini_filename + "] station ini file does not exist! Listed as: ")
+                print(station_ini_file)
+                iserr = 1
+
+        if iserr == 1:
+            self.error_handle()
+
+
 # inherits from generic_config so we can share error handling
 class SatelliteConfig(GenericConfig):
 
@@ -158,6 +209,15 @@ class SatelliteConfig(GenericConfig):
         self.post_pass_script = config['external_scripts']['post_pass_script']
         self.sdr_script_starter_name = config['executables']['sdr_script_starter_name']
 
+        # optional readiness checks for Hydra and the SDR (see ExeManagement in auto_pass_manager.py)
+        self.hydra_ready_port = int(config['executables'].get('hydra_ready_port', '0'))
+        self.hydra_ready_log = config['executables'].get('hydra_ready_log', '')
+        self.hydra_ready_pattern = config['executables'].get('hydra_ready_pattern', '')
+        self.sdr_ready_port = int(config['executables'].get('sdr_ready_port', '0'))
+        self.sdr_ready_log = config['executables'].get('sdr_ready_log', '')
+        self.sdr_ready_pattern = config['executables'].get('sdr_ready_pattern', '')
+        self.restart_crashed_programs = int(config['behavior'].get('restart_crashed_programs', '0'))
+
         self.error_check(ini_filename)
 
     def error_check(self, ini_filename):
@@ -0,0 +1,428 @@
+### Time-warp simulator and benchmarks for the automatic pass manager
+# Usage:
+#   python pass_manager_sim.py replay <passes_latest_*.sav file or folder of them> [days] [SAT1=priority,SAT2=priority,...]
+#   python pass_manager_sim.py benchmark [passes_latest_*.sav file]
+#
+# "replay" runs the real PassManager/SatellitePassManager code (the polling main loop from auto_pass_manager.py)
+# against archived pass schedules, with:
+#   - a simulated clock (jd_utc_time.clock), so every sleep returns immediately and just advances the time
+#   - stub executables in place of ExeManagement. The stub "Hydra" writes a small rundir (EventLog + tlm file)
+#     when it starts, so the post-pass analysis runs too
+#   - a fake email module that records the emails instead of sending them
+# If several .sav files are given, each one takes over once the simulated time reaches its first pass, like the
+# daily schedule updates on the station PC. Satellites monitored default to every satellite in the schedules
+# (all at priority 5); pass SAT=priority pairs to pick them.
+# The pass manager's own console output goes to pass_manager_sim.log in the work folder; the scheduling
+# decisions go to pass_decisions.csv there and a summary is printed at the end.
+#
+# "benchmark" times conflict resolution and the next-pass lookup on a schedule (the given .sav file, or a
+# synthetic week of passes) tiled out to 10x, 100x and 1000x its size.
+
+import os
+import sys
+import csv
+import time
+import shutil
+import datetime
+import tempfile
+import contextlib
+import jdcal
+import numpy as np
+
+import jd_utc_time
+import minxss_email
+import auto_pass_manager
+from pass_schedule import IdlDataClass, PassScheduleCache, resolve_pass_conflicts, next_monitored_index
+
+default_priority = 5
+benchmark_scales = [10, 100, 1000]
+# number of random "now" times used to time the next-pass lookup
+benchmark_num_lookups = 1000
+# size of each stub Hydra tlm file
+stub_tlm_bytes = 50000
+
+
+def jd_to_datetime(jd):
+    [year, month, day, fraction] = jdcal.jd2gcal(jdcal.MJD_0, jd - jdcal.MJD_0)
+    return datetime.datetime(year, month, day) + datetime.timedelta(days=fraction)
+
+
+# Stands in for jd_utc_time.WallClock. Sleeping just moves the simulated time forward.
+class SimulatedClock:
+    def __init__(self, start_jd):
+        self.now = jd_to_datetime(start_jd)
+        self.seconds_slept = 0
+
+    def utcnow(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += datetime.timedelta(seconds=seconds)
+        self.seconds_slept += seconds
+
+
+# Stands in for auto_pass_manager.ExeManagement. Records when programs are started and killed.
+# A stub Hydra (anything started with hydra_options) creates a rundir like the real one does.
+class StubExe:
+    log = []  # (jd, exe name, 'start' or 'kill'), shared by all stubs
+
+    def __init__(self, dir, name, is_launchable, hydra_options='None', **readiness_options):
+        self.exec_dir = dir
+        self.exec_name = name
+        self.is_hydra = hydra_options != 'None'
+        self.tlm_prefix = hydra_options
+        self.running = 0
+        self.on_crash = None
+        self.num_restarts = 0
+        self.ready_latencies = []
+
+    def start(self):
+        self.running = 1
+        StubExe.log.append((jd_utc_time.now_in_jd(), self.exec_name, 'start'))
+        if self.is_hydra:
+            self.make_rundir()
+
+    def is_running(self):
+        return self.running
+
+    def kill(self):
+        self.running = 0
+        StubExe.log.append((jd_utc_time.now_in_jd(), self.exec_name, 'kill'))
+
+    # the stub programs are up (and down) immediately
+    def wait_until_ready(self):
+        self.ready_latencies.append(0)
+        return 1
+
+    def wait_until_stopped(self, timeout_seconds):
+        return 1
+
+    def make_rundir(self):
+        now = jd_utc_time.clock.utcnow()
+        rundir = os.path.join(self.exec_dir, 'Rundirs', now.strftime('%Y_%j_%H_%M_%S'))
+        os.makedirs(rundir, exist_ok=True)
+        with open(os.path.join(rundir, 'EventLog_' + now.strftime('%Y_%j_%H_%M_%S') + '.txt'), 'w') as file:
+            file.write("{0} cmdTry: 3\n".format(now))
+            file.write("{0} cmdSucceed: 3\n".format(now))
+            file.write("{0} Done with script Scripts\\script_to_run_automatically_on_hydra_boot.prc\n".format(now))
+        with open(os.path.join(rundir, self.tlm_prefix + now.strftime('%Y_%j_%H_%M_%S') + '.out'), 'wb') as file:
+            file.write(bytes(stub_tlm_bytes))
+
+
+# Stands in for minxss_email.email. Keeps the real throttling logic, but records emails instead of sending them.
+class FakeEmail(minxss_email.email):
+    sent = []  # (jd, satellite, email type), shared by all instances
+
+    def SendEmail(self, email_body, email_type, eventlog_filepath, csv_filepath, script_file_location=None):
+        FakeEmail.sent.append((jd_utc_time.now_in_jd(), self.sat_name, email_type))
+
+
+# Serves the pass schedules being replayed, in place of reading passes_latest_<STATION>.sav.
+# Each schedule becomes active once the simulated time reaches its first pass.
+class ReplayScheduleCache(PassScheduleCache):
+    def __init__(self, schedules):
+        PassScheduleCache.__init__(self)
+        self.schedules = sorted(schedules, key=lambda idl_data: idl_data.start_jd[0])
+        self.first_start_jd = np.array([idl_data.start_jd[0] for idl_data in self.schedules])
+
+    def load(self, passes_idl_file):
+        active = max(int(np.searchsorted(self.first_start_jd, jd_utc_time.now_in_jd(), side='right')) - 1, 0)
+        if self.idl_data is not self.schedules[active]:
+            self.idl_data = self.schedules[active]
+            self.num_reloads += 1
+        return self.idl_data
+
+
+def load_schedules(sav_path):
+    if os.path.isdir(sav_path):
+        filenames = [os.path.join(sav_path, f) for f in sorted(os.listdir(sav_path)) if f.endswith('.sav')]
+    else:
+        filenames = [sav_path]
+    schedules = []
+    for filename in filenames:
+        idl_data = PassScheduleCache().load(filename)
+        if len(idl_data.start_jd) > 0:
+            schedules.append(idl_data)
+    return schedules
+
+
+# Writes the ini files and folders the real config classes check for, then builds a PassManager on top of them
+# with the stub executables and fake emails. Returns the PassManager.
+# The pass managers make all of their programs and email modules when they are built, so the stubs are only
+# swapped into auto_pass_manager/minxss_email for that, and the real ones are put back before returning.
+def build_sim_pass_manager(work_dir, station_name, sat_priorities):
+    tle_dir = os.path.join(work_dir, 'tle')
+    os.makedirs(os.path.join(tle_dir, station_name), exist_ok=True)
+
+    sat_lines = []
+    for sat_name in sat_priorities:
+        hydra_dir = os.path.join(work_dir, 'hydra_' + sat_name)
+        scripts_dir = os.path.join(hydra_dir, 'Scripts', 'scripts_to_run_automatically')
+        os.makedirs(scripts_dir, exist_ok=True)
+        os.makedirs(os.path.join(hydra_dir, 'Rundirs'), exist_ok=True)
+        with open(os.path.join(scripts_dir, 'default_auto_script.prc'), 'w') as file:
+            file.write('; stub pass script\n')
+
+        sat_ini = os.path.join(work_dir, sat_name + '_config.ini')
+        with open(sat_ini, 'w') as file:
+            file.write('[satellite]\nsat_name = {0}\npriority = {1}\n'.format(sat_name, sat_priorities[sat_name]))
+            file.write('[email_list_info]\nemail_1 = sim@localhost\n[email_list_error_only]\n')
+            file.write('[email_config]\ndo_send_analysis_email = 1\ndo_send_prepass_email = 1\n')
+            file.write('elevation_to_expect_data = 20\nmin_expected_data = 1\n')
+            file.write('[behavior]\ndo_monitor_hydra = 1\ndo_run_hydra_scripts = 1\ndo_monitor_sdr = 0\n')
+            file.write('do_run_pre_pass_script = 0\ndo_run_post_pass_script = 0\n')
+            file.write('[directories]\nhydra_dir = {0}\nhydra_exe_dir = {0}\nscript_dir = {0}\nsdr_dir = {0}\n'.format(hydra_dir))
+            file.write('[executables]\nhydra_exe_name = hydra_stub.exe\nhydra_options = tlm_{0}_\n'.format(sat_name))
+            file.write('hydra_output_filename_prefix = tlm_{0}_\nsdr_script_starter_name = sdr_stub\n'.format(sat_name))
+            file.write('[external_scripts]\npre_pass_script = none\npost_pass_script = none\n')
+        sat_lines.append('sat{0}_ini = {1}\n'.format(len(sat_lines) + 1, sat_ini))
+
+    pass_ini = os.path.join(work_dir, 'pass_config.ini')
+    with open(pass_ini, 'w') as file:
+        file.write('[overview]\nstation_name = {0}\n[satellite_list]\n'.format(station_name))
+        file.writelines(sat_lines)
+        file.write('[email_list]\nemail_1 = sim@localhost\n[computer_config]\nuse_satpc = 0\n')
+        file.write('[email_config]\nemail_server = localhost\nemail_username = sim@localhost\nemail_password = none\n')
+        file.write('[pass_config]\nsetup_minutes_before_pass = 2\nbuffer_seconds_after_pass_end = 60\n')
+        file.write('buffer_seconds_transition_high_priority = 5\nuse_async_scheduler = 0\n')
+        file.write('post_pass_workers = 2\npost_pass_queue_dir = {0}\n'.format(os.path.join(work_dir, 'post_pass_queue')))
+        file.write('metrics_file = {0}\n'.format(os.path.join(work_dir, 'pass_metrics.jsonl')))
+        file.write('[directories]\ntle_dir = {0}\n[behavior]\ndo_update_satpc_tle = 0\n'.format(tle_dir))
+        file.write('[testing_only]\ndisable_restart_programs = 0\nenable_rapidfire_test = 0\n')
+
+    with stub_programs():
+        return auto_pass_manager.PassManager(pass_ini)
+
+
+@contextlib.contextmanager
+def stub_programs():
+    real = [auto_pass_manager.ExeManagement, minxss_email.email]
+    auto_pass_manager.ExeManagement = StubExe
+    minxss_email.email = FakeEmail
+    try:
+        yield
+    finally:
+        [auto_pass_manager.ExeManagement, minxss_email.email] = real
+
+
+# Wraps each satellite pass manager's run_pass so every pass that gets run is recorded in decisions
+def record_decisions(p, decisions):
+    for sat_name in p.sat_pass_managers:
+        sat_pass_manager = p.sat_pass_managers[sat_name]
+
+        def run_pass(info, is_quick_exit, run_pass_original=sat_pass_manager.run_pass):
+            setup_jd = jd_utc_time.now_in_jd()
+            run_pass_original(info, is_quick_exit)
+            decisions.append({'sat_name': info.sat_name,
+                              'start_jd': info.start_jd,
+                              'end_jd': info.end_jd,
+                              'start_jd_adjusted': info.start_jd_adjusted,
+                              'end_jd_adjusted': info.end_jd_adjusted,
+                              'is_shortened': info.is_shortened,
+                              'is_quick_exit': is_quick_exit,
+                              'setup_jd': setup_jd,
+                              'done_jd': jd_utc_time.now_in_jd()})
+        sat_pass_manager.run_pass = run_pass
+
+
+def replay(sav_path, days=None, sat_priorities=None, work_dir=None):
+    schedules = load_schedules(sav_path)
+    if len(schedules) == 0:
+        print("No passes found in", sav_path)
+        return None
+    if sat_priorities is None:
+        sat_priorities = {}
+        for idl_data in schedules:
+            for sat_name in np.unique(idl_data.sat_names):
+                sat_priorities[str(sat_name)] = default_priority
+    if work_dir is None:
+        work_dir = tempfile.mkdtemp(prefix='pass_manager_sim_')
+
+    start_jd = schedules[0].start_jd[0] - 1 / 24  # start an hour before the first pass
+    stop_jd = max(idl_data.end_jd[-1] for idl_data in schedules)
+    if days is not None:
+        stop_jd = min(stop_jd, start_jd + float(days))
+
+    wall_clock = jd_utc_time.clock
+    jd_utc_time.clock = SimulatedClock(start_jd)
+    StubExe.log = []
+    FakeEmail.sent = []
+    decisions = []
+    wall_start = time.perf_counter()
+    try:
+        with open(os.path.join(work_dir, 'pass_manager_sim.log'), 'w') as log_file, contextlib.redirect_stdout(log_file):
+            p = build_sim_pass_manager(work_dir, str(schedules[0].station_names[0]).upper(), sat_priorities)
+            p.schedule_cache = ReplayScheduleCache(schedules)
+            record_decisions(p, decisions)
+            auto_pass_manager.run_polling_loop(p, stop_jd)
+            if p.post_pass_queue is not None:
+                p.post_pass_queue.wait_until_empty()
+    finally:
+        wall_seconds = time.perf_counter() - wall_start
+        jd_utc_time.clock = wall_clock
+
+    write_decisions(os.path.join(work_dir, 'pass_decisions.csv'), decisions)
+    summary = summarize_replay(schedules, sat_priorities, decisions, start_jd, stop_jd, wall_seconds)
+    print_replay_summary(summary, work_dir)
+    return summary
+
+
+def write_decisions(csv_filename, decisions):
+    columns = ['sat_name', 'start_jd', 'end_jd', 'start_jd_adjusted', 'end_jd_adjusted', 'is_shortened',
+               'is_quick_exit', 'setup_jd', 'done_jd', 'setup_lead_minutes']
+    with open(csv_filename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(columns)
+        for decision in decisions:
+            decision['setup_lead_minutes'] = jd_utc_time.jd_to_minutes(decision['start_jd_adjusted'] - decision['setup_jd'])
+            writer.writerow([decision[column] for column in columns])
+
+
+def summarize_replay(schedules, sat_priorities, decisions, start_jd, stop_jd, wall_seconds):
+    # every monitored pass that started during the replay, across all of the schedules (they overlap)
+    scheduled = set()
+    for idl_data in schedules:
+        for i in np.flatnonzero((idl_data.start_jd >= start_jd) & (idl_data.end_jd <= stop_jd)):
+            if str(idl_data.sat_names[i]) in sat_priorities:
+                scheduled.add((str(idl_data.sat_names[i]), round(float(idl_data.start_jd[i]), 5)))
+    run = set((decision['sat_name'], round(decision['start_jd'], 5)) for decision in decisions)
+
+    setup_lead_minutes = np.array([jd_utc_time.jd_to_minutes(d['start_jd_adjusted'] - d['setup_jd']) for d in decisions])
+    is_canceled = np.array([d['end_jd_adjusted'] <= d['start_jd_adjusted'] for d in decisions], dtype=bool)
+    is_shortened = np.array([d['is_shortened'] == 1 for d in decisions], dtype=bool)
+    email_counts = {}
+    for [jd, sat_name, email_type] in FakeEmail.sent:
+        email_counts[email_type] = email_counts.get(email_type, 0) + 1
+
+    summary = {'simulated_days': stop_jd - start_jd,
+               'wall_seconds': wall_seconds,
+               'passes_scheduled': len(scheduled),
+               'passes_run': len(decisions),
+               'passes_missed': len(scheduled - run),
+               'passes_shortened': int(np.sum(is_shortened & ~is_canceled)),
+               'passes_canceled': int(np.sum(is_canceled)),
+               'program_starts': sum(1 for entry in StubExe.log if entry[2] == 'start'),
+               'emails': email_counts}
+    if len(decisions) > 0:
+        summary['setup_lead_minutes_min'] = float(np.min(setup_lead_minutes))
+        summary['setup_lead_minutes_mean'] = float(np.mean(setup_lead_minutes))
+        summary['setup_lead_minutes_max'] = float(np.max(setup_lead_minutes))
+        summary['passes_set_up_late'] = int(np.sum(setup_lead_minutes < 0))
+    return summary
+
+
+def print_replay_summary(summary, work_dir):
+    print("\r\n==================== Pass manager replay ====================")
+    print("Simulated {0:.2f} days in {1:.2f} s of wall time ({2:.0f}x real time)".format(
+        summary['simulated_days'], summary['wall_seconds'], summary['simulated_days'] * 86400 / max(summary['wall_seconds'], 1e-9)))
+    for key in summary:
+        if key not in ['simulated_days', 'wall_seconds']:
+            print("{0:>26s}: {1}".format(key, summary[key]))
+    print("Decisions and pass manager output are in:", work_dir)
+
+
+# a week of made-up passes: each satellite gets about 6 passes a day, 5 to 12 minutes long
+def synthetic_schedule(sat_names=('MINXSS1', 'MINXSS2', 'CSIM', 'QB50', 'DAXSS'), num_days=7, start_jd=2459000.5, seed=0):
+    rng = np.random.RandomState(seed)
+    num_passes = int(len(sat_names) * 6 * num_days)
+    idl_data = IdlDataClass()
+    idl_data.start_jd = np.sort(start_jd + rng.uniform(0, num_days, num_passes))
+    idl_data.length_minutes = rng.uniform(5, 12, num_passes)
+    idl_data.end_jd = idl_data.start_jd + idl_data.length_minutes / 24 / 60
+    idl_data.elevation = rng.uniform(0, 90, num_passes)
+    idl_data.sunlight = rng.randint(0, 2, num_passes)
+    idl_data.sat_names = np.array(sat_names)[rng.randint(0, len(sat_names), num_passes)]
+    idl_data.station_names = np.full(num_passes, 'BOULDER')
+    return idl_data
+
+
+# repeats a schedule scale times back to back
+def tile_schedule(idl_data, scale):
+    span_jd = idl_data.end_jd[-1] - idl_data.start_jd[0] + 1
+    offsets = np.repeat(np.arange(scale) * span_jd, len(idl_data.start_jd))
+    tiled = IdlDataClass()
+    tiled.start_jd = np.tile(idl_data.start_jd, scale) + offsets
+    tiled.end_jd = np.tile(idl_data.end_jd, scale) + offsets
+    tiled.elevation = np.tile(idl_data.elevation, scale)
+    tiled.length_minutes = np.tile(idl_data.length_minutes, scale)
+    tiled.sunlight = np.tile(idl_data.sunlight, scale)
+    tiled.sat_names = np.tile(idl_data.sat_names, scale)
+    tiled.station_names = np.tile(idl_data.station_names, scale)
+    return tiled
+
+
+def benchmark(sav_filename=None, work_dir=None):
+    if sav_filename is None:
+        base = synthetic_schedule()
+    else:
+        base = PassScheduleCache().load(sav_filename)
+    sat_names = [str(sat_name) for sat_name in np.unique(base.sat_names)]
+    # monitor all but one satellite so the lookup has passes to skip
+    sat_priorities = {}
+    for i in range(max(len(sat_names) - 1, 1)):
+        sat_priorities[sat_names[i]] = default_priority - i % 3
+    if work_dir is None:
+        work_dir = tempfile.mkdtemp(prefix='pass_manager_bench_')
+
+    wall_clock = jd_utc_time.clock
+    jd_utc_time.clock = SimulatedClock(base.start_jd[0])
+    results = []
+    try:
+        with open(os.path.join(work_dir, 'pass_manager_bench.log'), 'w') as log_file, contextlib.redirect_stdout(log_file):
+            p = build_sim_pass_manager(work_dir, str(base.station_names[0]).upper(), sat_priorities)
+            for scale in [1] + benchmark_scales:
+                idl_data = tile_schedule(base, scale)
+
+                t0 = time.perf_counter()
+                resolve_pass_conflicts(idl_data.start_jd, idl_data.end_jd, idl_data.sat_names, p.get_sat_priorities(),
+                                       p.cfg.setup_minutes_before_pass, p.cfg.buffer_seconds_transition_high_priority)
+                resolve_seconds = time.perf_counter() - t0
+
+                t0 = time.perf_counter()
+                next_monitored_index(idl_data.sat_names, p.sat_cfgs.keys())
+                index_seconds = time.perf_counter() - t0
+
+                lookup_jds = np.random.RandomState(scale).uniform(idl_data.start_jd[0], idl_data.end_jd[-1], benchmark_num_lookups)
+                t0 = time.perf_counter()
+                for lookup_jd in lookup_jds:
+                    jd_utc_time.clock.now = jd_to_datetime(lookup_jd)
+                    p.minutes_until_next_pass(idl_data.start_jd, idl_data.sat_names)
+                lookup_seconds = (time.perf_counter() - t0) / benchmark_num_lookups
+
+                results.append((scale, len(idl_data.start_jd), resolve_seconds, index_seconds, lookup_seconds))
+    finally:
+        jd_utc_time.clock = wall_clock
+
+    print("\r\n==================== Pass manager benchmark ====================")
+    print("Base schedule: {0} ({1} passes)".format(sav_filename if sav_filename is not None else 'synthetic week', len(base.start_jd)))
+    print("{0:>6s} {1:>10s} {2:>16s} {3:>18s} {4:>18s}".format('scale', 'passes', 'resolve (ms)', 'lookup index (ms)', 'next pass (us)'))
+    for [scale, num_passes, resolve_seconds, index_seconds, lookup_seconds] in results:
+        print("{0:>5d}x {1:>10d} {2:>16.2f} {3:>18.2f} {4:>18.1f}".format(scale, num_passes, resolve_seconds * 1e3, index_seconds * 1e3, lookup_seconds * 1e6))
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def parse_priorities(text):
+    sat_priorities = {}
+    for item in text.split(','):
+        [sat_name, priority] = item.split('=')
+        sat_priorities[sat_name.strip()] = int(priority)
+    return sat_priorities
+
+
+def main(script, mode='benchmark', *args):
+    if mode == 'replay':
+        if len(args) == 0:
+            print("Usage: python pass_manager_sim.py replay <.sav file or folder> [days] [SAT1=priority,SAT2=priority,...]")
+            return
+        days = float(args[1]) if len(args) > 1 else None
+        sat_priorities = parse_priorities(args[2]) if len(args) > 2 else None
+        replay(args[0], days, sat_priorities)
+    elif mode == 'benchmark':
+        benchmark(*args)
+    else:
+        print("Unknown mode '{0}'. Use 'replay' or 'benchmark'.".format(mode))
+
+
+if __name__ == '__main__':
+    main(*sys.argv)
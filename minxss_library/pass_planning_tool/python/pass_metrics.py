@@ -0,0 +1,129 @@
+### Per-pass timing metrics
+# Usage: python pass_metrics.py [pass_metrics.jsonl] [sat_name]
+#
+# SatellitePassManager times each step of a pass (SDR startup, doppler engage, Hydra startup, the pass itself,
+# shutting the programs down, rundir analysis, emails) and appends one JSON line per stage to the metrics file
+# set by "metrics_file" under [pass_config] in pass_config.ini:
+#   {"sat_name": "MINXSS-2", "station_name": "boulder", "pass_start_jd": 2458470.5, "stage": "pass",
+#    "spans": {"sdr_startup": 8.2, "doppler_engage": 0.4, ...}, "values": {"setup_lead_seconds": 120.0, ...}}
+# Times come from jd_utc_time's clock, so simulated passes (pass_manager_sim.py) get simulated times.
+# Run this file to get a summary of the metrics file (count, mean, median, 90th percentile and max of everything).
+
+import sys
+import json
+import datetime
+import threading
+import numpy as np
+
+import jd_utc_time
+
+# passes for different satellites (and their post-pass jobs) finish in different threads
+file_lock = threading.Lock()
+
+
+# seconds since 1970 by jd_utc_time's clock
+def clock_seconds():
+    return (jd_utc_time.clock.utcnow() - datetime.datetime(1970, 1, 1)).total_seconds()
+
+
+class PassMetrics:
+    def __init__(self, info, stage):
+        self.record = {'sat_name': info.sat_name,
+                       'station_name': info.station_name,
+                       'pass_start_jd': float(info.start_jd_adjusted),
+                       'stage': stage,
+                       'recorded_jd': None,
+                       'spans': {},
+                       'values': {}}
+        self.span_starts = {}
+
+    def start_span(self, name):
+        self.span_starts[name] = clock_seconds()
+
+    def end_span(self, name):
+        if name in self.span_starts:
+            self.record['spans'][name] = clock_seconds() - self.span_starts.pop(name)
+
+    # times a block of code: "with metrics.span('sdr_startup'):"
+    def span(self, name):
+        return MetricsSpan(self, name)
+
+    def set(self, name, value):
+        self.record['values'][name] = value
+
+    # appends the record to filename (does nothing if filename is empty)
+    def write(self, filename):
+        if len(filename) == 0:
+            return
+        self.record['recorded_jd'] = jd_utc_time.now_in_jd()
+        line = json.dumps(self.record) + '\n'
+        with file_lock:
+            with open(filename, 'a') as file:
+                file.write(line)
+
+
+class MetricsSpan:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.metrics.start_span(self.name)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics.end_span(self.name)
+        return False
+
+
+def read_metrics(filename, sat_name=None):
+    records = []
+    with open(filename, 'r') as file:
+        for line in file:
+            if len(line.strip()) == 0:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a crash
+            if sat_name is None or record['sat_name'] == sat_name:
+                records.append(record)
+    return records
+
+
+# returns {(stage, 'spans' or 'values', name): array of every recorded value}
+def collect_metrics(records):
+    collected = {}
+    for record in records:
+        for kind in ['spans', 'values']:
+            for name in record[kind]:
+                value = record[kind][name]
+                if isinstance(value, (int, float)):
+                    collected.setdefault((record['stage'], kind, name), []).append(value)
+    for key in collected:
+        collected[key] = np.array(collected[key], dtype=float)
+    return collected
+
+
+def print_summary(records):
+    num_passes = len(set((r['sat_name'], r['pass_start_jd']) for r in records))
+    print("{0} passes, {1} records".format(num_passes, len(records)))
+    collected = collect_metrics(records)
+    print("{0:>10s} {1:>28s} {2:>6s} {3:>10s} {4:>10s} {5:>10s} {6:>10s}".format('stage', 'name', 'count', 'mean', 'median', 'p90', 'max'))
+    for key in sorted(collected):
+        values = collected[key]
+        name = key[2] + (' (s)' if key[1] == 'spans' else '')
+        print("{0:>10s} {1:>28s} {2:6d} {3:10.2f} {4:10.2f} {5:10.2f} {6:10.2f}".format(
+            key[0], name, len(values), np.mean(values), np.median(values), np.percentile(values, 90), np.max(values)))
+
+
+def main(script, filename='pass_metrics.jsonl', sat_name=None):
+    records = read_metrics(filename, sat_name)
+    if len(records) == 0:
+        print("No metrics in {0}".format(filename))
+        return
+    print_summary(records)
+
+
+if __name__ == '__main__':
+    main(*sys.argv)
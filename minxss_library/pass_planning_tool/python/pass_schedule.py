@@ -0,0 +1,283 @@
+import os
+import sys
+import heapq
+import numpy as np
+from scipy.io.idl import readsav
+
+import jd_utc_time
+
+
+# Pass schedule loaded from a passes_latest_<STATION>.sav file.
+# The loader fills every field with a NumPy array (one element per pass), but plain lists work too (see PassManagerTests).
+class IdlDataClass:
+    def __init__(self):
+        self.elevation = []
+        self.length_minutes = []
+        self.sunlight = []
+        self.sat_names = []
+        self.station_names = []
+        self.start_jd = []
+        self.end_jd = []
+
+
+# Keeps the last parsed pass schedule in memory and only calls readsav again when the .sav file changes on disk.
+# The file's mtime and size are used as its signature, which is enough to catch Dropbox replacing the file.
+class PassScheduleCache:
+    def __init__(self):
+        self.filename = None
+        self.file_signature = None
+        self.idl_data = None
+        self.num_reloads = 0
+
+    # returns the IdlDataClass for passes_idl_file, re-reading it only if it is new or has changed.
+    # Raises OSError (or whatever readsav raises) if the file is missing or can't be parsed. In that case the
+    # previous schedule is left in self.idl_data and the file will be tried again on the next call.
+    def load(self, passes_idl_file):
+        file_stat = os.stat(passes_idl_file)
+        file_signature = (file_stat.st_mtime_ns, file_stat.st_size)
+        if self.idl_data is not None and passes_idl_file == self.filename and file_signature == self.file_signature:
+            return self.idl_data
+
+        idl_data_raw = readsav(passes_idl_file)
+
+        #print(idl_data_raw.PASSES.SATELLITE_NAME)
+        # DURATION_MINUTES	10.349999
+        # END_DATE	2016032.0851736106
+        # END_JD	2457419.5851736111
+        # END_TIME	7358.9999556541443
+        # MAX_DATE	2016032.0815972220
+        # MAX_ELEVATION	38.373653
+        # MAX_JD	2457419.5815972220
+        # MAX_TIME	7049.9999821186066
+        # START_DATE	2016032.0779861109
+        # START_JD	2457419.5779861109
+        # START_TIME	6737.9999846220016
+        # SUNLIGHT	0 [0=none, 1=sun]
+        # DIR_EW    (passing east [0] or passing west [1] of the station)
+        # DIR_NS   (passing North [0] or passing South [1] of the station)
+        # SATELLITE_NAME    b'MINXSS1'
+        # STATION_NAME      b'BOULDER'
+
+        passes = idl_data_raw.PASSES
+        idl_data = IdlDataClass()
+        idl_data.elevation = np.asarray(passes.MAX_ELEVATION, dtype=np.float64)
+        idl_data.length_minutes = np.asarray(passes.DURATION_MINUTES, dtype=np.float64)
+        idl_data.sunlight = np.asarray(passes.SUNLIGHT, dtype=np.int64)
+        # names come out of readsav as bytes (b'MINXSS1'), so decode them once here
+        idl_data.sat_names = np.array([decode_idl_string(name) for name in passes.SATELLITE_NAME])
+        idl_data.station_names = np.array([decode_idl_string(name) for name in passes.STATION_NAME])
+        idl_data.start_jd = np.asarray(passes.START_JD, dtype=np.float64)
+        idl_data.end_jd = np.asarray(passes.END_JD, dtype=np.float64)
+
+        self.filename = passes_idl_file
+        self.file_signature = file_signature
+        self.idl_data = idl_data
+        self.num_reloads += 1
+        return idl_data
+
+
+def decode_idl_string(value):
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return str(value)
+
+
+# For every pass i, returns the index of the first pass at or after i whose satellite is in monitored_names
+# (len(sat_names) if there isn't one). Computed once per schedule so the per-minute lookup doesn't have to scan.
+def next_monitored_index(sat_names, monitored_names):
+    sat_names = np.asarray(sat_names)
+    num_passes = len(sat_names)
+    is_monitored = np.isin(sat_names, list(monitored_names))
+    indices = np.where(is_monitored, np.arange(num_passes), num_passes)
+    return np.minimum.accumulate(indices[::-1])[::-1]
+
+
+# Pass times after priority arbitration, for every pass in a schedule (see resolve_pass_conflicts).
+# Arrays are indexed like the IdlDataClass the schedule came from. Passes for satellites we don't monitor
+# (and passes outside the range that was resolved) keep their original times and have group = -1.
+class ResolvedSchedule:
+    def __init__(self, start_jd, end_jd):
+        num_passes = len(start_jd)
+        self.start_jd_adjusted = np.array(start_jd, dtype=np.float64)
+        self.end_jd_adjusted = np.array(end_jd, dtype=np.float64)
+        self.is_shortened = np.zeros(num_passes, dtype=np.int64)
+        # conflict group of each pass: passes in the same group overlap (including setup time) and run back-to-back
+        self.group = np.full(num_passes, -1, dtype=np.int64)
+        # first pass index of each group
+        self.group_first_index = np.zeros(0, dtype=np.int64)
+        # monitored pass indices in the order they will be run (adjusted start time, then priority), and their groups
+        self.order = np.zeros(0, dtype=np.int64)
+        self.order_group = np.zeros(0, dtype=np.int64)
+        # (pass index, pass index) pairs that overlapped with the same priority; the earlier pass won
+        self.same_priority_conflicts = []
+
+    def is_group_start(self, pass_index):
+        group = self.group[pass_index]
+        return group >= 0 and self.group_first_index[group] == pass_index
+
+    # returns the pass indices in pass_index's conflict group, in the order they should be run
+    def group_members(self, pass_index):
+        group = self.group[pass_index]
+        if group < 0:
+            return self.order[0:0]
+        first = np.searchsorted(self.order_group, group, side='left')
+        last = np.searchsorted(self.order_group, group, side='right')
+        return self.order[first:last]
+
+
+# Arbitrates pass priorities over a whole schedule in one sweep, instead of one conflict chain at a time.
+# Passes are popped from a heap ordered by (adjusted start time, -priority). While the active pass overlaps the
+# next one in the heap:
+#   - if the next pass has a higher priority, the active pass ends buffer_seconds_transition_high_priority before
+#     it starts
+#   - otherwise the next pass is pushed back to start when the active pass ends (and goes back into the heap)
+# This gives the same result the old per-chain loop in PassManager.add_pass_conflicts did, in O(n log n).
+# A pass's start can end up after its end; the satellite pass manager treats that as a canceled pass.
+# Only satellites with an entry in priorities (sat_name -> priority) are scheduled. Pass indices outside
+# [first_index, last_index) are left alone. start_jd is assumed to be sorted.
+def resolve_pass_conflicts(start_jd, end_jd, sat_names, priorities, setup_minutes_before_pass,
+                           buffer_seconds_transition_high_priority, first_index=0, last_index=None):
+    resolved = ResolvedSchedule(start_jd, end_jd)
+    start_jd = resolved.start_jd_adjusted.copy()
+    end_jd = resolved.end_jd_adjusted.copy()
+    if last_index is None:
+        last_index = len(start_jd)
+
+    sat_names = np.asarray(sat_names)
+    monitored = first_index + np.flatnonzero(np.isin(sat_names[first_index:last_index], list(priorities.keys())))
+    if len(monitored) == 0:
+        return resolved
+    pass_priority = np.zeros(len(start_jd), dtype=np.int64)
+    pass_priority[monitored] = [priorities[str(sat_names[i])] for i in monitored]
+
+    #============ First split the passes into conflict groups ============#
+    # a pass joins the current group if it starts before the group's latest end time (+ the setup minutes)
+    group_end_jd = np.maximum.accumulate(end_jd[monitored])
+    is_new_group = np.ones(len(monitored), dtype=bool)
+    is_new_group[1:] = start_jd[monitored[1:]] >= group_end_jd[:-1] + jd_utc_time.secs_to_jd(setup_minutes_before_pass * 60)
+    resolved.group[monitored] = np.cumsum(is_new_group) - 1
+    resolved.group_first_index = monitored[is_new_group]
+
+    #============ Now sweep through the passes and adjust start/end times based on priorities ============#
+    buffer_jd = jd_utc_time.secs_to_jd(buffer_seconds_transition_high_priority)
+    # heap entries are (start, -priority, tie breaker, pass index). Ties keep the original pass order, except that a
+    # pass that was just pushed back goes ahead of the ones pushed back before it (same as the old stable re-sort).
+    heap = [(start_jd[i], -pass_priority[i], i, i) for i in monitored]
+    heapq.heapify(heap)
+    num_pushed_back = 0
+    order = []
+    while len(heap) > 0:
+        active = heapq.heappop(heap)[3]
+        order.append(active)
+        while len(heap) > 0 and resolved.end_jd_adjusted[active] > heap[0][0]:
+            next_start_jd, next_neg_priority, _, next_pass = heap[0]
+            if -next_neg_priority > pass_priority[active]:
+                # if the next is higher, set the active pass to end before the next begins
+                resolved.end_jd_adjusted[active] = next_start_jd - buffer_jd
+                resolved.is_shortened[active] = 1
+                break  # we're done evaluating this pass, since it has a defined start/end time now
+            if -next_neg_priority == pass_priority[active]:
+                resolved.same_priority_conflicts.append((active, next_pass))
+            # if the next is lower (or equal), set the next to start when the active pass finishes
+            heapq.heappop(heap)
+            resolved.start_jd_adjusted[next_pass] = resolved.end_jd_adjusted[active]
+            resolved.is_shortened[next_pass] = 1
+            num_pushed_back += 1
+            heapq.heappush(heap, (resolved.start_jd_adjusted[next_pass], next_neg_priority, -num_pushed_back, next_pass))
+
+    resolved.order = np.array(order, dtype=np.int64)
+    resolved.order_group = resolved.group[resolved.order]
+    return resolved
+
+
+# Resolved schedules from several stations merged into one timeline, sorted by adjusted start time.
+# station_schedules is a dictionary of station name -> (IdlDataClass, ResolvedSchedule). Only the passes each
+# station will actually run (ResolvedSchedule.order) are included.
+class MergedSchedule:
+    def __init__(self, station_schedules):
+        station_names = []
+        pass_indices = []
+        sat_names = []
+        start_jd = []
+        end_jd = []
+        for station_name in station_schedules:
+            [idl_data, resolved] = station_schedules[station_name]
+            station_names.append(np.full(len(resolved.order), station_name))
+            pass_indices.append(resolved.order)
+            sat_names.append(np.asarray(idl_data.sat_names)[resolved.order])
+            start_jd.append(resolved.start_jd_adjusted[resolved.order])
+            end_jd.append(resolved.end_jd_adjusted[resolved.order])
+
+        self.station_schedules = station_schedules
+        if len(station_schedules) == 0:
+            sort_order = np.zeros(0, dtype=np.int64)
+            station_names = pass_indices = sat_names = start_jd = end_jd = [np.zeros(0)]
+        else:
+            sort_order = np.argsort(np.concatenate(start_jd), kind='stable')
+        self.station_names = np.concatenate(station_names)[sort_order]
+        self.pass_indices = np.concatenate(pass_indices).astype(np.int64)[sort_order]
+        self.sat_names = np.concatenate(sat_names)[sort_order]
+        self.start_jd_adjusted = np.concatenate(start_jd)[sort_order]
+        self.end_jd_adjusted = np.concatenate(end_jd)[sort_order]
+
+    # positions (in this merged schedule) of the passes that start between start_jd and end_jd
+    def passes_between(self, start_jd, end_jd):
+        first = np.searchsorted(self.start_jd_adjusted, start_jd, side='left')
+        last = np.searchsorted(self.start_jd_adjusted, end_jd, side='left')
+        return np.arange(first, last)
+
+    # Finds cross-station handoffs: the same satellite's pass at one station followed by a pass at a different
+    # station that starts before (or within handoff_minutes after) the first one ends.
+    # Returns a list of (position, next position) pairs in this merged schedule.
+    # These are for reporting (see multi_station_manager.py); the stations' passes aren't adjusted for them.
+    def find_handoffs(self, handoff_minutes):
+        # group the passes by satellite (keeping them in start order within each satellite) and compare neighbors
+        by_sat = np.lexsort((self.start_jd_adjusted, self.sat_names))
+        same_sat = self.sat_names[by_sat[1:]] == self.sat_names[by_sat[:-1]]
+        other_station = self.station_names[by_sat[1:]] != self.station_names[by_sat[:-1]]
+        close = self.start_jd_adjusted[by_sat[1:]] <= self.end_jd_adjusted[by_sat[:-1]] + handoff_minutes / 24 / 60
+        pairs = np.flatnonzero(same_sat & other_station & close)
+        return [(int(by_sat[k]), int(by_sat[k + 1])) for k in pairs]
+
+
+# prints the resolved schedule, one line per pass (canceled and shortened passes are flagged)
+def print_resolved_schedule(idl_data, resolved, first_index=0, last_index=None):
+    if last_index is None:
+        last_index = len(resolved.order)
+    for pass_index in resolved.order[first_index:last_index]:
+        start_minutes = jd_utc_time.jd_to_minutes(resolved.start_jd_adjusted[pass_index] - jd_utc_time.now_in_jd())
+        length_minutes = jd_utc_time.jd_to_minutes(resolved.end_jd_adjusted[pass_index] - resolved.start_jd_adjusted[pass_index])
+        txt = "group {0:5d}  {1:>10s}  starts in {2:9.1f} min  length {3:5.1f} min  el {4:5.1f} deg".format(
+            resolved.group[pass_index], idl_data.sat_names[pass_index], start_minutes, max(length_minutes, 0), idl_data.elevation[pass_index])
+        if length_minutes <= 0:
+            txt += "  CANCELED"
+        elif resolved.is_shortened[pass_index] == 1:
+            txt += "  SHORTENED (from {0:.1f} min)".format(idl_data.length_minutes[pass_index])
+        print(txt)
+
+
+# Prints the resolved schedule for the upcoming passes at the station in the pass config ini file, so operators
+# can see ahead of time which passes will be shortened or canceled.
+# Usage: python pass_schedule.py [pass_config.ini] [hours ahead, default 24]
+def main(script, ini_filename='pass_config.ini', hours_ahead=24):
+    import pass_config
+    cfg = pass_config.GenericConfig(ini_filename)
+    priorities = {}
+    for satellite_ini_file in cfg.sat_ini_files:
+        sat_cfg = pass_config.SatelliteConfig(satellite_ini_file)
+        priorities[sat_cfg.sat_name] = sat_cfg.priority
+
+    passes_idl_file = os.path.join(cfg.idl_tle_dir, cfg.station_name, 'passes_latest_' + cfg.station_name.upper() + '.sav')
+    idl_data = PassScheduleCache().load(passes_idl_file)
+    resolved = resolve_pass_conflicts(idl_data.start_jd, idl_data.end_jd, idl_data.sat_names, priorities,
+                                      cfg.setup_minutes_before_pass, cfg.buffer_seconds_transition_high_priority)
+    now_jd = jd_utc_time.now_in_jd()
+    run_start_jd = resolved.start_jd_adjusted[resolved.order]
+    first = np.searchsorted(run_start_jd, now_jd)
+    last = np.searchsorted(run_start_jd, now_jd + float(hours_ahead) / 24)
+    print("Resolved schedule for {0}, next {1} hours:".format(cfg.station_name, hours_ahead))
+    print_resolved_schedule(idl_data, resolved, first, last)
+
+
+if __name__ == '__main__':
+    main(*sys.argv)
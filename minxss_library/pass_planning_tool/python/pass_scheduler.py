@@ -0,0 +1,125 @@
+### Event-driven replacement for the polling loop in auto_pass_manager.main()
+# Enable with "use_async_scheduler = 1" under [pass_config] in pass_config.ini.
+#
+# Instead of sleeping in 60 second steps, the scheduler arms timers for the exact setup time
+# (setup_minutes_before_pass before the next pass) and for the exact end of each pass.
+# Things that used to block the main loop run as concurrent tasks:
+#   - the pass itself (program start/stop runs in a worker thread, since it is all blocking Popen/sleep calls)
+#   - SATPC TLE updates, triggered by the TLE file changing (SATPC is only restarted between passes)
+#   - post-pass analysis and emails, so the next pass doesn't wait for them
+
+import asyncio
+import functools
+
+import jd_utc_time
+from tle_distribution import TleWatcher
+
+# the schedule is re-read at least this often while waiting for the next pass, in case the .sav file changes
+schedule_check_seconds = 60
+# how often to print the pass status while a pass is running
+status_print_seconds = 60
+
+
+class AsyncPassScheduler:
+    def __init__(self, pass_manager):
+        self.p = pass_manager
+        self.cfg = pass_manager.cfg
+        self.is_pass_active = 0
+        self.background_tasks = set()
+        self.program_lock = None  # created in main_loop so it belongs to the running event loop
+
+    def run(self):
+        asyncio.run(self.main_loop())
+
+    async def main_loop(self):
+        self.program_lock = asyncio.Lock()
+        tasks = [self.schedule_passes()]
+        if self.cfg.use_satpc == 1:
+            tasks.append(self.monitor_satpc())
+        await asyncio.gather(*tasks)
+
+    # runs a blocking function in a worker thread so the event loop (and the other tasks) keep going
+    @staticmethod
+    async def run_blocking(func, *args):
+        return await asyncio.get_event_loop().run_in_executor(None, functools.partial(func, *args))
+
+    # starts a task we don't wait on, keeping a reference so it isn't garbage collected before it finishes
+    def start_background(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+        return task
+
+    async def schedule_passes(self):
+        while 1:
+            [minutes_before_pass, info_list] = await self.run_blocking(self.p.get_next_pass_info)
+            if len(info_list) == 0:
+                await asyncio.sleep(schedule_check_seconds)
+                continue
+
+            seconds_until_setup = (minutes_before_pass - self.cfg.setup_minutes_before_pass) * 60
+            if seconds_until_setup > 0 and self.cfg.enable_rapidfire_test == 0:
+                # sleep right up to the setup time if it's close, otherwise check the schedule again in a minute
+                await asyncio.sleep(min(seconds_until_setup, schedule_check_seconds))
+                if seconds_until_setup > schedule_check_seconds:
+                    continue
+
+            self.p.print_ignored_sats()
+            await self.run_passes(info_list)
+
+    # If we have multiple adjacent passes, we run them back-to-back
+    async def run_passes(self, info_list):
+        for pass_num in range(len(info_list)):
+            if pass_num < len(info_list) - 1:
+                is_quick_exit = 1
+            else:
+                is_quick_exit = 0
+            await self.run_pass(info_list[pass_num], is_quick_exit)
+
+    async def run_pass(self, info, is_quick_exit):
+        sat_pass_manager = self.p.sat_pass_managers[info.sat_name]
+
+        async with self.program_lock:
+            self.is_pass_active = 1
+            await self.run_blocking(sat_pass_manager.start_pass, info)
+
+        # Hydra/the SDR crashing mid-pass is reported by ExeManagement's own process watcher
+        await self.wait_until_pass_is_done(sat_pass_manager, info)
+
+        if is_quick_exit == 0:
+            await asyncio.sleep(self.cfg.buffer_seconds_after_pass_end)
+
+        async with self.program_lock:
+            await self.run_blocking(sat_pass_manager.stop_pass_programs)
+            # read the script and rundir here, before the next pass can replace them
+            post_pass_inputs = sat_pass_manager.take_post_pass_inputs()
+            self.is_pass_active = 0
+
+        # analysis and emails happen while we move on to the next pass
+        self.start_background(self.run_blocking(sat_pass_manager.queue_post_pass, info, *post_pass_inputs))
+
+    async def wait_until_pass_is_done(self, sat_pass_manager, info):
+        while 1:
+            seconds_left = jd_utc_time.jd_to_minutes(info.end_jd_adjusted - jd_utc_time.now_in_jd()) * 60
+            if seconds_left <= 0:
+                return
+            sat_pass_manager.print_pass_status(info)
+            if self.cfg.enable_rapidfire_test == 1:
+                await asyncio.sleep(10)
+                return
+            await asyncio.sleep(min(seconds_left, status_print_seconds))
+
+    # keeps SATPC's TLE file current. SATPC itself is only restarted when no pass is running.
+    # Runs as soon as the TLE file changes, and at least every schedule_check_seconds to make sure SATPC is running.
+    async def monitor_satpc(self):
+        if self.cfg.do_update_satpc_tle == 1:
+            watcher = TleWatcher(self.p.satpc_tle_file_dropbox)
+        else:
+            watcher = TleWatcher(self.p.satpc_tle_file_dest)
+        while 1:
+            await self.run_blocking(self.p.update_satpc_tle)
+            # a pass can start while we wait for the lock, so only check for one once we have it
+            async with self.program_lock:
+                if self.is_pass_active == 0:
+                    await self.run_blocking(self.p.restart_satpc_if_new_tle)
+            await watcher.wait_for_change(schedule_check_seconds)
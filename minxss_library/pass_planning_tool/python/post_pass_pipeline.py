@@ -0,0 +1,140 @@
+### Background post-pass pipeline
+# After a pass, the pass manager only has to stop the pass programs. The rest (rundir analysis, the pass results
+# email and the post pass script) is queued here and run by a small pool of worker threads, so that the next
+# pass can be set up right away.
+#
+# The queue is durable: each job is written to <queue_dir>/pending as a JSON file before it is started and is
+# only deleted once it has finished. Jobs left over from a crash or restart are picked up again on startup,
+# and jobs that raise an error are moved to <queue_dir>/failed with the error added.
+# A satellite's jobs always run one at a time and in the order they were queued, since they share that satellite's
+# email module: each satellite has its own queue, which one worker works through while other workers take the
+# other satellites' queues. Everything a job needs from the pass (the script, its name and the rundir) is saved in
+# the job, since the next pass may have replaced them on the satellite pass manager by the time it runs.
+
+import os
+import json
+import threading
+import traceback
+import types
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import jd_utc_time
+
+
+def write_json_atomically(filename, data):
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'w') as file:
+        json.dump(data, file, indent=1)
+    os.replace(tmp_filename, filename)
+
+
+class PostPassQueue:
+    def __init__(self, queue_dir, num_workers, sat_pass_managers):
+        self.pending_dir = os.path.join(queue_dir, 'pending')
+        self.failed_dir = os.path.join(queue_dir, 'failed')
+        os.makedirs(self.pending_dir, exist_ok=True)
+        os.makedirs(self.failed_dir, exist_ok=True)
+
+        self.sat_pass_managers = sat_pass_managers
+        self.executor = ThreadPoolExecutor(max_workers=num_workers)
+        self.lock = threading.Lock()
+        self.sat_queues = {}  # satellite name -> deque of job file names waiting to run
+        self.sats_running = set()  # satellites with a worker working through their queue
+        self.futures = set()
+        self.num_submitted = 0
+        self.num_unfinished = 0
+
+    # queues the post-pass work for a pass that just finished
+    def submit(self, sat_pass_manager, info, wasrun_scriptloc, script_name, rundir_path):
+        with self.lock:
+            self.num_submitted += 1
+            job_number = self.num_submitted
+        queued_jd = jd_utc_time.now_in_jd()
+        job = {'sat_name': sat_pass_manager.cfg.sat_name,
+               'info': dict(vars(info)),
+               'wasrun_scriptloc': wasrun_scriptloc,
+               'script_name': script_name,
+               'rundir_path': rundir_path,
+               'queued_jd': queued_jd}
+        # file names sort in the order the jobs were queued
+        job_filename = os.path.join(self.pending_dir, '{0:.6f}_{1:04d}_{2}.json'.format(queued_jd, job_number % 10000, job['sat_name']))
+        write_json_atomically(job_filename, job)
+        self.start_job(job_filename, job['sat_name'])
+
+    # restarts any jobs that didn't finish the last time the pass manager ran
+    def resume(self):
+        job_filenames = sorted(f for f in os.listdir(self.pending_dir) if f.endswith('.json'))
+        if len(job_filenames) > 0:
+            print("Resuming {0} unfinished post-pass job(s) from {1}".format(len(job_filenames), self.pending_dir))
+        for job_filename in job_filenames:
+            # the satellite name is everything after the second '_' of the file name (see submit)
+            sat_name = os.path.splitext(job_filename)[0].split('_', 2)[-1]
+            self.start_job(os.path.join(self.pending_dir, job_filename), sat_name)
+
+    # adds the job to the end of its satellite's queue, and starts a worker on that queue if there isn't one
+    def start_job(self, job_filename, sat_name):
+        with self.lock:
+            self.num_unfinished += 1
+            self.sat_queues.setdefault(sat_name, deque()).append(job_filename)
+            if sat_name in self.sats_running:
+                return
+            self.sats_running.add(sat_name)
+            future = self.executor.submit(self.run_sat_jobs, sat_name)
+            self.futures.add(future)
+        future.add_done_callback(self.job_done)
+
+    def job_done(self, future):
+        with self.lock:
+            self.futures.discard(future)
+
+    # runs a satellite's jobs one after another until its queue is empty
+    def run_sat_jobs(self, sat_name):
+        while 1:
+            with self.lock:
+                if len(self.sat_queues[sat_name]) == 0:
+                    self.sats_running.discard(sat_name)
+                    return
+                job_filename = self.sat_queues[sat_name].popleft()
+            self.run_job(job_filename)
+            with self.lock:
+                self.num_unfinished -= 1
+
+    def run_job(self, job_filename):
+        try:
+            with open(job_filename, 'r') as file:
+                job = json.load(file)
+            sat_pass_manager = self.sat_pass_managers[job['sat_name']]
+            # post_pass only reads attributes from the pass info, so a namespace stands in for MyPassInfo
+            info = types.SimpleNamespace(**job['info'])
+            sat_pass_manager.post_pass(info, job['wasrun_scriptloc'], job['rundir_path'], job['script_name'])
+        except Exception:
+            error_text = traceback.format_exc()
+            print("ERROR: Post-pass job {0} failed:\r\n{1}".format(os.path.basename(job_filename), error_text))
+            self.move_to_failed(job_filename, error_text)
+            return
+        os.remove(job_filename)
+
+    def move_to_failed(self, job_filename, error_text):
+        try:
+            with open(job_filename, 'r') as file:
+                job = json.load(file)
+        except Exception:
+            job = {}
+        job['error'] = error_text
+        write_json_atomically(os.path.join(self.failed_dir, os.path.basename(job_filename)), job)
+        if os.path.exists(job_filename):
+            os.remove(job_filename)
+
+    def num_pending(self):
+        with self.lock:
+            return self.num_unfinished
+
+    # blocks until every queued job has finished (used at shutdown and by the simulator)
+    def wait_until_empty(self):
+        while 1:
+            with self.lock:
+                futures = list(self.futures)
+            if len(futures) == 0:
+                return
+            wait(futures)
@@ -2,6 +2,88 @@ import os
 import sys
 import re #regex
 import csv
+from collections import namedtuple
+
+import tlm_packet_stats
+
+# EventLog patterns, compiled once
+cmd_try_pattern = re.compile(r'(?<=cmdTry: )\w+')
+cmd_succeed_pattern = re.compile(r'(?<=cmdSucceed: )\w+')
+script_done_pattern = re.compile(r'(?<=Done with script Scripts).*')
+tlm_file_pattern = re.compile('tlm_packets', re.IGNORECASE)
+tlm_closing_pattern = re.compile('closing', re.IGNORECASE)
+boot_script_name = "script_to_run_automatically_on_hydra_boot.prc"
+
+# one cmdTry line, plus the cmdSucceed and "Done with script" lines that follow it
+CmdAttempt = namedtuple('CmdAttempt', ['cmd_try', 'cmd_succeed', 'script_name'])
+
+
+# Everything we pull out of an EventLog, found in a single pass over the file by parse_eventlog()
+class EventLogSummary():
+    def __init__(self):
+        self.cmd_attempts = []  # CmdAttempt for each cmdTry line
+        self.error_lines = []  # lines containing "error" (any case), with their line endings
+        self.script_starts = []  # "Starting script" lines
+        self.tlm_files = []  # lines where Hydra started a new tlm_packets file
+        self.num_commands_sent = 0  # "Sending command" lines
+        self.num_lines = 0
+
+
+# Reads an EventLog once, line by line. scriptname replaces the name of Hydra's boot script in cmd_attempts
+# (the boot script is a copy of the pass script that was actually run).
+def parse_eventlog(filename, scriptname='', print_errors=1):
+    summary = EventLogSummary()
+    # the cmdTry lines still waiting for the one or two lines that follow them: [cmd_try, cmd_succeed, lines seen]
+    pending = []
+    with open(filename, 'r', errors='replace') as file:
+        for line in file:
+            summary.num_lines += 1
+
+            for attempt in pending:
+                attempt[2] += 1
+                if attempt[2] == 1:
+                    if 'cmdSucceed:' in line:
+                        m = cmd_succeed_pattern.search(line)
+                        attempt[1] = m.group(0) if m is not None else 'Could not find cmdSucceed count'
+                else:
+                    script_name = ''
+                    if 'Done with script Scripts' in line:
+                        script_name = script_done_pattern.search(line).group(0)[1:]  # ditch the backslash
+                        if boot_script_name in script_name:
+                            script_name = scriptname
+                    summary.cmd_attempts.append(CmdAttempt(attempt[0], attempt[1], script_name))
+            if len(pending) > 0 and pending[0][2] == 2:
+                del pending[0]
+
+            if 'cmdTry:' in line:
+                m = cmd_try_pattern.search(line)
+                pending.append([m.group(0) if m is not None else 'Could not find cmdTry count', '', 0])
+
+            if 'error' in line.lower():
+                summary.error_lines.append(line)
+                if print_errors == 1:
+                    print(line.rstrip('\r\n'))
+
+            if 'Sending command' in line:
+                summary.num_commands_sent += 1
+            elif 'Starting script' in line:
+                summary.script_starts.append(line.strip())
+            elif tlm_file_pattern.search(line) is not None and tlm_closing_pattern.search(line) is None:
+                summary.tlm_files.append(line.strip())
+
+    # a cmdTry at the very end of the log
+    for attempt in pending:
+        summary.cmd_attempts.append(CmdAttempt(attempt[0], attempt[1], ''))
+    return summary
+
+
+# writes the cmdTry/cmdSucceed/script rows of an EventLogSummary to a CSV file
+def write_cmd_attempts_csv(summary, csv_filename, rundir_name):
+    with open(csv_filename, 'w', newline='') as csvfile:
+        spamwriter = csv.writer(csvfile, delimiter=',', quotechar='|', quoting=csv.QUOTE_MINIMAL)
+        spamwriter.writerow(['RunDir Name','cmdTry Count','cmdSucceed Count','Script Name'])
+        for attempt in summary.cmd_attempts:
+            spamwriter.writerow([rundir_name, attempt.cmd_try, attempt.cmd_succeed, attempt.script_name])
 
 
 class Rundir():
@@ -13,7 +95,9 @@ class Rundir():
         self.tlm_filepath = ""
         self.tlm_filename = "[no data downlinked]"
         self.csv_filepath = ""
+        self.eventlog = None  # EventLogSummary
         self.bytes_downlinked_data = 0
+        self.packet_stats = None  # tlm_packet_stats.PacketStats for the tlm file
         self.csv_cmd_attempts_filename = 'cmd_attempts.csv'
 
     def analyze(self, info, cfg):
@@ -27,92 +111,36 @@ class Rundir():
         for filename in files:
             if 'EventLog_' in filename:
                 self.eventlog_filepath = os.path.join(self.rundir_path, filename)
-                self.csv_filepath = self.StoreInCSV(self.eventlog_filepath)
-                self.errors_array = self.FindErrorLines(self.eventlog_filepath)
+                self.eventlog = parse_eventlog(self.eventlog_filepath, self.scriptname)
+                self.csv_filepath = self.StoreInCSV(self.eventlog)
+                self.errors_array = list(self.eventlog.error_lines)
                 #self.cmdTrySucceed_arr = self.FindcmdTrySucceed(self.eventlog_filepath)
             if cfg.hydra_output_filename_prefix in filename:
                 self.tlm_filepath = os.path.join(self.rundir_path, filename)
                 self.tlm_filename = filename
                 self.bytes_downlinked_data = os.stat(self.tlm_filepath).st_size
+                self.packet_stats = tlm_packet_stats.scan_tlm_file(self.tlm_filepath)
 
         if(self.bytes_downlinked_data/1000 < cfg.min_expected_data and info.elevation >= cfg.elevation_to_expect_data):
             self.errors_array.append("ERROR: Expected to receive at least {0} kB of data for pass elevation {1}, but received {2} kB data!\r\n".format(cfg.min_expected_data, round(info.elevation,2), self.bytes_downlinked_data/1000))
 
         print("TLM filename:", self.tlm_filename, "-- Size: ", self.bytes_downlinked_data)
+        if self.packet_stats is not None:
+            print("Packets: {0} realtime, {1} playback -- {2}".format(self.packet_stats.num_realtime, self.packet_stats.num_playback, self.packet_stats.summary_text()))
         print("")
         print("")
         print("End of Pass Results")
         print("")
 
-    #store cmdTry and cmdSuccess counts in a CSV file, then returns the path to the csv file
-    def StoreInCSV(self,filename):
+    #store cmdTry and cmdSuccess counts (from the parsed EventLog) in a CSV file, then returns the path to the csv file
+    def StoreInCSV(self, eventlog):
         csv_filename = os.path.join(self.rundir_path, self.csv_cmd_attempts_filename)
         print('==================StoreInCSV=================')
         print(csv_filename)
 
-        rundir_name = os.path.basename(self.rundir_path)
-
-        with open(csv_filename, 'w',newline='') as csvfile:
-            spamwriter = csv.writer(csvfile, delimiter=',', quotechar='|', quoting=csv.QUOTE_MINIMAL)
-            spamwriter.writerow(['RunDir Name','cmdTry Count','cmdSucceed Count','Script Name'])
-
-            columncount = 0
-            file = open(filename,'r')
-            lines = file.readlines()
-            #now we look for a group of lines. cmdTry: ##, then cmdSucceed: ##, then a line that describes what file was run
-            for i in range(0,len(lines)):
-                if 'cmdTry:' in lines[i]:
-                    #find all the characters after "cmdTry: " (which is the number of cmdTrys)
-                    m = re.search('(?<=cmdTry: )\w+', lines[i])
-
-                    #set up the three columns we're capturing
-                    cmdSucceed = ''
-                    scriptname = ''
-
-                    try:
-                        cmdTry = m.group(0) #fails if it can't find the search string
-                    except:
-                        cmdTry = 'Could not find cmdTry count'
-
-                    #go to the next line
-                    i += 1
-                    if 'cmdSucceed:' in lines[i]:
-                        m = re.search('(?<=cmdSucceed: )\w+', lines[i])
-                        try:
-                            cmdSucceed = m.group(0)
-                        except:
-                            cmdSucceed = 'Could not find cmdSucceed count'
-
-                    i += 1
-                    if 'Done with script Scripts' in lines[i]:
-                        m = re.search('(?<=Done with script Scripts).*', lines[i])
-                        try:
-                            scriptname = m.group(0)
-                            scriptname = scriptname[1:] #ditch the backslash
-                        except:
-                            scriptname = 'Could not find scriptname'
-                        if "script_to_run_automatically_on_hydra_boot.prc" in scriptname:
-                            scriptname = self.scriptname
-
-                    row = []
-                    row.append(rundir_name)
-                    row.append(cmdTry)
-                    row.append(cmdSucceed)
-                    row.append(scriptname)
-                    spamwriter.writerow(row)
-
+        write_cmd_attempts_csv(eventlog, csv_filename, os.path.basename(self.rundir_path))
         return csv_filename
 
-
-    def FindErrorLines(self,filename):
-        lines_array = []
-        with open(filename,'r') as file:
-            for line in file:
-                if 'error' in line.lower():
-                    lines_array.append(line)
-                    print(line[0:-1])
-        return lines_array
-
     # def FindcmdTrySucceed(self,filename):
         # lines_array = []
         # with open(filename,'r') as file:
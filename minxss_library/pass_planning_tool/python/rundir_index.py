@@ -0,0 +1,82 @@
+### Index of the rundirs in a Hydra Rundirs folder
+# Hydra makes a new rundir (named by its start time, e.g. 2018_348_14_05_22) every time it launches. After years of
+# operations a Rundirs folder holds thousands of them on a synced drive, so we don't want to list (and stat) the
+# whole folder every time we need the latest one.
+#
+# The index is saved to rundir_index.json next to the Rundirs folder (in the Hydra folder), along with the Rundirs
+# folder's mtime. That mtime changes whenever a rundir is added or removed, so finding the latest rundir is a single
+# stat while nothing has changed. Other programs (e.g. the command counters) can read "latest" from the json file.
+#
+# The pass manager's main thread and the post-pass worker threads share one RundirIndex, so it is locked while it is
+# loaded, refreshed or saved. Each save writes its own temporary file, so saves from other processes don't clash.
+
+import os
+import json
+import tempfile
+import threading
+
+index_filename = 'rundir_index.json'
+
+
+class RundirIndex:
+    def __init__(self, rundirs_dir):
+        self.rundirs_dir = rundirs_dir
+        self.index_filepath = os.path.join(os.path.dirname(os.path.abspath(rundirs_dir)), index_filename)
+        self.dir_mtime_ns = None
+        self.rundir_names = []
+        self.lock = threading.RLock()
+        self.load()
+
+    def load(self):
+        with self.lock:
+            try:
+                with open(self.index_filepath, 'r') as file:
+                    index = json.load(file)
+                self.dir_mtime_ns = index['rundirs_dir_mtime_ns']
+                self.rundir_names = index['rundirs']
+            except (OSError, ValueError, KeyError):
+                self.dir_mtime_ns = None
+                self.rundir_names = []
+
+    def save(self):
+        with self.lock:
+            index = {'rundirs_dir_mtime_ns': self.dir_mtime_ns,
+                     'latest': self.rundir_names[-1] if len(self.rundir_names) > 0 else '',
+                     'rundirs': self.rundir_names}
+            tmp_filepath = None
+            try:
+                [fd, tmp_filepath] = tempfile.mkstemp(prefix=index_filename + '.', suffix='.tmp',
+                                                      dir=os.path.dirname(self.index_filepath))
+                with os.fdopen(fd, 'w') as file:
+                    json.dump(index, file)
+                os.replace(tmp_filepath, self.index_filepath)
+            except OSError as e:
+                print("WARNING: Couldn't save the rundir index {0}: {1}".format(self.index_filepath, e))
+                if tmp_filepath is not None and os.path.exists(tmp_filepath):
+                    os.remove(tmp_filepath)
+
+    # re-lists the Rundirs folder, but only if something has been added or removed since the last time
+    def refresh(self):
+        with self.lock:
+            dir_mtime_ns = os.stat(self.rundirs_dir).st_mtime_ns
+            if dir_mtime_ns == self.dir_mtime_ns:
+                return
+            # mtime is from before the listing, so a rundir added while we list will still show up next time
+            self.dir_mtime_ns = dir_mtime_ns
+            self.rundir_names = sorted(entry.name for entry in os.scandir(self.rundirs_dir) if entry.is_dir())
+            self.save()
+
+    # returns the name of the newest rundir ('' if there are none)
+    def latest_name(self):
+        with self.lock:
+            self.refresh()
+            if len(self.rundir_names) == 0:
+                return ''
+            return self.rundir_names[-1]
+
+    # returns the path to the newest rundir (None if there are none)
+    def latest(self):
+        name = self.latest_name()
+        if len(name) == 0:
+            return None
+        return os.path.join(self.rundirs_dir, name)
@@ -0,0 +1,179 @@
+### Summarizes every Hydra rundir (one row per pass) into a single table
+# Usage: python rundir_summary.py <summary.npz> <Rundirs folder> [<Rundirs folder> ...]
+# e.g.   python rundir_summary.py rundirs_summary.npz C:/Hydra/MinXSS/HYDRA_FM-2_Boulder/Rundirs C:/Hydra/MinXSS/HYDRA_FM-2_Fairbanks/Rundirs
+#
+# The rundirs are analyzed in parallel by a pool of processes (one per CPU). The summary is kept column by column
+# in a NumPy .npz file (load it with read_summary() or np.load) and is also written out as a .csv next to it.
+# Running it again only analyzes rundirs that aren't in the summary yet, plus the newest rundir of each Rundirs
+# folder, since Hydra may still have been writing to it.
+# A rundir that can't be analyzed (e.g. a corrupt EventLog) gets a row with its error in the 'error' column, and
+# is analyzed again on the next run; the other rundirs are still saved.
+
+import os
+import sys
+import traceback
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+import rundir_analysis
+import tlm_packet_stats
+
+# files whose name starts with one of these are counted as telemetry (MinXSS Hydra, CSIM Hydra)
+tlm_filename_prefixes = ['tlm_packets', 'raw_record_']
+
+# columns of the summary, in order, with the NumPy type they are stored as
+summary_columns = [('rundir_path', str),
+                   ('hydra_name', str),  # the Hydra folder the Rundirs folder is in, e.g. HYDRA_FM-2_Boulder
+                   ('rundir_name', str),
+                   ('eventlog_lines', np.int64),
+                   ('cmd_try', np.int64),  # summed over every cmdTry line
+                   ('cmd_succeed', np.int64),
+                   ('commands_sent', np.int64),
+                   ('errors', np.int64),
+                   ('scripts', str),  # the scripts that finished (cmdTry/cmdSucceed/script groups), separated by ';'
+                   ('script_starts', np.int64),
+                   ('tlm_files', np.int64),
+                   ('tlm_bytes', np.int64),
+                   ('tlm_packets', np.int64),  # packets of every type, corrupted ones included
+                   ('tlm_playback', np.int64),
+                   ('tlm_corrupted', np.int64),
+                   ('error', str)]  # empty unless the rundir couldn't be analyzed
+# a column with the packet count of each type, e.g. 'packets_HK' (see tlm_packet_stats.py)
+summary_columns += [('packets_' + name, np.int64) for name in tlm_packet_stats.packet_types.values()]
+
+
+def to_int(text):
+    try:
+        return int(text)
+    except ValueError:
+        return 0
+
+
+# analyzes one rundir and returns its summary row as a dict (runs in a worker process). If the analysis fails,
+# the row only has the rundir's name and the error.
+def summarize_rundir(rundir_path):
+    try:
+        return analyze_rundir(rundir_path)
+    except Exception as e:
+        print("ERROR: Couldn't analyze {0}:\r\n{1}".format(rundir_path, traceback.format_exc()))
+        row = empty_row(rundir_path)
+        row['error'] = '{0}: {1}'.format(type(e).__name__, ' '.join(str(e).split()))  # on one line, for the .csv
+        return row
+
+
+def empty_row(rundir_path):
+    row = {'rundir_path': rundir_path,
+           'hydra_name': os.path.basename(os.path.dirname(os.path.dirname(rundir_path))),
+           'rundir_name': os.path.basename(rundir_path)}
+    for [name, column_type] in summary_columns:
+        if name not in row:
+            row[name] = '' if column_type is str else 0
+    return row
+
+
+def analyze_rundir(rundir_path):
+    row = empty_row(rundir_path)
+    scripts = []
+    for entry in os.scandir(rundir_path):
+        if not entry.is_file():
+            continue
+        if entry.name.startswith('EventLog_'):
+            # we don't know which pass script was copied to the boot script, so it's listed as the boot script
+            eventlog = rundir_analysis.parse_eventlog(entry.path, rundir_analysis.boot_script_name, print_errors=0)
+            row['eventlog_lines'] += eventlog.num_lines
+            row['cmd_try'] += sum(to_int(attempt.cmd_try) for attempt in eventlog.cmd_attempts)
+            row['cmd_succeed'] += sum(to_int(attempt.cmd_succeed) for attempt in eventlog.cmd_attempts)
+            row['commands_sent'] += eventlog.num_commands_sent
+            row['errors'] += len(eventlog.error_lines)
+            row['script_starts'] += len(eventlog.script_starts)
+            scripts += [attempt.script_name for attempt in eventlog.cmd_attempts if len(attempt.script_name) > 0]
+        elif any(entry.name.startswith(prefix) for prefix in tlm_filename_prefixes):
+            row['tlm_files'] += 1
+            row['tlm_bytes'] += entry.stat().st_size
+            packet_stats = tlm_packet_stats.scan_tlm_file(entry.path)
+            row['tlm_packets'] += packet_stats.num_packets
+            row['tlm_playback'] += packet_stats.num_playback
+            row['tlm_corrupted'] += packet_stats.num_corrupted
+            for name in packet_stats.type_counts:
+                if 'packets_{0}'.format(name) in row:
+                    row['packets_{0}'.format(name)] += packet_stats.type_counts[name]
+    row['scripts'] = ';'.join(scripts)
+    return row
+
+
+# returns the rundirs in a Rundirs folder, oldest first (rundirs are named by their start time)
+def find_rundirs(rundirs_dir):
+    return sorted(entry.path for entry in os.scandir(rundirs_dir) if entry.is_dir())
+
+
+# returns the summary as a dict of column arrays (empty columns if the file doesn't exist yet)
+def read_summary(summary_filename):
+    if os.path.exists(summary_filename):
+        with np.load(summary_filename) as npz:
+            if all(name in npz for [name, column_type] in summary_columns):
+                return {name: npz[name] for [name, column_type] in summary_columns}
+        print("{0} is missing some columns, so every rundir will be analyzed again".format(summary_filename))
+    return {name: np.array([], dtype=column_type) for [name, column_type] in summary_columns}
+
+
+def write_summary(summary_filename, summary):
+    tmp_filename = summary_filename + '.tmp'
+    with open(tmp_filename, 'wb') as file:
+        np.savez(file, **summary)
+    os.replace(tmp_filename, summary_filename)
+
+    csv_filename = os.path.splitext(summary_filename)[0] + '.csv'
+    with open(csv_filename + '.tmp', 'w') as file:
+        file.write(','.join(name for [name, column_type] in summary_columns) + '\n')
+        for i in range(len(summary['rundir_path'])):
+            file.write(','.join(str(summary[name][i]).replace(',', ' ') for [name, column_type] in summary_columns) + '\n')
+    os.replace(csv_filename + '.tmp', csv_filename)
+
+
+# adds any rundirs that aren't in the summary yet (and re-does the newest one in each folder, and any that failed
+# last time). Returns the summary.
+def update_summary(summary_filename, rundirs_dirs, num_workers=None):
+    summary = read_summary(summary_filename)
+    done = set(summary['rundir_path'][summary['error'] == ''])
+
+    to_analyze = []
+    for rundirs_dir in rundirs_dirs:
+        rundirs = find_rundirs(rundirs_dir)
+        to_analyze += [rundir for rundir in rundirs if rundir not in done]
+        if len(rundirs) > 0 and rundirs[-1] in done:
+            to_analyze.append(rundirs[-1])
+    if len(to_analyze) == 0:
+        print("Summary is up to date ({0} rundirs)".format(len(done)))
+        return summary
+
+    print("Analyzing {0} rundirs ({1} already in {2})".format(len(to_analyze), len(done), summary_filename))
+    # summarize_rundir catches its own errors, so one bad rundir doesn't lose the rest
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        rows = list(executor.map(summarize_rundir, to_analyze, chunksize=16))
+
+    # replace the rows being redone, then add the new ones
+    is_kept = ~np.isin(summary['rundir_path'], to_analyze)
+    for [name, column_type] in summary_columns:
+        new_values = np.array([row[name] for row in rows], dtype=column_type)
+        summary[name] = np.concatenate((summary[name][is_kept], new_values))
+
+    order = np.argsort(summary['rundir_path'], kind='stable')
+    for name in summary:
+        summary[name] = summary[name][order]
+    write_summary(summary_filename, summary)
+    print("Wrote {0} rundirs to {1}".format(len(summary['rundir_path']), summary_filename))
+    num_errors = sum(1 for row in rows if row['error'] != '')
+    if num_errors > 0:
+        print("{0} rundirs couldn't be analyzed; see the error column (they will be tried again next time)".format(num_errors))
+    return summary
+
+
+def main(script, summary_filename='rundirs_summary.npz', *rundirs_dirs):
+    if len(rundirs_dirs) == 0:
+        print("Usage: python rundir_summary.py <summary.npz> <Rundirs folder> [<Rundirs folder> ...]")
+        return
+    update_summary(summary_filename, rundirs_dirs)
+
+
+if __name__ == '__main__':
+    main(*sys.argv)
@@ -0,0 +1,5 @@
+# The pass manager modules are scripts that import each other by name, so the tests import them the same way
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
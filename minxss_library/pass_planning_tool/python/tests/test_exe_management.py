@@ -0,0 +1,178 @@
+# ExeManagement's process watcher, restart backoff and readiness checks, using small shell scripts as the programs
+import os
+import socket
+import stat
+import threading
+import time
+
+import pytest
+
+import auto_pass_manager
+from auto_pass_manager import ExeManagement
+
+pytestmark = pytest.mark.skipif(os.name != 'posix', reason='the test programs are shell scripts')
+
+
+def make_script(tmp_path, name, body):
+    filepath = tmp_path / name
+    filepath.write_text('#!/bin/sh\n' + body + '\n')
+    filepath.chmod(filepath.stat().st_mode | stat.S_IEXEC)
+    return name
+
+
+def wait_for(condition, timeout_seconds=5):
+    start = time.perf_counter()
+    while not condition():
+        assert time.perf_counter() - start < timeout_seconds
+        time.sleep(0.01)
+
+
+# records restart backoffs instead of sleeping through them, and stops the restarts after max_restarts
+class BackoffRecorder:
+    def __init__(self, max_restarts):
+        self.exe = None
+        self.backoffs = []
+        self.max_restarts = max_restarts
+        self.done = threading.Event()
+
+    def sleep(self, seconds):
+        self.backoffs.append(seconds)
+        if len(self.backoffs) == self.max_restarts:
+            self.exe.is_stopping = 1
+            self.done.set()
+
+
+@pytest.fixture
+def backoff(monkeypatch):
+    def make_recorder(max_restarts):
+        recorder = BackoffRecorder(max_restarts)
+        monkeypatch.setattr(auto_pass_manager.jd_utc_time, 'sleep', recorder.sleep)
+        return recorder
+    return make_recorder
+
+
+def test_crash_restarts_with_backoff(tmp_path, monkeypatch, backoff):
+    monkeypatch.setattr(auto_pass_manager, 'restart_backoff_max_seconds', 30)
+    recorder = backoff(5)
+    crashes = []
+    exe = ExeManagement(str(tmp_path), make_script(tmp_path, 'crash.sh', 'exit 3'), 1, supervise=1, restart_on_crash=1)
+    exe.on_crash = crashes.append
+    recorder.exe = exe
+    exe.start()
+    assert recorder.done.wait(10)
+    assert recorder.backoffs == [5, 10, 20, 30, 30]
+    assert crashes == [exe] * 5
+    # the last restart was called off
+    assert exe.num_restarts == 4
+    assert exe.exit_code == 3
+
+
+def test_backoff_resets_after_staying_up(tmp_path, monkeypatch, backoff):
+    monkeypatch.setattr(auto_pass_manager, 'restart_backoff_reset_seconds', 0)
+    recorder = backoff(3)
+    exe = ExeManagement(str(tmp_path), make_script(tmp_path, 'crash.sh', 'exit 1'), 1, supervise=1, restart_on_crash=1)
+    recorder.exe = exe
+    exe.start()
+    assert recorder.done.wait(10)
+    assert recorder.backoffs == [5, 5, 5]
+
+
+def test_crash_without_restart(tmp_path, backoff):
+    recorder = backoff(1)
+    crashes = []
+    exe = ExeManagement(str(tmp_path), make_script(tmp_path, 'crash.sh', 'exit 2'), 1, supervise=1)
+    exe.on_crash = crashes.append
+    exe.start()
+    wait_for(lambda: len(crashes) == 1)
+    assert exe.exit_code == 2 and recorder.backoffs == []
+
+
+@pytest.mark.parametrize('supervise, exit_code', [(1, 0), (0, 0), (0, 5)])
+def test_not_a_crash(tmp_path, backoff, supervise, exit_code):
+    # a launcher exiting with 0, or a program that isn't supervised (like the pre and post pass scripts)
+    recorder = backoff(1)
+    crashes = []
+    exe = ExeManagement(str(tmp_path), make_script(tmp_path, 'launcher.sh', 'exit {0}'.format(exit_code)), 1,
+                        supervise=supervise, restart_on_crash=1)
+    exe.on_crash = crashes.append
+    exe.start()
+    exe.process.wait()
+    if supervise == 1:
+        wait_for(lambda: exe.exit_code is not None)
+    time.sleep(0.1)
+    assert crashes == [] and recorder.backoffs == []
+
+
+def test_kill_is_not_a_crash(tmp_path, backoff):
+    recorder = backoff(1)
+    crashes = []
+    exe = ExeManagement(str(tmp_path), make_script(tmp_path, 'hydra.sh', 'exec sleep 30'), 1, supervise=1, restart_on_crash=1)
+    exe.on_crash = crashes.append
+    exe.start()
+    assert exe.is_running() == 1
+    exe.kill()
+    assert exe.wait_until_stopped(5) == 1
+    wait_for(lambda: exe.exit_code is not None)
+    assert crashes == [] and recorder.backoffs == [] and exe.is_running() == 0
+
+
+def test_ready_in_log(tmp_path):
+    name = make_script(tmp_path, 'hydra.sh', 'sleep 0.3; echo "Telemetry server READY" >> hydra.log; exec sleep 30')
+    exe = ExeManagement(str(tmp_path), name, 1, ready_log='*.log', ready_pattern='READY', supervise=1)
+    exe.start()
+    try:
+        assert exe.wait_until_ready() == 1
+        assert 0.2 < exe.ready_latencies[0] < 5
+    finally:
+        exe.kill()
+        exe.wait_until_stopped(5)
+
+
+def test_launcher_exits_before_ready(tmp_path):
+    # the launcher starts the real program in the background and exits; keep waiting for the program
+    name = make_script(tmp_path, 'start_sdr.sh', '(sleep 0.3; echo started > sdr.log) &\nexit 0')
+    exe = ExeManagement(str(tmp_path), name, 1, ready_log='sdr.log', ready_pattern='started', supervise=1)
+    exe.start()
+    assert exe.wait_until_ready() == 1
+    assert exe.process.returncode == 0
+
+
+def test_crash_before_ready(tmp_path):
+    exe = ExeManagement(str(tmp_path), make_script(tmp_path, 'sdr.sh', 'exit 1'), 1, ready_log='sdr.log',
+                        ready_pattern='started', ready_timeout_seconds=5)
+    exe.start()
+    start = time.perf_counter()
+    assert exe.wait_until_ready() == 0
+    assert time.perf_counter() - start < 2
+    assert exe.ready_latencies == []
+
+
+def test_ready_timeout(tmp_path):
+    exe = ExeManagement(str(tmp_path), make_script(tmp_path, 'sdr.sh', 'exec sleep 30'), 1, ready_log='sdr.log',
+                        ready_pattern='started', ready_timeout_seconds=0.3)
+    exe.start()
+    try:
+        assert exe.wait_until_ready() == 0
+    finally:
+        exe.kill()
+        exe.wait_until_stopped(5)
+
+
+def test_ready_port(tmp_path):
+    with socket.socket() as server:
+        server.bind(('127.0.0.1', 0))
+        server.listen()
+        exe = ExeManagement(str(tmp_path), make_script(tmp_path, 'launcher.sh', 'exit 0'), 1,
+                            ready_port=server.getsockname()[1])
+        exe.start()
+        assert exe.wait_until_ready() == 1
+
+
+def test_ready_delay(tmp_path, backoff):
+    # with no readiness check configured, it waits the fixed delay, even if the launcher has already exited
+    recorder = backoff(0)
+    exe = ExeManagement(str(tmp_path), make_script(tmp_path, 'launcher.sh', 'exit 0'), 1, ready_delay_seconds=15)
+    exe.start()
+    exe.process.wait()
+    assert exe.wait_until_ready() == 1
+    assert recorder.backoffs == [15]
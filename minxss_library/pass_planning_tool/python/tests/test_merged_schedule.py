@@ -0,0 +1,63 @@
+# MergedSchedule: several stations' resolved schedules on one timeline
+import numpy as np
+
+from pass_schedule import IdlDataClass, MergedSchedule, resolve_pass_conflicts
+
+priorities = {'MINXSS1': 5, 'CSIM': 4}
+
+
+def station_schedule(sat_names, start_minutes, end_minutes):
+    idl_data = IdlDataClass()
+    idl_data.sat_names = np.array(sat_names)
+    idl_data.start_jd = 2459000.5 + np.array(start_minutes, dtype=float) / 1440
+    idl_data.end_jd = 2459000.5 + np.array(end_minutes, dtype=float) / 1440
+    resolved = resolve_pass_conflicts(idl_data.start_jd, idl_data.end_jd, idl_data.sat_names, priorities, 2, 5)
+    return (idl_data, resolved)
+
+
+def test_merged_in_start_order():
+    boulder = station_schedule(['MINXSS1', 'QB50', 'CSIM'], [0, 20, 40], [10, 30, 50])
+    fairbanks = station_schedule(['CSIM', 'MINXSS1'], [5, 45], [15, 55])
+    merged = MergedSchedule({'BOULDER': boulder, 'FAIRBANKS': fairbanks})
+    # QB50 isn't monitored, so it isn't run and isn't merged
+    assert list(merged.sat_names) == ['MINXSS1', 'CSIM', 'CSIM', 'MINXSS1']
+    assert list(merged.station_names) == ['BOULDER', 'FAIRBANKS', 'BOULDER', 'FAIRBANKS']
+    assert list(merged.pass_indices) == [0, 0, 2, 1]
+    assert np.all(np.diff(merged.start_jd_adjusted) >= 0)
+
+
+def test_merged_uses_adjusted_times():
+    # CSIM is pushed back behind the higher priority MINXSS1 pass at the same station
+    boulder = station_schedule(['MINXSS1', 'CSIM'], [0, 5], [10, 20])
+    merged = MergedSchedule({'BOULDER': boulder})
+    assert merged.start_jd_adjusted[1] == boulder[0].end_jd[0]
+    assert merged.end_jd_adjusted[1] == boulder[0].end_jd[1]
+
+
+def test_passes_between_boundaries():
+    boulder = station_schedule(['MINXSS1', 'CSIM', 'MINXSS1'], [0, 20, 40], [10, 30, 50])
+    merged = MergedSchedule({'BOULDER': boulder})
+    t = merged.start_jd_adjusted
+    # a pass starting exactly at start_jd is included, one starting exactly at end_jd isn't
+    assert list(merged.passes_between(t[0], t[1])) == [0]
+    assert list(merged.passes_between(t[0], t[2] + 1e-9)) == [0, 1, 2]
+    assert list(merged.passes_between(t[2] + 1e-9, t[2] + 1)) == []
+
+
+def test_find_handoffs():
+    # MINXSS1 leaves Boulder's sky and shows up at Fairbanks 3 minutes later; CSIM is 30 minutes apart
+    boulder = station_schedule(['MINXSS1', 'CSIM'], [0, 20], [10, 25])
+    fairbanks = station_schedule(['MINXSS1', 'CSIM'], [13, 55], [20, 60])
+    merged = MergedSchedule({'BOULDER': boulder, 'FAIRBANKS': fairbanks})
+    handoffs = merged.find_handoffs(5)
+    assert [(merged.station_names[i], merged.station_names[j], merged.sat_names[i]) for [i, j] in handoffs] == \
+        [('BOULDER', 'FAIRBANKS', 'MINXSS1')]
+    assert len(merged.find_handoffs(2)) == 0
+    assert len(merged.find_handoffs(40)) == 2
+
+
+def test_empty():
+    merged = MergedSchedule({})
+    assert len(merged.start_jd_adjusted) == 0
+    assert list(merged.passes_between(0, 1e9)) == []
+    assert merged.find_handoffs(5) == []
@@ -0,0 +1,138 @@
+# minutes_until_next_pass (searchsorted + next_monitored_index) against the linear scan it replaced
+import datetime
+import types
+
+import jdcal
+import numpy as np
+import pytest
+
+import jd_utc_time
+import auto_pass_manager
+from pass_schedule import next_monitored_index
+
+sat_names_all = ['MINXSS1', 'MINXSS2', 'CSIM', 'QB50']
+monitored = ['MINXSS1', 'CSIM']
+buffer_seconds_after_pass_end = 60
+
+
+class FixedClock:
+    def __init__(self, jd):
+        [year, month, day, fraction] = jdcal.jd2gcal(jdcal.MJD_0, jd - jdcal.MJD_0)
+        self.now = datetime.datetime(year, month, day) + datetime.timedelta(days=fraction)
+
+    def utcnow(self):
+        return self.now
+
+
+@pytest.fixture
+def set_now(monkeypatch):
+    def set_now_jd(jd):
+        monkeypatch.setattr(jd_utc_time, 'clock', FixedClock(jd))
+        # the clock has microsecond resolution, so use the jd it actually reports
+        return jd_utc_time.now_in_jd()
+    return set_now_jd
+
+
+# a PassManager with just what minutes_until_next_pass needs (no ini files, no emails sent)
+def make_pass_manager():
+    p = auto_pass_manager.PassManager.__new__(auto_pass_manager.PassManager)
+    p.cfg = types.SimpleNamespace(buffer_seconds_after_pass_end=buffer_seconds_after_pass_end)
+    p.sat_cfgs = {sat_name: None for sat_name in monitored}
+    p.ignored_sats = set()
+    p.next_monitored_lookup = (None, None)
+    p.emails = []
+    p.email = p.emails.append
+    return p
+
+
+# the loop minutes_until_next_pass used to be
+def old_minutes_until_next_pass(now_jd, start_times, sat_names):
+    acceptable_minutes_from_pass_start = min(8, buffer_seconds_after_pass_end / 60 + 1)
+    ignored = set()
+    for ind in range(len(start_times)):
+        tdiff = start_times[ind] - now_jd
+        if tdiff * 24 * 60 > -acceptable_minutes_from_pass_start:
+            if sat_names[ind] in monitored:
+                return [ind, tdiff * 24 * 60, ignored]
+            ignored.add(sat_names[ind])
+    return [-1, 99999, ignored]
+
+
+def random_schedule(rng, num_passes):
+    start_jd = 2459000.5 + np.sort(rng.uniform(0, 2, num_passes))
+    sat_names = np.array(sat_names_all)[rng.integers(0, len(sat_names_all), num_passes)]
+    return [start_jd, sat_names]
+
+
+def test_next_monitored_index():
+    sat_names = ['QB50', 'MINXSS1', 'MINXSS2', 'QB50', 'CSIM', 'QB50']
+    assert list(next_monitored_index(sat_names, monitored)) == [1, 1, 4, 4, 4, 6]
+    assert list(next_monitored_index(sat_names, [])) == [6] * 6
+    assert len(next_monitored_index([], monitored)) == 0
+
+
+def test_matches_linear_scan(set_now):
+    rng = np.random.default_rng(1)
+    for trial in range(20):
+        [start_jd, sat_names] = random_schedule(rng, 200)
+        p = make_pass_manager()
+        for now_jd in rng.uniform(start_jd[0] - 0.1, start_jd[-1] + 0.1, 50):
+            now_jd = set_now(now_jd)
+            [old_ind, old_minutes, old_ignored] = old_minutes_until_next_pass(now_jd, start_jd, sat_names)
+            p.ignored_sats = set()
+            [ind, minutes] = p.minutes_until_next_pass(start_jd, sat_names)
+            assert ind == old_ind
+            assert minutes == pytest.approx(old_minutes, abs=1e-6)
+            assert p.ignored_sats == old_ignored
+
+
+@pytest.mark.parametrize('seconds_from_boundary, expected_index', [(-1, 0), (1, 1)])
+def test_recently_started_pass_boundary(set_now, seconds_from_boundary, expected_index):
+    # a pass that started up to min(8, buffer/60 + 1) = 2 minutes ago is still run
+    start_jd = np.array([2459000.5, 2459000.6])
+    sat_names = np.array(['MINXSS1', 'CSIM'])
+    set_now(start_jd[0] + (2 * 60 + seconds_from_boundary) / 86400)
+    [ind, minutes] = make_pass_manager().minutes_until_next_pass(start_jd, sat_names)
+    assert ind == expected_index
+
+
+def test_pass_starting_now_and_exact_start_times(set_now):
+    start_jd = np.array([2459000.5, 2459000.5, 2459000.5])
+    sat_names = np.array(['QB50', 'MINXSS2', 'MINXSS1'])
+    now_jd = set_now(start_jd[0])
+    p = make_pass_manager()
+    [ind, minutes] = p.minutes_until_next_pass(start_jd, sat_names)
+    assert ind == 2
+    assert minutes == pytest.approx((start_jd[2] - now_jd) * 24 * 60)
+    assert p.ignored_sats == {'QB50', 'MINXSS2'}
+
+
+def test_only_ignored_satellites_left(set_now):
+    start_jd = np.array([2459000.5, 2459000.6, 2459000.7])
+    sat_names = np.array(['MINXSS1', 'QB50', 'MINXSS2'])
+    set_now(2459000.55)
+    p = make_pass_manager()
+    assert p.minutes_until_next_pass(start_jd, sat_names) == [-1, 99999]
+    assert p.ignored_sats == {'QB50', 'MINXSS2'}
+    assert p.emails == ['NoPassTimes']
+
+
+def test_after_last_pass_and_empty_schedule(set_now):
+    start_jd = np.array([2459000.5])
+    set_now(2459001.5)
+    p = make_pass_manager()
+    assert p.minutes_until_next_pass(start_jd, np.array(['MINXSS1'])) == [-1, 99999]
+    assert p.minutes_until_next_pass(np.array([]), np.array([])) == [-1, 99999]
+
+
+def test_lookup_is_cached_per_schedule(set_now):
+    [start_jd, sat_names] = random_schedule(np.random.default_rng(2), 50)
+    set_now(start_jd[0])
+    p = make_pass_manager()
+    p.minutes_until_next_pass(start_jd, sat_names)
+    lookup = p.next_monitored_lookup[1]
+    p.minutes_until_next_pass(start_jd, sat_names)
+    assert p.next_monitored_lookup[1] is lookup
+    # a reloaded schedule is a new array, so the lookup is rebuilt
+    p.minutes_until_next_pass(start_jd, sat_names.copy())
+    assert p.next_monitored_lookup[1] is not lookup
@@ -0,0 +1,142 @@
+# resolve_pass_conflicts (one heap sweep over the schedule) against the per-chain loop in the old
+# PassManager.add_pass_conflicts
+import numpy as np
+import pytest
+
+import jd_utc_time
+from pass_schedule import resolve_pass_conflicts
+
+setup_minutes_before_pass = 2
+buffer_seconds_transition_high_priority = 5
+priorities = {'MINXSS1': 5, 'MINXSS2': 4, 'QB50': 3, 'CSIM': 4}
+
+
+# the old add_pass_conflicts: collect the chain of passes that overlap (including setup time) starting from
+# first_index, sort it by (start, -priority), then walk it, re-sorting every time a pass is pushed back.
+# Returns the chain in the order it would be run, as [index, start, end, is_shortened] lists.
+def old_add_pass_conflicts(start_jd, end_jd, sat_names, first_index):
+    chain = [[first_index, start_jd[first_index], end_jd[first_index], 0]]
+    endcompare = end_jd[first_index]
+    for i in range(first_index + 1, len(start_jd)):
+        if sat_names[i] not in priorities:
+            continue
+        if endcompare + jd_utc_time.secs_to_jd(setup_minutes_before_pass * 60) > start_jd[i]:
+            chain.append([i, start_jd[i], end_jd[i], 0])
+            endcompare = max(endcompare, end_jd[i])
+        else:
+            break
+
+    def priority(entry):
+        return priorities[sat_names[entry[0]]]
+
+    chain = sorted(chain, key=lambda entry: (entry[1], -priority(entry)))
+    for active in range(len(chain) - 1):
+        i = active + 1
+        j = 0
+        while j < len(chain) + 100:
+            if chain[active][2] > chain[i][1]:
+                if priority(chain[i]) > priority(chain[active]):
+                    chain[active][2] = chain[i][1] - jd_utc_time.secs_to_jd(buffer_seconds_transition_high_priority)
+                    chain[active][3] = 1
+                    break
+                chain[i][1] = chain[active][2]
+                chain[i][3] = 1
+                chain = sorted(chain, key=lambda entry: (entry[1], -priority(entry)))
+            else:
+                break
+            j += 1
+    return chain
+
+
+def resolve(start_jd, end_jd, sat_names, **kwargs):
+    return resolve_pass_conflicts(start_jd, end_jd, sat_names, priorities, setup_minutes_before_pass,
+                                  buffer_seconds_transition_high_priority, **kwargs)
+
+
+# passes on a 1 minute grid, so there are plenty of identical start times and exact overlaps
+def random_schedule(rng, num_passes, num_days):
+    start_minutes = np.sort(rng.integers(0, num_days * 1440, num_passes))
+    length_minutes = rng.integers(0, 15, num_passes)
+    start_jd = 2459000.5 + start_minutes / 1440
+    end_jd = 2459000.5 + (start_minutes + length_minutes) / 1440
+    sat_names = np.array(list(priorities) + ['UNMONITORED'])[rng.integers(0, len(priorities) + 1, num_passes)]
+    return [start_jd, end_jd, sat_names]
+
+
+def assert_matches_old(start_jd, end_jd, sat_names, resolved):
+    num_checked = 0
+    for first_index in resolved.group_first_index:
+        chain = old_add_pass_conflicts(start_jd, end_jd, sat_names, first_index)
+        assert list(resolved.group_members(first_index)) == [entry[0] for entry in chain]
+        for [i, start, end, is_shortened] in chain:
+            assert resolved.start_jd_adjusted[i] == start
+            assert resolved.end_jd_adjusted[i] == end
+            assert resolved.is_shortened[i] == is_shortened
+        num_checked += len(chain)
+    # every monitored pass is in exactly one group
+    assert num_checked == np.count_nonzero(np.isin(sat_names, list(priorities)))
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_matches_old_algorithm(seed):
+    [start_jd, end_jd, sat_names] = random_schedule(np.random.default_rng(seed), 300, 2)
+    assert_matches_old(start_jd, end_jd, sat_names, resolve(start_jd, end_jd, sat_names))
+
+
+def test_matches_old_algorithm_crowded():
+    # a few hundred passes in a couple of hours, so conflict groups get long
+    [start_jd, end_jd, sat_names] = random_schedule(np.random.default_rng(42), 200, 0.1)
+    resolved = resolve(start_jd, end_jd, sat_names)
+    assert np.max(np.bincount(resolved.group[resolved.group >= 0])) > 10
+    assert_matches_old(start_jd, end_jd, sat_names, resolved)
+
+
+def test_hand_worked_conflict():
+    # the first case of the old PassManagerTests, in units of 10 seconds:
+    # MINXSS2 (4) 2-8, QB50 (3) 3-11, MINXSS1 (5) 5-10
+    t0 = 2459000.5
+    start_jd = t0 + jd_utc_time.secs_to_jd(np.array([20., 30., 50.]))
+    end_jd = t0 + jd_utc_time.secs_to_jd(np.array([80., 110., 100.]))
+    resolved = resolve(start_jd, end_jd, np.array(['MINXSS2', 'QB50', 'MINXSS1']))
+    buffer_jd = jd_utc_time.secs_to_jd(buffer_seconds_transition_high_priority)
+    # MINXSS2 ends just before MINXSS1 starts, QB50 waits for MINXSS1 to finish
+    assert list(resolved.group_members(0)) == [0, 2, 1]
+    assert resolved.end_jd_adjusted[0] == pytest.approx(start_jd[2] - buffer_jd)
+    assert resolved.start_jd_adjusted[2] == start_jd[2] and resolved.end_jd_adjusted[2] == end_jd[2]
+    assert resolved.start_jd_adjusted[1] == end_jd[2] and resolved.end_jd_adjusted[1] == end_jd[1]
+    assert list(resolved.is_shortened) == [1, 1, 0]
+    assert resolved.same_priority_conflicts == []
+
+
+def test_same_priority_and_canceled_pass():
+    # CSIM and MINXSS2 have the same priority: the first one to start wins, and the other one is canceled
+    # because it would start after it ends
+    start_jd = 2459000.5 + np.array([0., 1., 30.]) / 1440
+    end_jd = 2459000.5 + np.array([10., 8., 40.]) / 1440
+    resolved = resolve(start_jd, end_jd, np.array(['CSIM', 'MINXSS2', 'MINXSS1']))
+    assert resolved.same_priority_conflicts == [(0, 1)]
+    assert resolved.start_jd_adjusted[1] > resolved.end_jd_adjusted[1]
+    assert list(resolved.group) == [0, 0, 1]
+    assert list(resolved.group_first_index) == [0, 2]
+    assert resolved.is_group_start(0) and not resolved.is_group_start(1) and resolved.is_group_start(2)
+
+
+def test_setup_time_joins_groups():
+    # passes 1 minute apart conflict (setup takes 2 minutes), passes 3 minutes apart don't
+    start_jd = 2459000.5 + np.array([0., 11., 24.]) / 1440
+    end_jd = 2459000.5 + np.array([10., 21., 30.]) / 1440
+    resolved = resolve(start_jd, end_jd, np.array(['MINXSS1', 'QB50', 'MINXSS2']))
+    assert list(resolved.group) == [0, 0, 1]
+
+
+def test_unmonitored_and_outside_range_are_left_alone():
+    start_jd = 2459000.5 + np.array([0., 1., 2., 3.]) / 1440
+    end_jd = 2459000.5 + np.array([10., 10., 10., 10.]) / 1440
+    sat_names = np.array(['UNMONITORED', 'QB50', 'MINXSS1', 'MINXSS2'])
+    resolved = resolve(start_jd, end_jd, sat_names, first_index=1, last_index=3)
+    assert resolved.group[0] == -1 and resolved.group[3] == -1
+    assert resolved.start_jd_adjusted[3] == start_jd[3] and resolved.end_jd_adjusted[3] == end_jd[3]
+    assert list(resolved.order) == [1, 2]
+    assert resolved.end_jd_adjusted[1] < start_jd[2]
+    assert len(resolve(start_jd, end_jd, np.array(['A', 'B', 'C', 'D'])).order) == 0
+    assert len(resolve(np.array([]), np.array([]), np.array([])).order) == 0
@@ -0,0 +1,57 @@
+# SatellitePassManager.take_post_pass_inputs picks the rundir of the pass that just ended
+import os
+import types
+
+import pytest
+
+import auto_pass_manager
+from rundir_index import RundirIndex
+
+
+# a SatellitePassManager with just what take_post_pass_inputs needs, after Hydra made launch_rundir for the pass
+def make_sat_pass_manager(rundirs_dir, launch_rundir):
+    s = auto_pass_manager.SatellitePassManager.__new__(auto_pass_manager.SatellitePassManager)
+    s.cfg = types.SimpleNamespace(do_monitor_hydra=1)
+    s.email = types.SimpleNamespace(script_name='sci_mode.prc')
+    s.wasrun_scriptloc = os.path.join('was_run', 'was_run_sci_mode.prc')
+    s.rundir_index = RundirIndex(str(rundirs_dir))
+    s.hydra_exe = types.SimpleNamespace(num_restarts=2)
+    s.hydra_restarts_at_launch = 2
+    s.active_rundir = launch_rundir
+    return s
+
+
+def add_rundir(rundirs_dir, name):
+    (rundirs_dir / name).mkdir(parents=True)
+    # make sure the index sees the change, however coarse the filesystem's mtimes are
+    mtime_ns = os.stat(str(rundirs_dir)).st_mtime_ns + 1000000000
+    os.utime(str(rundirs_dir), ns=(mtime_ns, mtime_ns))
+    return str(rundirs_dir / name)
+
+
+@pytest.fixture
+def rundirs_dir(tmp_path):
+    rundirs_dir = tmp_path / 'Hydra' / 'Rundirs'
+    add_rundir(rundirs_dir, '2018_348_10_00_00')
+    return rundirs_dir
+
+
+def test_launch_rundir(rundirs_dir):
+    launch_rundir = add_rundir(rundirs_dir, '2018_348_14_05_22')
+    s = make_sat_pass_manager(rundirs_dir, launch_rundir)
+    assert s.take_post_pass_inputs() == [s.wasrun_scriptloc, 'sci_mode.prc', launch_rundir]
+    assert s.active_rundir is None
+
+
+def test_rundir_not_made_by_launch(rundirs_dir):
+    # Hydra hadn't made its rundir yet when it was ready, so it's looked up after the pass
+    s = make_sat_pass_manager(rundirs_dir, None)
+    rundir = add_rundir(rundirs_dir, '2018_348_14_05_22')
+    assert s.take_post_pass_inputs()[2] == rundir
+
+
+def test_hydra_restarted_during_pass(rundirs_dir):
+    s = make_sat_pass_manager(rundirs_dir, add_rundir(rundirs_dir, '2018_348_14_05_22'))
+    s.hydra_exe.num_restarts += 1
+    restart_rundir = add_rundir(rundirs_dir, '2018_348_14_09_41')
+    assert s.take_post_pass_inputs()[2] == restart_rundir
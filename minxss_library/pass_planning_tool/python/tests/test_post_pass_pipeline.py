@@ -0,0 +1,137 @@
+# PostPassQueue: jobs run and are removed, failures are kept, unfinished jobs are picked up again after a restart,
+# and a satellite's jobs run one at a time in the order they were queued
+import os
+import shutil
+import threading
+import time
+import types
+
+import pytest
+
+from post_pass_pipeline import PostPassQueue
+
+
+# stands in for a SatellitePassManager, recording the post_pass calls
+class FakeSatPassManager:
+    def __init__(self, sat_name, calls, post_pass_seconds=0, release=None, fail_on=None):
+        self.cfg = types.SimpleNamespace(sat_name=sat_name)
+        self.calls = calls
+        self.post_pass_seconds = post_pass_seconds
+        self.release = release
+        self.fail_on = fail_on
+        self.num_running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def post_pass(self, info, wasrun_scriptloc, rundir_path=None, script_name=None):
+        with self.lock:
+            self.num_running += 1
+            self.max_running = max(self.max_running, self.num_running)
+        if self.release is not None:
+            self.release.wait(10)
+        time.sleep(self.post_pass_seconds)
+        with self.lock:
+            self.num_running -= 1
+        if info.pass_number == self.fail_on:
+            raise ValueError('analysis failed')
+        self.calls.append((self.cfg.sat_name, info.pass_number, wasrun_scriptloc, rundir_path, script_name))
+
+
+def make_info(sat_name, pass_number):
+    return types.SimpleNamespace(sat_name=sat_name, pass_number=pass_number, start_jd=2458466.5 + pass_number)
+
+
+def submit_pass(queue, sat_pass_manager, pass_number):
+    sat_name = sat_pass_manager.cfg.sat_name
+    queue.submit(sat_pass_manager, make_info(sat_name, pass_number), 'was_run_{0}_{1}.prc'.format(sat_name, pass_number),
+                 '{0}_{1}.prc'.format(sat_name, pass_number), 'Rundirs/{0}_{1}'.format(sat_name, pass_number))
+
+
+def pending_files(queue_dir):
+    return sorted(os.listdir(os.path.join(queue_dir, 'pending')))
+
+
+def test_job_runs_and_is_removed(tmp_path):
+    calls = []
+    sat = FakeSatPassManager('MINXSS2', calls)
+    queue = PostPassQueue(str(tmp_path), 2, {'MINXSS2': sat})
+    submit_pass(queue, sat, 1)
+    queue.wait_until_empty()
+    assert calls == [('MINXSS2', 1, 'was_run_MINXSS2_1.prc', 'Rundirs/MINXSS2_1', 'MINXSS2_1.prc')]
+    assert pending_files(str(tmp_path)) == [] and os.listdir(str(tmp_path / 'failed')) == []
+    assert queue.num_pending() == 0
+
+
+def test_failed_job_is_kept(tmp_path):
+    calls = []
+    sat = FakeSatPassManager('MINXSS2', calls, fail_on=1)
+    queue = PostPassQueue(str(tmp_path), 2, {'MINXSS2': sat})
+    for pass_number in range(3):
+        submit_pass(queue, sat, pass_number)
+    queue.wait_until_empty()
+    # the jobs after the failed one still run
+    assert [call[1] for call in calls] == [0, 2]
+    failed = os.listdir(str(tmp_path / 'failed'))
+    assert len(failed) == 1 and pending_files(str(tmp_path)) == []
+    with open(str(tmp_path / 'failed' / failed[0])) as file:
+        text = file.read()
+    assert 'ValueError: analysis failed' in text and '"pass_number": 1' in text
+
+
+def test_unfinished_jobs_resume_in_order(tmp_path):
+    # the pass manager stops while the first job is still running (so none have finished)
+    release = threading.Event()
+    sat = FakeSatPassManager('MINXSS2', [], release=release)
+    queue = PostPassQueue(str(tmp_path / 'before'), 1, {'MINXSS2': sat})
+    for pass_number in range(5):
+        submit_pass(queue, sat, pass_number)
+    time.sleep(0.1)
+    shutil.copytree(str(tmp_path / 'before' / 'pending'), str(tmp_path / 'after' / 'pending'))
+    release.set()
+    queue.wait_until_empty()
+    assert len(pending_files(str(tmp_path / 'after'))) == 5
+
+    calls = []
+    restarted = PostPassQueue(str(tmp_path / 'after'), 3, {'MINXSS2': FakeSatPassManager('MINXSS2', calls)})
+    restarted.resume()
+    restarted.wait_until_empty()
+    assert [call[1] for call in calls] == [0, 1, 2, 3, 4]
+    assert calls[3] == ('MINXSS2', 3, 'was_run_MINXSS2_3.prc', 'Rundirs/MINXSS2_3', 'MINXSS2_3.prc')
+    assert pending_files(str(tmp_path / 'after')) == []
+
+
+@pytest.mark.parametrize('num_workers', [1, 4])
+def test_sat_jobs_run_one_at_a_time_in_order(tmp_path, num_workers):
+    calls = []
+    sats = {sat_name: FakeSatPassManager(sat_name, calls, post_pass_seconds=0.002) for sat_name in ['MINXSS2', 'CUTE_1']}
+    queue = PostPassQueue(str(tmp_path), num_workers, sats)
+    for pass_number in range(30):
+        submit_pass(queue, sats['MINXSS2'], pass_number)
+        if pass_number % 3 == 0:
+            submit_pass(queue, sats['CUTE_1'], pass_number)
+    queue.wait_until_empty()
+    for sat_name in sats:
+        assert [call[1] for call in calls if call[0] == sat_name] == [n for n in range(30) if sat_name == 'MINXSS2' or n % 3 == 0]
+        assert sats[sat_name].max_running == 1
+    assert queue.num_pending() == 0
+
+
+def test_other_sats_run_while_one_is_busy(tmp_path):
+    calls = []
+    release = threading.Event()
+    sats = {'MINXSS2': FakeSatPassManager('MINXSS2', calls, release=release),
+            'CUTE_1': FakeSatPassManager('CUTE_1', calls)}
+    queue = PostPassQueue(str(tmp_path), 2, sats)
+    submit_pass(queue, sats['MINXSS2'], 1)
+    submit_pass(queue, sats['CUTE_1'], 1)
+    submit_pass(queue, sats['CUTE_1'], 2)
+    start = time.perf_counter()
+    while len(calls) < 2:
+        assert time.perf_counter() - start < 5
+        time.sleep(0.01)
+    assert calls == [('CUTE_1', 1, 'was_run_CUTE_1_1.prc', 'Rundirs/CUTE_1_1', 'CUTE_1_1.prc'),
+                     ('CUTE_1', 2, 'was_run_CUTE_1_2.prc', 'Rundirs/CUTE_1_2', 'CUTE_1_2.prc')]
+    assert queue.num_pending() == 1
+    release.set()
+    queue.wait_until_empty()
+    assert calls[-1][:2] == ('MINXSS2', 1)
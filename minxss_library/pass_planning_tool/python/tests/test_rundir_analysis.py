@@ -0,0 +1,142 @@
+# parse_eventlog (one streaming pass) and Rundir.analyze against the old StoreInCSV / FindErrorLines, which read
+# the EventLog once each
+import csv
+import os
+import re
+import types
+
+import numpy as np
+import pytest
+
+import rundir_analysis
+from rundir_analysis import Rundir, parse_eventlog
+
+pass_script = 'was_run_minxss2_pass_0042.prc'
+line_templates = ['{t} cmdTry: {n}',
+                  '{t} cmdTry: ',
+                  '{t} cmdSucceed: {n}',
+                  '{t} cmdSucceed: ',
+                  '{t} Done with script Scripts\\scripts_to_run_automatically\\sci_mode_{n}.prc',
+                  '{t} Done with script Scripts\\script_to_run_automatically_on_hydra_boot.prc',
+                  '{t} ERROR: Timeout waiting for telemetry point {n}',
+                  '{t} Script error in line {n}',
+                  '{t} Sending command MINXSS_NOOP {n}',
+                  '{t} Starting script Scripts\\scripts_to_run_automatically\\playback_{n}.prc',
+                  '{t} Opened file tlm_packets_2018_348_14_{n}.out',
+                  '{t} Closing file tlm_packets_2018_348_14_{n}.out',
+                  '{t} Telemetry rate {n} packets/s']
+
+
+# the old Rundir.FindErrorLines
+def old_find_error_lines(filename):
+    lines_array = []
+    with open(filename, 'r') as file:
+        for line in file:
+            if 'error' in line.lower():
+                lines_array.append(line)
+    return lines_array
+
+
+# the rows the old Rundir.StoreInCSV wrote (it looked at the two lines after each cmdTry by index)
+def old_cmd_attempt_rows(filename, scriptname):
+    rows = []
+    with open(filename, 'r') as file:
+        lines = file.readlines()
+    for i in range(0, len(lines)):
+        if 'cmdTry:' in lines[i]:
+            m = re.search(r'(?<=cmdTry: )\w+', lines[i])
+            cmd_succeed = ''
+            script_name = ''
+            cmd_try = m.group(0) if m is not None else 'Could not find cmdTry count'
+            if 'cmdSucceed:' in lines[i + 1]:
+                m = re.search(r'(?<=cmdSucceed: )\w+', lines[i + 1])
+                cmd_succeed = m.group(0) if m is not None else 'Could not find cmdSucceed count'
+            if 'Done with script Scripts' in lines[i + 2]:
+                script_name = re.search(r'(?<=Done with script Scripts).*', lines[i + 2]).group(0)[1:]
+                if 'script_to_run_automatically_on_hydra_boot.prc' in script_name:
+                    script_name = scriptname
+            rows.append([cmd_try, cmd_succeed, script_name])
+    return rows
+
+
+# a random EventLog. The old code read past the end of the file if one of the last two lines was a cmdTry,
+# so those are left out here (see test_cmd_try_at_end_of_log).
+def write_random_eventlog(filename, rng, num_lines, newline):
+    lines = []
+    for i in range(num_lines):
+        template = line_templates[rng.integers(0, len(line_templates))]
+        if i >= num_lines - 2 and 'cmdTry' in template:
+            template = line_templates[-1]
+        lines.append(template.format(t='2018/12/14 14:05:{0:02d}.{1:03d}'.format(i // 1000 % 60, i % 1000),
+                                     n=rng.integers(0, 100)))
+    with open(filename, 'w', newline='') as file:
+        file.write(newline.join(lines) + newline)
+
+
+@pytest.mark.parametrize('seed, newline', [(0, '\n'), (1, '\r\n'), (2, '\r\n')])
+def test_parse_eventlog_matches_old(tmp_path, seed, newline):
+    filename = str(tmp_path / 'EventLog_2018_348_14_05_22.txt')
+    write_random_eventlog(filename, np.random.default_rng(seed), 3000, newline)
+    summary = parse_eventlog(filename, pass_script, print_errors=0)
+
+    assert summary.error_lines == old_find_error_lines(filename)
+    assert [list(attempt) for attempt in summary.cmd_attempts] == old_cmd_attempt_rows(filename, pass_script)
+
+    with open(filename, 'r') as file:
+        lines = file.readlines()
+    assert summary.num_lines == len(lines)
+    assert summary.num_commands_sent == sum('Sending command' in line for line in lines)
+    assert summary.script_starts == [line.strip() for line in lines if 'Starting script' in line]
+    assert summary.tlm_files == [line.strip() for line in lines if 'tlm_packets' in line.lower() and 'closing' not in line.lower()]
+
+
+def test_back_to_back_cmd_tries(tmp_path):
+    filename = str(tmp_path / 'EventLog_1.txt')
+    with open(filename, 'w') as file:
+        file.write('cmdTry: 1\ncmdTry: 2\ncmdSucceed: 2\nDone with script Scripts\\a.prc\nend\n')
+    rows = [list(attempt) for attempt in parse_eventlog(filename, print_errors=0).cmd_attempts]
+    assert rows == old_cmd_attempt_rows(filename, '') == [['1', '', ''], ['2', '2', 'a.prc']]
+
+
+def test_cmd_try_at_end_of_log(tmp_path):
+    # the old code raised IndexError here; now the attempt is kept with what was found
+    filename = str(tmp_path / 'EventLog_1.txt')
+    with open(filename, 'w') as file:
+        file.write('start\ncmdTry: 4\ncmdSucceed: 4\n')
+    rows = [list(attempt) for attempt in parse_eventlog(filename, print_errors=0).cmd_attempts]
+    assert rows == [['4', '4', '']]
+
+
+def test_empty_eventlog(tmp_path):
+    filename = str(tmp_path / 'EventLog_1.txt')
+    open(filename, 'w').close()
+    summary = parse_eventlog(filename, print_errors=0)
+    assert summary.num_lines == 0 and summary.cmd_attempts == [] and summary.error_lines == []
+
+
+def test_analyze_matches_old(tmp_path, capsys):
+    rundir = tmp_path / '2018_348_14_05_22'
+    rundir.mkdir()
+    eventlog = str(rundir / 'EventLog_2018_348_14_05_22.txt')
+    write_random_eventlog(eventlog, np.random.default_rng(3), 500, '\r\n')
+    with open(str(rundir / 'tlm_packets_2018_348_14_05_22.out'), 'wb') as file:
+        file.write(bytes(4000))
+
+    cfg = types.SimpleNamespace(hydra_output_filename_prefix='tlm_packets', min_expected_data=10, elevation_to_expect_data=20)
+    info = types.SimpleNamespace(elevation=45.0)
+    results = Rundir(str(rundir), pass_script)
+    results.analyze(info, cfg)
+
+    assert results.eventlog_filepath == eventlog
+    assert results.bytes_downlinked_data == 4000
+    assert results.tlm_filename == 'tlm_packets_2018_348_14_05_22.out'
+    # the EventLog's error lines, then the not-enough-data error (4 kB < 10 kB at 45 degrees)
+    assert results.errors_array[:-1] == old_find_error_lines(eventlog)
+    assert results.errors_array[-1].startswith('ERROR: Expected to receive at least 10 kB')
+
+    with open(results.csv_filepath, 'r', newline='') as csvfile:
+        rows = list(csv.reader(csvfile, delimiter=',', quotechar='|'))
+    assert rows[0] == ['RunDir Name', 'cmdTry Count', 'cmdSucceed Count', 'Script Name']
+    assert rows[1:] == [['2018_348_14_05_22'] + row for row in old_cmd_attempt_rows(eventlog, pass_script)]
+    # the tlm file is all zeros, so there are no packets in it
+    assert results.packet_stats.num_packets <= 1 and results.packet_stats.num_realtime == 0
@@ -0,0 +1,122 @@
+# RundirIndex: the latest rundir, only re-listing the Rundirs folder when it changes, and the saved index file
+import json
+import os
+import threading
+
+import pytest
+
+import rundir_index
+from rundir_index import RundirIndex
+
+
+@pytest.fixture
+def rundirs_dir(tmp_path):
+    rundirs_dir = tmp_path / 'Hydra' / 'Rundirs'
+    rundirs_dir.mkdir(parents=True)
+    return rundirs_dir
+
+
+# adds (or removes) a rundir and moves the folder's mtime on, however coarse the filesystem's mtimes are
+def add_rundir(rundirs_dir, name, remove=False):
+    if remove:
+        (rundirs_dir / name).rmdir()
+    else:
+        (rundirs_dir / name).mkdir()
+    mtime_ns = os.stat(str(rundirs_dir)).st_mtime_ns + 1000000000
+    os.utime(str(rundirs_dir), ns=(mtime_ns, mtime_ns))
+
+
+def read_index(rundirs_dir):
+    with open(str(rundirs_dir.parent / 'rundir_index.json')) as file:
+        return json.load(file)
+
+
+@pytest.fixture
+def count_scans(monkeypatch):
+    scans = []
+    real_scandir = os.scandir
+
+    def scandir(path):
+        scans.append(path)
+        return real_scandir(path)
+    monkeypatch.setattr(rundir_index.os, 'scandir', scandir)
+    return scans
+
+
+def test_latest(rundirs_dir):
+    index = RundirIndex(str(rundirs_dir))
+    assert index.latest() is None and index.latest_name() == ''
+    for name in ['2018_348_14_05_22', '2019_001_00_00_01', '2018_349_09_30_00']:
+        add_rundir(rundirs_dir, name)
+    (rundirs_dir / '2020_001_00_00_00.txt').write_text('not a rundir')
+    assert index.latest() == str(rundirs_dir / '2019_001_00_00_01')
+    saved = read_index(rundirs_dir)
+    assert saved['latest'] == '2019_001_00_00_01'
+    assert saved['rundirs'] == ['2018_348_14_05_22', '2018_349_09_30_00', '2019_001_00_00_01']
+    assert saved['rundirs_dir_mtime_ns'] == os.stat(str(rundirs_dir)).st_mtime_ns
+
+    add_rundir(rundirs_dir, '2019_001_00_00_01', remove=True)
+    assert index.latest_name() == '2018_349_09_30_00'
+
+
+def test_only_lists_when_changed(rundirs_dir, count_scans):
+    add_rundir(rundirs_dir, '2018_348_14_05_22')
+    index = RundirIndex(str(rundirs_dir))
+    for i in range(3):
+        assert index.latest_name() == '2018_348_14_05_22'
+    assert len(count_scans) == 1
+    add_rundir(rundirs_dir, '2018_348_15_00_00')
+    assert index.latest_name() == '2018_348_15_00_00'
+    assert len(count_scans) == 2
+
+
+def test_loads_saved_index(rundirs_dir, count_scans):
+    add_rundir(rundirs_dir, '2018_348_14_05_22')
+    RundirIndex(str(rundirs_dir)).refresh()
+    # a new pass manager (or a restart) picks up the saved index instead of listing the folder again
+    assert RundirIndex(str(rundirs_dir)).latest_name() == '2018_348_14_05_22'
+    assert len(count_scans) == 1
+
+
+@pytest.mark.parametrize('contents', ['', '{"latest": "2018_3', '{"rundirs": ["2000_001_00_00_00"]}'])
+def test_bad_or_stale_index_file(rundirs_dir, contents):
+    add_rundir(rundirs_dir, '2018_348_14_05_22')
+    (rundirs_dir.parent / 'rundir_index.json').write_text(contents)
+    assert RundirIndex(str(rundirs_dir)).latest_name() == '2018_348_14_05_22'
+    assert read_index(rundirs_dir)['latest'] == '2018_348_14_05_22'
+
+
+def test_save_failure(rundirs_dir, monkeypatch, capsys):
+    def replace(src, dst):
+        raise OSError('disk full')
+    monkeypatch.setattr(rundir_index.os, 'replace', replace)
+    add_rundir(rundirs_dir, '2018_348_14_05_22')
+    # the index still works without being saved
+    assert RundirIndex(str(rundirs_dir)).latest_name() == '2018_348_14_05_22'
+    assert "Couldn't save the rundir index" in capsys.readouterr().out
+    # and the temporary file is cleaned up
+    assert sorted(os.listdir(str(rundirs_dir.parent))) == ['Rundirs']
+
+
+def test_concurrent_saves(rundirs_dir, capsys):
+    # the pass manager's threads share an index, and other processes (each with their own) save to the same file
+    add_rundir(rundirs_dir, '2018_348_14_05_22')
+    shared_index = RundirIndex(str(rundirs_dir))
+    indexes = [shared_index] * 4 + [RundirIndex(str(rundirs_dir)) for i in range(4)]
+    errors = []
+
+    def save_repeatedly(index):
+        try:
+            for i in range(50):
+                index.save()
+                assert index.latest_name() == '2018_348_14_05_22'
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=save_repeatedly, args=(index,)) for index in indexes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == [] and "Couldn't save" not in capsys.readouterr().out
+    assert read_index(rundirs_dir)['latest'] == '2018_348_14_05_22'
+    assert sorted(os.listdir(str(rundirs_dir.parent))) == ['Rundirs', 'rundir_index.json']
@@ -0,0 +1,126 @@
+# TleDistributor: change detection by mtime/size then hash, and atomic copies to every destination
+import os
+
+import pytest
+
+import tle_distribution
+from tle_distribution import TleDistributor, parse_tle_index
+
+tle_v1 = """MINXSS-2
+1 43758U 18099BA  18350.50000000  .00000000  00000-0  00000-0 0  9990
+2 43758  97.7000 100.0000 0010000  90.0000 270.0000 14.95000000    10
+CSIM
+1 43793U 18099CD  18350.50000000  .00000000  00000-0  00000-0 0  9991
+2 43793  97.7000 100.0000 0010000  90.0000 270.0000 14.95000000    11
+"""
+# new elements for CSIM only
+tle_v2 = tle_v1.replace('43793U 18099CD  18350.50000000', '43793U 18099CD  18351.50000000')
+
+
+def write(filename, text):
+    with open(filename, 'w') as file:
+        file.write(text)
+
+
+def read(filename):
+    with open(filename, 'r') as file:
+        return file.read()
+
+
+def set_mtime_ns(filename, mtime_ns):
+    os.utime(filename, ns=(mtime_ns, mtime_ns))
+
+
+def test_parse_tle_index():
+    tle_index = parse_tle_index(tle_v1 + "1 99999U 18099ZZ  18350.5\n2 99999  97.7\n")
+    assert sorted(tle_index) == ['99999', 'CSIM', 'MINXSS-2']
+    assert tle_index['CSIM'][0].startswith('1 43793U')
+    assert tle_index['CSIM'][1].startswith('2 43793')
+
+
+def test_copies_and_change_detection(tmp_path):
+    source = str(tmp_path / 'source.tle')
+    dests = [str(tmp_path / 'satpc.tle'), str(tmp_path / 'other.tle')]
+    write(source, tle_v1)
+    distributor = TleDistributor(source, dests)
+
+    assert distributor.update() == 1
+    assert distributor.changed_sats == ['CSIM', 'MINXSS-2']
+    assert [read(dest) for dest in dests] == [tle_v1, tle_v1]
+    assert distributor.num_copies == 2
+
+    # nothing changed: no copies
+    assert distributor.update() == 0
+    assert distributor.num_copies == 2
+
+    # same content rewritten (new mtime): hashed, but not new and not copied again
+    write(source, tle_v1)
+    set_mtime_ns(source, os.stat(source).st_mtime_ns + 10**9)
+    assert distributor.update() == 0
+    assert distributor.num_copies == 2
+
+    # new elements for one satellite
+    write(source, tle_v2)
+    set_mtime_ns(source, os.stat(source).st_mtime_ns + 2 * 10**9)
+    assert distributor.update() == 1
+    assert distributor.changed_sats == ['CSIM']
+    assert [read(dest) for dest in dests] == [tle_v2, tle_v2]
+    assert distributor.num_copies == 4
+
+
+def test_same_size_and_mtime_is_not_reread(tmp_path):
+    # the stat signature is what decides whether the file is read at all
+    source = str(tmp_path / 'source.tle')
+    write(source, tle_v1)
+    distributor = TleDistributor(source, [])
+    distributor.update()
+    mtime_ns = os.stat(source).st_mtime_ns
+    write(source, tle_v1.replace('MINXSS-2', 'MINXSS-3'))
+    set_mtime_ns(source, mtime_ns)
+    assert distributor.update() == 0
+
+
+def test_replaced_or_deleted_destination_is_fixed(tmp_path):
+    source = str(tmp_path / 'source.tle')
+    dest = str(tmp_path / 'satpc.tle')
+    write(source, tle_v1)
+    distributor = TleDistributor(source, [dest])
+    distributor.update()
+    os.remove(dest)
+    distributor.update()
+    assert read(dest) == tle_v1
+
+
+def test_up_to_date_destination_is_not_rewritten(tmp_path):
+    # e.g. the pass manager was restarted after SATPC already got this TLE file
+    source = str(tmp_path / 'source.tle')
+    dest = str(tmp_path / 'satpc.tle')
+    write(source, tle_v1)
+    write(dest, tle_v1)
+    dest_mtime_ns = os.stat(dest).st_mtime_ns
+    distributor = TleDistributor(source, [dest])
+    distributor.update()
+    assert distributor.num_copies == 0
+    assert os.stat(dest).st_mtime_ns == dest_mtime_ns
+
+
+def test_copy_is_atomic(tmp_path, monkeypatch):
+    # if the copy fails before it is renamed into place, the destination still has the whole old file
+    source = str(tmp_path / 'source.tle')
+    dest = str(tmp_path / 'satpc.tle')
+    write(source, tle_v2)
+    write(dest, tle_v1)
+
+    def failing_replace(src, dst):
+        raise OSError('disk full')
+    monkeypatch.setattr(tle_distribution.os, 'replace', failing_replace)
+    distributor = TleDistributor(source, [dest])
+    with pytest.raises(OSError):
+        distributor.update()
+    assert read(dest) == tle_v1
+
+    # the next update finishes the copy, and the temp file is renamed into place
+    monkeypatch.undo()
+    distributor.update()
+    assert read(dest) == tle_v2
+    assert sorted(os.listdir(tmp_path)) == ['satpc.tle', 'source.tle']
@@ -0,0 +1,156 @@
+# scan_tlm_file / scan_packets against a plain Python loop that follows the rules in the tlm_packet_stats header
+import os
+
+import numpy as np
+import pytest
+
+from tlm_packet_stats import PacketStats, scan_packets, scan_tlm_file, packet_types
+
+sample_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sample_files = ['Min_pkt_data_20181214.bin', 'pkt_data_20181214.bin']
+
+
+# one packet at a time, the way minxss_read_packets.pro walks the file
+def reference_stats(data):
+    data = bytes(data)
+    stats = PacketStats()
+    stats.num_bytes = len(data)
+
+    syncs = []
+    i = 0
+    while i < len(data) - 1:
+        if data[i] == 0xA5 and data[i + 1] == 0xA5:
+            syncs.append(i)
+            i += 2
+        else:
+            i += 1
+
+    packets = []
+    start = 0
+    for sync in syncs:
+        packets.append((start, sync))
+        start = sync + 2
+    packets.append((start, len(data)))
+    packets = [(start, end) for (start, end) in packets if end > start]
+    stats.num_packets = len(packets)
+
+    for (start, end) in packets:
+        header = None
+        for h in range(start, min(start + 30, end - 7)):
+            if data[h] == 0x08 and data[h + 4] == 0x00:
+                header = h
+                break
+        if header is None or header + 6 + data[header + 4] * 256 + data[header + 5] + 1 > end + 2:
+            stats.num_corrupted += 1
+            continue
+        name = packet_types.get(data[header + 1] & 0x3F, data[header + 1] & 0x3F)
+        stats.type_counts[name] = stats.type_counts.get(name, 0) + 1
+        stats.playback_type_counts.setdefault(name, 0)
+        if data[header + 1] & 0x40:
+            stats.num_playback += 1
+            stats.playback_type_counts[name] += 1
+        else:
+            stats.num_realtime += 1
+    return stats
+
+
+def assert_same_stats(stats, expected):
+    assert stats.num_bytes == expected.num_bytes
+    assert stats.num_packets == expected.num_packets
+    assert stats.num_realtime == expected.num_realtime
+    assert stats.num_playback == expected.num_playback
+    assert stats.num_corrupted == expected.num_corrupted
+    assert stats.type_counts == expected.type_counts
+    assert stats.playback_type_counts == expected.playback_type_counts
+
+
+# a CCSDS header, then data_length + 1 bytes (data and checksum, ending with the next sync word)
+def make_packet(apid, data_length, playback=0):
+    apid_byte = apid | (0x40 if playback else 0)
+    header = bytes([0x08, apid_byte, 0xC0, 0x00, data_length // 256, data_length % 256])
+    return header + b'\x11' * (data_length - 1) + b'\xa5\xa5'
+
+
+def scan_bytes(data):
+    return scan_packets(np.frombuffer(data, dtype=np.uint8))
+
+
+@pytest.mark.parametrize('filename', sample_files)
+def test_sample_files(filename):
+    filepath = os.path.join(sample_dir, filename)
+    stats = scan_tlm_file(filepath)
+    with open(filepath, 'rb') as file:
+        expected = reference_stats(file.read())
+    assert_same_stats(stats, expected)
+    assert stats.num_packets > 0
+
+
+def test_built_packets():
+    data = (b'\xa5\xa5' + make_packet(25, 40) + make_packet(44, 100, playback=1) + make_packet(44, 60)
+            + make_packet(63, 20, playback=1))
+    stats = scan_bytes(data)
+    assert_same_stats(stats, reference_stats(data))
+    assert stats.num_packets == 4 and stats.num_corrupted == 0
+    assert stats.type_counts == {'HK': 1, 'SCI': 2, 63: 1}
+    assert stats.playback_type_counts == {'HK': 0, 'SCI': 1, 63: 1}
+    assert stats.summary_text() == "63 1 (1 playback), HK 1, SCI 2 (1 playback) // 0 corrupted"
+
+
+def test_truncated_packet():
+    # the second packet's header says 100 bytes, but the next sync word comes after 30
+    data = b'\xa5\xa5' + make_packet(25, 40) + make_packet(44, 100)[:30] + b'\xa5\xa5' + make_packet(29, 20)
+    stats = scan_bytes(data)
+    assert_same_stats(stats, reference_stats(data))
+    assert stats.num_corrupted == 1
+    assert stats.type_counts == {'HK': 1, 'LOG': 1}
+
+
+def test_run_of_sync_bytes():
+    # five A5 bytes are two sync words and a stray A5, which the next packet's header search skips over
+    data = make_packet(25, 40)[:-2] + b'\xa5' * 5 + make_packet(29, 20)
+    stats = scan_bytes(data)
+    assert_same_stats(stats, reference_stats(data))
+    assert stats.num_packets == stats.num_realtime == 2 and stats.num_corrupted == 0
+
+
+def test_no_sync_word():
+    data = make_packet(43, 40)[:-2]
+    stats = scan_bytes(data)
+    assert_same_stats(stats, reference_stats(data))
+    assert stats.num_packets == 1 and stats.type_counts == {'SPS': 1}
+
+
+def test_no_header():
+    data = bytes(50) + b'\xa5\xa5' + bytes(range(1, 50))
+    stats = scan_bytes(data)
+    assert_same_stats(stats, reference_stats(data))
+    assert stats.num_packets == stats.num_corrupted == 2
+
+
+def test_short_and_empty_data(tmp_path):
+    for data in [b'', b'\xa5', b'\xa5\xa5', b'\x08\x19']:
+        assert_same_stats(scan_bytes(data), reference_stats(data))
+    filepath = str(tmp_path / 'tlm_packets_empty.out')
+    open(filepath, 'wb').close()
+    stats = scan_tlm_file(filepath)
+    assert stats.num_packets == 0 and stats.summary_text() == "no packets // 0 corrupted"
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_data(seed):
+    # whole and cut-off packets, with runs of sync bytes and noise mixed in
+    rng = np.random.default_rng(seed)
+    pieces = []
+    for i in range(200):
+        kind = rng.integers(0, 4)
+        if kind == 0:
+            pieces.append(make_packet(int(rng.integers(0, 64)), int(rng.integers(8, 300)), int(rng.integers(0, 2))))
+        elif kind == 1:
+            pieces.append(make_packet(int(rng.integers(0, 64)), int(rng.integers(8, 300)))[:int(rng.integers(0, 40))])
+        elif kind == 2:
+            pieces.append(b'\xa5' * int(rng.integers(1, 6)))
+        else:
+            noise = rng.choice([0x00, 0x08, 0xA5, 0x19, 0x2C], size=int(rng.integers(1, 50)))
+            pieces.append(noise.astype(np.uint8).tobytes())
+    data = b''.join(pieces)
+    assert_same_stats(scan_bytes(data), reference_stats(data))
@@ -0,0 +1,133 @@
+### Distributes the station's TLE file (from Dropbox) to SATPC and any other programs that read TLEs
+# The source file is only read when its mtime or size changes, and only copied when its content hash changes.
+# Copies are written to a temporary file and renamed into place, so a program never sees a half-written TLE file.
+# The TLEs are also parsed into a per-satellite index, so we can tell which satellites actually got new elements.
+
+import os
+import hashlib
+import asyncio
+
+# how often TleWatcher checks the source file for changes (just an os.stat, the file isn't read)
+watch_check_seconds = 2
+
+
+def hash_bytes(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_signature(filename):
+    file_stat = os.stat(filename)
+    return (file_stat.st_mtime_ns, file_stat.st_size)
+
+
+def write_atomically(filename, data):
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'wb') as file:
+        file.write(data)
+    os.replace(tmp_filename, filename)
+
+
+# Parses a TLE file into {satellite name: (line 1, line 2)}.
+# Handles both three-line sets (name, 1, 2) and bare two-line sets, which are keyed by their catalog number.
+def parse_tle_index(text):
+    tle_index = {}
+    name = None
+    lines = [line.strip() for line in text.splitlines()]
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith('1 ') and i + 1 < len(lines) and lines[i + 1].startswith('2 '):
+            if name is None:
+                name = line[2:7].strip()
+            tle_index[name] = (line, lines[i + 1])
+            name = None
+            i += 2
+            continue
+        if len(line) > 0:
+            name = line
+        i += 1
+    return tle_index
+
+
+# Hashes a file, but only re-reads it when its mtime or size has changed since the last call
+class FileFingerprint:
+    def __init__(self, filename):
+        self.filename = filename
+        self.signature = None
+        self.hash = None
+        self.data = None
+
+    # returns 1 if the file's content is different from the last time this was called (or this is the first call)
+    def update(self):
+        signature = file_signature(self.filename)
+        if signature == self.signature:
+            return 0
+        self.signature = signature
+        with open(self.filename, 'rb') as file:
+            data = file.read()
+        data_hash = hash_bytes(data)
+        if data_hash == self.hash:
+            return 0
+        self.hash = data_hash
+        self.data = data
+        return 1
+
+
+class TleDistributor:
+    def __init__(self, source_filename, dest_filenames):
+        self.source = FileFingerprint(source_filename)
+        self.dest_filenames = dest_filenames
+        self.dest_hashes = {}
+        self.tle_index = {}
+        self.changed_sats = []
+        self.num_copies = 0
+
+    # copies the source TLE file to each destination whose content doesn't match it yet.
+    # Returns 1 if the source had new content. The satellites whose elements changed are left in self.changed_sats.
+    # Raises OSError if the source file can't be read.
+    def update(self):
+        is_new = self.source.update()
+        if is_new:
+            tle_index = parse_tle_index(self.source.data.decode('ascii', errors='replace'))
+            self.changed_sats = sorted(name for name in tle_index if self.tle_index.get(name) != tle_index[name])
+            self.tle_index = tle_index
+
+        for dest_filename in self.dest_filenames:
+            if self.dest_hashes.get(dest_filename) == self.source.hash and os.path.exists(dest_filename):
+                continue
+            # the destination may already be current (e.g. after restarting the pass manager), so check before writing
+            if os.path.exists(dest_filename):
+                dest = FileFingerprint(dest_filename)
+                dest.update()
+                if dest.hash == self.source.hash:
+                    self.dest_hashes[dest_filename] = dest.hash
+                    continue
+            write_atomically(dest_filename, self.source.data)
+            self.dest_hashes[dest_filename] = self.source.hash
+            self.num_copies += 1
+        return is_new
+
+
+# Lets an asyncio task sleep until a file changes, checking only its mtime and size
+class TleWatcher:
+    def __init__(self, filename):
+        self.filename = filename
+        self.signature = self.get_signature()
+
+    def get_signature(self):
+        try:
+            return file_signature(self.filename)
+        except OSError:
+            return None
+
+    # returns 1 as soon as the file changes, or 0 after timeout_seconds without a change
+    async def wait_for_change(self, timeout_seconds):
+        waited_seconds = 0
+        while waited_seconds < timeout_seconds:
+            await asyncio.sleep(min(watch_check_seconds, timeout_seconds - waited_seconds))
+            waited_seconds += watch_check_seconds
+            signature = self.get_signature()
+            if signature != self.signature:
+                self.signature = signature
+                return 1
+        return 0
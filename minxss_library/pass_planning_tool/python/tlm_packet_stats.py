@@ -0,0 +1,153 @@
+### Packet counts for a Hydra telemetry file
+# Usage: python tlm_packet_stats.py <tlm file> [<tlm file> ...]
+#
+# Finds packets the same way minxss_read_packets.pro does, but with NumPy on a memory-mapped file:
+#   - packets are separated by 0xA5A5 sync words (flight software puts one at the end of each packet)
+#   - the CCSDS header is the first 0x08 byte, within the first 30 bytes after a sync word, that has a 0x00
+#     four bytes later
+#   - the APID is the low 6 bits of the byte after that 0x08, and 0x40 in that byte marks a playback packet
+# A packet is counted as corrupted if no header is found, or if it ends (at the next sync word) before the length in
+# its header says it should. The header's length includes the checksum and the sync word at the end of the packet.
+
+import os
+import sys
+import time
+import numpy as np
+
+sync_byte = 0xA5
+ccsds_byte1 = 0x08
+ccsds_byte5 = 0x00
+# how far past a sync word to look for the CCSDS header (see indexLast in minxss_read_packets.pro)
+header_search_bytes = 30
+ccsds_header_bytes = 6
+playback_flag = 0x40
+apid_mask = 0x3F
+
+# APIDs from minxss_read_packets.pro
+packet_types = {25: 'HK',
+                29: 'LOG',
+                35: 'DIAG',
+                38: 'ADCS1',
+                39: 'ADCS2',
+                40: 'ADCS3',
+                41: 'ADCS4',
+                42: 'IMAGE',  # XACT image
+                43: 'SPS',
+                44: 'SCI'}
+
+
+class PacketStats:
+    def __init__(self):
+        self.num_packets = 0
+        self.num_realtime = 0
+        self.num_playback = 0
+        self.num_corrupted = 0
+        self.type_counts = {}  # packet type name (or APID number, for APIDs we don't know) -> count
+        self.playback_type_counts = {}
+        self.num_bytes = 0
+        self.scan_seconds = 0
+
+    # e.g. "HK 12 (4 playback), SCI 30, LOG 2 (2 playback) // 1 corrupted"
+    def summary_text(self):
+        types = []
+        for name in sorted(self.type_counts, key=str):
+            txt = "{0} {1}".format(name, self.type_counts[name])
+            if self.playback_type_counts.get(name, 0) > 0:
+                txt += " ({0} playback)".format(self.playback_type_counts[name])
+            types.append(txt)
+        if len(types) == 0:
+            types.append("no packets")
+        return ', '.join(types) + " // {0} corrupted".format(self.num_corrupted)
+
+
+# returns the start of each sync word. Like the IDL code, a run of A5 bytes is split into back-to-back sync words.
+def find_sync_words(data):
+    if len(data) < 2:
+        return np.array([], dtype=np.int64)
+    is_sync_byte = data == sync_byte
+    candidates = np.flatnonzero(is_sync_byte[:-1] & is_sync_byte[1:])
+    if len(candidates) < 2:
+        return candidates
+    # position of each candidate within its run of consecutive candidates; keep every other one
+    is_run_start = np.concatenate(([True], np.diff(candidates) > 1))
+    run_start = candidates[is_run_start][np.cumsum(is_run_start) - 1]
+    return candidates[(candidates - run_start) % 2 == 0]
+
+
+# returns PacketStats for data (a NumPy uint8 array)
+def scan_packets(data):
+    stats = PacketStats()
+    stats.num_bytes = len(data)
+    syncs = find_sync_words(data)
+
+    # each packet runs from the end of one sync word to the start of the next
+    # (or from the start of the file, if it doesn't start with a sync word)
+    starts = syncs + 2
+    ends = np.append(syncs[1:], len(data)).astype(np.int64)
+    if len(syncs) == 0:
+        starts = np.array([0])
+        ends = np.array([len(data)])
+    elif syncs[0] != 0:
+        starts = np.concatenate(([0], starts))
+        ends = np.concatenate(([syncs[0]], ends))
+    is_packet = ends > starts
+    starts = starts[is_packet]
+    ends = ends[is_packet]
+    stats.num_packets = len(starts)
+    if stats.num_packets == 0:
+        return stats
+
+    # first possible CCSDS header in each packet
+    if len(data) > 4:
+        headers = np.flatnonzero((data[:-4] == ccsds_byte1) & (data[4:] == ccsds_byte5))
+    else:
+        headers = np.array([], dtype=np.int64)
+    header_index = np.searchsorted(headers, starts)
+    header = np.append(headers, len(data))[header_index]
+    has_header = header < np.minimum(starts + header_search_bytes, ends - 7)
+
+    header = header[has_header]
+    ends = ends[has_header]
+    apid_byte = data[header + 1].astype(np.int64)
+    data_length = data[header + 4].astype(np.int64) * 256 + data[header + 5] + 1
+    is_complete = header + ccsds_header_bytes + data_length <= ends + 2  # + 2 for the sync word
+
+    stats.num_corrupted = int(stats.num_packets - np.count_nonzero(is_complete))
+    apid_byte = apid_byte[is_complete]
+    apids = apid_byte & apid_mask
+    is_playback = (apid_byte & playback_flag) > 0
+    stats.num_playback = int(np.count_nonzero(is_playback))
+    stats.num_realtime = int(len(apids) - stats.num_playback)
+
+    counts = np.bincount(apids, minlength=apid_mask + 1)
+    playback_counts = np.bincount(apids[is_playback], minlength=apid_mask + 1)
+    for apid in np.flatnonzero(counts):
+        name = packet_types.get(int(apid), int(apid))
+        stats.type_counts[name] = int(counts[apid])
+        stats.playback_type_counts[name] = int(playback_counts[apid])
+    return stats
+
+
+# returns PacketStats for a tlm file, reading it through a memory map
+def scan_tlm_file(tlm_filepath):
+    start_time = time.perf_counter()
+    if os.path.getsize(tlm_filepath) == 0:
+        stats = PacketStats()
+    else:
+        data = np.memmap(tlm_filepath, dtype=np.uint8, mode='r')
+        stats = scan_packets(data)
+        del data
+    stats.scan_seconds = time.perf_counter() - start_time
+    return stats
+
+
+def main(script, *tlm_filepaths):
+    for tlm_filepath in tlm_filepaths:
+        stats = scan_tlm_file(tlm_filepath)
+        print("{0}: {1} packets ({2} realtime, {3} playback) in {4:.1f} ms".format(
+            tlm_filepath, stats.num_packets, stats.num_realtime, stats.num_playback, stats.scan_seconds * 1000))
+        print("    " + stats.summary_text())
+
+
+if __name__ == '__main__':
+    main(*sys.argv)
@@ -1,21 +1,129 @@
 import netCDF4 as nc
 import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 
+# Largest block of a variable held in memory at once while copying, in MB
+default_max_chunk_mb = 256
 
-def process_netcdf_file(src_file, instrument_name):
-    # Normalize instrument names
+# How the output variables are stored, to match how the products get read
+#   chunk_kb           - target size of one (uncompressed) chunk; the TIME length of a chunk is set to fit it
+#   channels_per_chunk - how many energy channels (or other non-TIME values) go in a chunk; None for all of them
+#   complevel          - zlib level (with the shuffle filter)
+output_profiles = {
+    # what this script always made: no compression and netCDF's default chunking
+    'default': None,
+    # for reading one spectrum (or one time of everything) at a time: a chunk holds whole spectra
+    'time-slice': {'chunk_kb': 64, 'channels_per_chunk': None, 'complevel': 4},
+    # for reading one channel (or one housekeeping value) over the whole mission: long, narrow chunks
+    'spectrum-series': {'chunk_kb': 1024, 'channels_per_chunk': 16, 'complevel': 4},
+}
+default_profile = 'default'
+
+
+class CopyStats:
+    def __init__(self):
+        self.num_bytes = 0
+        self.seconds = 0.0
+
+    def report(self):
+        mb = self.num_bytes / 1e6
+        rate = mb / self.seconds if self.seconds > 0 else float('inf')
+        return f"{mb:.1f} MB in {self.seconds:.1f} s ({rate:.1f} MB/s)"
+
+
+# Copy the data of src_var into dst_var a block of records (along the first dimension, i.e. TIME) at a time,
+# so that no more than about max_chunk_mb is read into memory at once. Records before first_record aren't copied.
+def copy_variable_data(src_var, dst_var, max_chunk_mb=default_max_chunk_mb, stats=None, first_record=0):
+    start_time = time.perf_counter()
+    shape = src_var.shape
+    if len(shape) == 0 or (shape[0] == 0 and first_record == 0):
+        data = src_var[:]
+        dst_var[:] = data
+        num_bytes = getattr(data, 'nbytes', 0)
+    else:
+        # strings (vlen) don't have a fixed size; count them as pointers
+        item_size = src_var.dtype.itemsize if hasattr(src_var.dtype, 'itemsize') else 8
+        record_bytes = item_size
+        for size in shape[1:]:
+            record_bytes *= size
+        records_per_chunk = max(1, int(max_chunk_mb * 1e6) // max(record_bytes, 1))
+        # line the blocks up with the output's chunks, so each (compressed) chunk is written once, whole
+        chunking = dst_var.chunking()
+        if chunking != 'contiguous' and records_per_chunk > chunking[0]:
+            records_per_chunk -= records_per_chunk % chunking[0]
+        num_bytes = 0
+        for block_start in range(first_record - first_record % records_per_chunk, shape[0], records_per_chunk):
+            start = max(block_start, first_record)
+            stop = min(block_start + records_per_chunk, shape[0])
+            data = src_var[start:stop]
+            dst_var[start:stop] = data
+            num_bytes += getattr(data, 'nbytes', 0)
+    if stats is not None:
+        stats.num_bytes += num_bytes
+        stats.seconds += time.perf_counter() - start_time
+
+
+# Keyword arguments for createVariable for the given output profile
+def variable_options(profile, dst_dataset, datatype, dimensions):
+    options = output_profiles[profile]
+    # strings can't be compressed or chunked to a size
+    if options is None or len(dimensions) == 0 or np.dtype(datatype).kind in 'OSU':
+        return {}
+    chunk_shape = []
+    for dim in dimensions[1:]:
+        size = dst_dataset.dimensions[dim].size
+        if options['channels_per_chunk'] is not None:
+            size = min(size, options['channels_per_chunk'])
+        chunk_shape.append(max(size, 1))
+    record_bytes = np.dtype(datatype).itemsize * int(np.prod(chunk_shape))
+    records_per_chunk = max(1, options['chunk_kb'] * 1024 // record_bytes)
+    first_dim = dst_dataset.dimensions[dimensions[0]]
+    if not first_dim.isunlimited():
+        records_per_chunk = max(1, min(records_per_chunk, first_dim.size))
+    return {'zlib': True, 'shuffle': True, 'complevel': options['complevel'],
+            'chunksizes': [records_per_chunk] + chunk_shape}
+
+
+# Times reading the biggest 2D variable in filename one time step at a time and one channel at a time.
+# Returns {'variable': name, 'time_slice_ms': ..., 'channel_series_ms': ...} (mean time per read)
+def benchmark_reads(filename, num_reads=20):
+    with nc.Dataset(filename, 'r') as dataset:
+        variables = [v for v in dataset.variables.values() if len(v.shape) == 2 and v.shape[0] > 0 and v.shape[1] > 0]
+        if len(variables) == 0:
+            return None
+        variable = max(variables, key=lambda v: v.size)
+        rng = np.random.default_rng(0)
+        start_time = time.perf_counter()
+        for i in rng.integers(0, variable.shape[0], num_reads):
+            variable[i, :]
+        time_slice_seconds = (time.perf_counter() - start_time) / num_reads
+        start_time = time.perf_counter()
+        for j in rng.integers(0, variable.shape[1], num_reads):
+            variable[:, j]
+        channel_series_seconds = (time.perf_counter() - start_time) / num_reads
+        return {'variable': variable.name, 'time_slice_ms': time_slice_seconds * 1000,
+                'channel_series_ms': channel_series_seconds * 1000}
+
+
+def normalize_instrument_name(instrument_name):
     original_instrument_name = instrument_name.lower()
     if original_instrument_name in ['xp_dark', 'xp']:
-        instrument_name = 'xp'
+        return 'xp'
     elif original_instrument_name in ['x123_dark', 'x123']:
-        instrument_name = 'x123'
+        return 'x123'
     else:
         raise ValueError(f"Unknown instrument name: {original_instrument_name}")
 
-    # Open the original NetCDF file in read mode
-    src_dataset = nc.Dataset(src_file, 'r')
 
-    # Create a new NetCDF file in the same directory
+# Name of the fixed file for src_file, in the same directory
+def get_dst_file(src_file, instrument_name):
+    instrument_name = normalize_instrument_name(instrument_name)
     src_dir = os.path.dirname(src_file)
     src_filename = os.path.basename(src_file)
     
@@ -31,8 +139,25 @@ def process_netcdf_file(src_file, instrument_name):
         dst_file = os.path.join(src_dir, dst_filename)
     else:
         dst_file = os.path.join(src_dir, src_filename)
-    
-    dst_dataset = nc.Dataset(dst_file, 'w', format='NETCDF4')
+    return dst_file
+
+
+def process_netcdf_file(src_file, instrument_name, max_chunk_mb=default_max_chunk_mb, profile=default_profile):
+    if profile not in output_profiles:
+        raise ValueError(f"Unknown output profile: {profile} (choose from {', '.join(output_profiles)})")
+
+    # Normalize instrument names
+    instrument_name = normalize_instrument_name(instrument_name)
+
+    # Open the original NetCDF file in read mode
+    src_dataset = nc.Dataset(src_file, 'r')
+
+    # Create a new NetCDF file in the same directory. It's written under a temporary name and renamed when done,
+    # so readers never see a half-written file (and MinXSS files, which are fixed in place, aren't clobbered while
+    # they're still being read)
+    dst_file = get_dst_file(src_file, instrument_name)
+    tmp_file = dst_file + '.tmp'
+    dst_dataset = nc.Dataset(tmp_file, 'w', format='NETCDF4')
 
     # Define the new dimensions
     time_dim = 'TIME'
@@ -52,10 +177,13 @@ def process_netcdf_file(src_file, instrument_name):
     for attr in src_dataset.ncattrs():
         dst_dataset.setncattr(attr, src_dataset.getncattr(attr))
 
+    stats = CopyStats()
+
     # Create and populate the 'time' variable
-    time_data = src_dataset.variables['TIME_TAI'][:]
-    time_var = dst_dataset.createVariable(time_dim, time_data.dtype, (time_dim,))
-    time_var[:] = time_data
+    time_tai = src_dataset.variables['TIME_TAI']
+    time_var = dst_dataset.createVariable(time_dim, time_tai.dtype, (time_dim,),
+                                          **variable_options(profile, dst_dataset, time_tai.dtype, (time_dim,)))
+    copy_variable_data(time_tai, time_var, max_chunk_mb, stats)
 
     # Copy other variables, reassigning dimensions as needed
     for name, variable in src_dataset.variables.items():
@@ -73,13 +201,14 @@ def process_netcdf_file(src_file, instrument_name):
             new_dimensions = variable.dimensions
 
         # Create the variable in the new dataset
-        dst_var = dst_dataset.createVariable(name, variable.datatype, new_dimensions)
+        dst_var = dst_dataset.createVariable(name, variable.datatype, new_dimensions,
+                                             **variable_options(profile, dst_dataset, variable.dtype, new_dimensions))
         
         # Copy variable attributes
         dst_var.setncatts({k: variable.getncattr(k) for k in variable.ncattrs()})
         
         # Copy data
-        dst_var[:] = variable[:]
+        copy_variable_data(variable, dst_var, max_chunk_mb, stats)
 
     # Convert former dimensions (except 'energy') to variables with 'time' dimension
     for dim_name in src_dataset.dimensions:
@@ -89,9 +218,10 @@ def process_netcdf_file(src_file, instrument_name):
             # Check if the dimension has a corresponding variable
             if dim_name in src_dataset.variables:
                 # Create a new variable with the 'time' dimension
-                data = src_dataset.variables[dim_name][:]
-                dst_var = dst_dataset.createVariable(dim_name, data.dtype, (time_dim,))
-                dst_var[:] = data
+                dim_var = src_dataset.variables[dim_name]
+                dst_var = dst_dataset.createVariable(dim_name, dim_var.dtype, (time_dim,),
+                                                     **variable_options(profile, dst_dataset, dim_var.dtype, (time_dim,)))
+                copy_variable_data(dim_var, dst_var, max_chunk_mb, stats)
             else:
                 print(f"Skipping dimension '{dim_name}' as it does not have a corresponding variable.")
 
@@ -107,64 +237,268 @@ def process_netcdf_file(src_file, instrument_name):
     # Close both datasets
     src_dataset.close()
     dst_dataset.close()
+    os.replace(tmp_file, dst_file)
 
     print(f"Fixed NetCDF file saved as {dst_file}")
+    print(f"Copied {stats.report()}, at most {max_chunk_mb} MB at a time")
+    src_size = os.path.getsize(src_file)
+    dst_size = os.path.getsize(dst_file)
+    print(f"Output ({profile} profile) is {dst_size / 1e6:.1f} MB, {100 * dst_size / max(src_size, 1):.0f}% of the source")
+    return dst_file
 
-def main():
-    fm = '3'  # can be '1', '2', or '3'
-    version = '3.0.0'
-    
-    # Get user's home directory
-    home_dir = os.path.expanduser('~')
-    base_path = os.path.join(home_dir, 'Dropbox/minxss_dropbox/data')
-
-    if fm == '3':
-        instruments = ['x123', 'x123_dark']
-        mission_name = 'daxss'
-        start_date = '2022-02-14'
-    else:
-        instruments = ['x123', 'x123_dark', 'xp', 'xp_dark']
-        
-        if fm == '1': 
-            mission_name = 'minxss'
-            start_date = '2016-05-16'
-        elif fm == '2': 
-            mission_name = 'minxss'
-            start_date = '2018-12-03'
-
-    levels = ['1', '2', '3']
-    for level in levels:
-        print(f"\nProcessing level {level} data...")
-        for instrument in instruments:
-            print(f"Processing instrument: {instrument}")
-            
-            if mission_name == 'minxss':
-                if level == '1':
-                    src_file = os.path.join(base_path, f'fm{fm}/level1/{mission_name}{fm}_solarSXR_{instrument}_level1_{start_date}-mission_v{version}.nc')
-                elif level == '2':
-                    src_file_minute = os.path.join(base_path, f'fm{fm}/level2/{mission_name}{fm}_solarSXR_level2_1minute_average_{start_date}-mission_v{version}.nc')
-                    src_file_hour = os.path.join(base_path, f'fm{fm}/level2/{mission_name}{fm}_solarSXR_level2_1hour_average_{start_date}-mission_v{version}.nc')
-                elif level == '3': 
-                    src_file = os.path.join(base_path, f'fm{fm}/level3/{mission_name}{fm}_solarSXR_level3_1day_average_{start_date}-mission_v{version}.nc')
-            else: 
+# Returns the number of records already in dst_dataset if it can be brought up to date with src_dataset just by
+# appending the records after them, or None if it can't (the TIME axes differ, or variables were added or reshaped)
+def find_first_new_record(src_dataset, dst_dataset):
+    time_dim = 'TIME'
+    src_time = src_dataset.variables['TIME_TAI']
+    dst_time = dst_dataset.variables[time_dim]
+    num_src = src_time.shape[0]
+    num_dst = dst_time.shape[0]
+    if num_src < num_dst:
+        return None
+    if not np.array_equal(np.ma.filled(src_time[:num_dst], np.nan), np.ma.filled(dst_time[:], np.nan), equal_nan=True):
+        return None
+
+    for name in src_dataset.variables:
+        if name != 'TIME_TAI' and name not in dst_dataset.variables:
+            return None
+    for [name, dst_var] in dst_dataset.variables.items():
+        if name == time_dim:
+            continue
+        if name not in src_dataset.variables:
+            return None
+        src_var = src_dataset.variables[name]
+        if len(dst_var.dimensions) > 0 and dst_var.dimensions[0] == time_dim:
+            if len(src_var.shape) == 0 or src_var.shape[0] != num_src or src_var.shape[1:] != dst_var.shape[1:]:
+                return None
+        elif src_var.shape != dst_var.shape:
+            return None
+    return num_dst
+
+
+# Adds the records of src_file that aren't in its fixed file yet to the end of the fixed file's TIME dimension,
+# instead of making the whole file again. Returns the fixed file's name, or None if it has to be made from scratch
+# with process_netcdf_file (there isn't one yet, it's fixed in place, or the earlier records don't match).
+# The file is changed in place, so if this is interrupted the batch mode sees that the file doesn't match its
+# state and makes it again.
+def append_netcdf_file(src_file, instrument_name, max_chunk_mb=default_max_chunk_mb):
+    dst_file = get_dst_file(src_file, instrument_name)
+    if dst_file == src_file or not os.path.exists(dst_file):
+        return None
+    time_dim = 'TIME'
+
+    with nc.Dataset(src_file, 'r') as src_dataset:
+        with nc.Dataset(dst_file, 'r') as dst_dataset:
+            first_new_record = find_first_new_record(src_dataset, dst_dataset)
+        if first_new_record is None:
+            print(f"Can't append to {dst_file}, its records don't match {src_file}")
+            return None
+
+        stats = CopyStats()
+        with nc.Dataset(dst_file, 'a') as dst_dataset:
+            # Copy global attributes
+            for attr in src_dataset.ncattrs():
+                dst_dataset.setncattr(attr, src_dataset.getncattr(attr))
+            for [name, dst_var] in dst_dataset.variables.items():
+                src_var = src_dataset.variables['TIME_TAI' if name == time_dim else name]
+                if len(dst_var.dimensions) > 0 and dst_var.dimensions[0] == time_dim:
+                    copy_variable_data(src_var, dst_var, max_chunk_mb, stats, first_new_record)
+                else:
+                    # not on the TIME axis, so it's small; just copy it again in case it changed
+                    copy_variable_data(src_var, dst_var, max_chunk_mb, stats)
+            num_records = dst_dataset.dimensions[time_dim].size
+
+    print(f"Appended {num_records - first_new_record} new records to {dst_file} ({num_records} records now)")
+    print(f"Copied {stats.report()}, at most {max_chunk_mb} MB at a time")
+    return dst_file
+
+
+# Mission start dates, which are part of the file names
+mission_start_dates = {'1': '2016-05-16', '2': '2018-12-03', '3': '2022-02-14'}
+# Where the batch mode remembers what it has already fixed (in the data folder)
+state_filename = 'fix_netcdf_format_state.json'
+
+
+# Returns [(src_file, instrument), ...] for every product of the flight models in fms that exists under base_path.
+# version can be a glob pattern; '*' finds every version.
+def find_products(base_path, fms=('1', '2', '3'), version='*'):
+    products = []
+    for fm in fms:
+        start_date = mission_start_dates[fm]
+        if fm == '3':
+            mission_name = 'daxss'
+            instruments = ['x123', 'x123_dark']
+        else:
+            mission_name = f'minxss{fm}'
+            instruments = ['x123', 'x123_dark', 'xp', 'xp_dark']
+
+        for level in ['1', '2', '3']:
+            for instrument in instruments:
+                # Skip processing x123_dark for level 2 and 3 data for MinXSS-1 and MinXSS-2
+                if fm in ['1', '2'] and level in ['2', '3'] and instrument != 'x123':
+                    continue
                 if level == '1':
-                    src_file = os.path.join(base_path, f'fm{fm}/level1/{mission_name}_solarSXR_level1_{start_date}-mission_v{version}.nc')
+                    instrument_part = f'{instrument}_' if mission_name != 'daxss' else ''
+                    names = [f'{mission_name}_solarSXR_{instrument_part}level1_{start_date}-mission_v{version}.nc']
                 elif level == '2':
-                    src_file_minute = os.path.join(base_path, f'fm{fm}/level2/{mission_name}_solarSXR_level2_1minute_average_{start_date}-mission_v{version}.nc')
-                    src_file_hour = os.path.join(base_path, f'fm{fm}/level2/{mission_name}_solarSXR_level2_1hour_average_{start_date}-mission_v{version}.nc')
-                elif level == '3': 
-                    src_file = os.path.join(base_path, f'fm{fm}/level3/{mission_name}_solarSXR_level3_1day_average_{start_date}-mission_v{version}.nc')
-
-            # Skip processing x123_dark for level 2 and 3 data for MinXSS-1 and MinXSS-2
-            if fm in ['1', '2'] and level in ['2', '3'] and instrument != 'x123':
-                print(f"Skipping {instrument} for level {level} data (not applicable for MinXSS-{fm})")
+                    names = [f'{mission_name}_solarSXR_level2_1minute_average_{start_date}-mission_v{version}.nc',
+                             f'{mission_name}_solarSXR_level2_1hour_average_{start_date}-mission_v{version}.nc']
+                else:
+                    names = [f'{mission_name}_solarSXR_level3_1day_average_{start_date}-mission_v{version}.nc']
+                for name in names:
+                    for src_file in sorted(glob.glob(os.path.join(base_path, f'fm{fm}', f'level{level}', name))):
+                        products.append((src_file, instrument))
+    return products
+
+
+def hash_file(filename):
+    file_hash = hashlib.blake2b()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+# (mtime, size, hash) of a file. The hash is only worked out again if the mtime or size has changed since old_signature.
+# Without use_hash the hash is left as None, so only the mtime and size are compared.
+def file_signature(filename, old_signature=None, use_hash=True):
+    st = os.stat(filename)
+    if old_signature is not None and old_signature[0] == st.st_mtime_ns and old_signature[1] == st.st_size:
+        return old_signature
+    return [st.st_mtime_ns, st.st_size, hash_file(filename) if use_hash else None]
+
+
+# Compares contents (by the hash), not just mtimes, since Dropbox can touch a file without changing it.
+# If either signature has no hash, the mtime and size have to match.
+def is_same_file(signature, old_signature):
+    if signature[2] is None or old_signature[2] is None:
+        return signature[:2] == old_signature[:2]
+    return signature[2] == old_signature[2]
+
+
+def read_state(state_file):
+    try:
+        with open(state_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_state(state_file, state):
+    with open(state_file + '.tmp', 'w') as f:
+        json.dump(state, f, indent=1)
+    os.replace(state_file + '.tmp', state_file)
+
+
+# True if dst_file was made from the current contents of src_file and hasn't been changed since
+def is_up_to_date(src_file, dst_file, state, profile=default_profile, use_hash=True):
+    if dst_file not in state or not os.path.exists(dst_file):
+        return False
+    recorded = state[dst_file]
+    if recorded['src_file'] != src_file or recorded.get('profile', default_profile) != profile:
+        return False
+    if not is_same_file(file_signature(src_file, recorded['src'], use_hash), recorded['src']):
+        return False
+    return is_same_file(file_signature(dst_file, recorded['dst'], use_hash), recorded['dst'])
+
+
+# True if dst_file is still exactly as it was when it was last fixed (by the mtime and size), so new records can be
+# appended to it
+def can_append(src_file, dst_file, state, profile=default_profile):
+    if dst_file == src_file or dst_file not in state or not os.path.exists(dst_file):
+        return False
+    recorded = state[dst_file]
+    if recorded['src_file'] != src_file or recorded.get('profile', default_profile) != profile:
+        return False
+    st = os.stat(dst_file)
+    return recorded['dst'][0] == st.st_mtime_ns and recorded['dst'][1] == st.st_size
+
+
+# Fixes one file (runs in a worker process). Returns the state entry for the fixed file.
+# With benchmark, reads of the fixed file are timed too (see benchmark_reads), which reads the biggest variable 40 times.
+def fix_product(task):
+    [src_file, instrument, max_chunk_mb, profile, append, benchmark] = task
+    dst_file = None
+    if append:
+        dst_file = append_netcdf_file(src_file, instrument, max_chunk_mb)
+    if dst_file is None:
+        dst_file = process_netcdf_file(src_file, instrument, max_chunk_mb, profile)
+    reads = None
+    if benchmark:
+        reads = benchmark_reads(dst_file)
+    if reads is not None:
+        print(f"Reading {reads['variable']} from {os.path.basename(dst_file)}: {reads['time_slice_ms']:.2f} ms per time step, "
+              f"{reads['channel_series_ms']:.2f} ms per channel")
+    # MinXSS files are fixed in place, so the "source" to compare against next time is the fixed file
+    # (in append mode files aren't hashed, since that would mean reading all of them every time)
+    return {'src_file': src_file, 'src': file_signature(src_file, use_hash=not append),
+            'dst': file_signature(dst_file, use_hash=not append),
+            'profile': profile, 'size': os.path.getsize(dst_file), 'reads': reads}
+
+
+# Fixes every product under base_path that isn't up to date, num_workers files at a time. With append, fixed files
+# that are still as they were left get just the new records added to them (see append_netcdf_file).
+def fix_all(base_path, fms=('1', '2', '3'), version='*', num_workers=None, max_chunk_mb=default_max_chunk_mb,
+            profile=default_profile, append=False, benchmark=False):
+    if profile not in output_profiles:
+        print(f"Unknown output profile: {profile} (choose from {', '.join(output_profiles)})")
+        return
+    state_file = os.path.join(base_path, state_filename)
+    state = read_state(state_file)
+
+    tasks = {}
+    dst_files_seen = set()
+    num_up_to_date = 0
+    for [src_file, instrument] in find_products(base_path, fms, version):
+        dst_file = get_dst_file(src_file, instrument)
+        # x123 and x123_dark make the same file from a DAXSS source, so only do it once
+        if dst_file in dst_files_seen:
+            continue
+        dst_files_seen.add(dst_file)
+        if is_up_to_date(src_file, dst_file, state, profile, use_hash=not append):
+            num_up_to_date += 1
+            continue
+        tasks[dst_file] = (src_file, instrument, max_chunk_mb, profile,
+                           append and can_append(src_file, dst_file, state, profile), benchmark)
+    print(f"{len(tasks)} files to fix, {num_up_to_date} already up to date")
+    if len(tasks) == 0:
+        return
+
+    start_time = time.perf_counter()
+    dst_files = list(tasks)
+    num_failed = 0
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = [executor.submit(fix_product, tasks[dst_file]) for dst_file in dst_files]
+        for [dst_file, future] in zip(dst_files, futures):
+            try:
+                state[dst_file] = future.result()
+            except Exception as e:
+                print(f"Failed to fix {tasks[dst_file][0]}: {e}")
+                num_failed += 1
                 continue
+            write_state(state_file, state)
+    print(f"Fixed {len(tasks) - num_failed} files ({num_failed} failed) in {time.perf_counter() - start_time:.1f} s")
+
+
+# Usage: python minxss_fix_netcdf_format.py [fms] [version] [base_path] [num_workers] [max_chunk_mb] [profile] [append] [benchmark]
+# e.g.   python minxss_fix_netcdf_format.py 123 '*'        fixes every version of every FM1, FM2 and FM3 product
+#        python minxss_fix_netcdf_format.py 3 3.0.0        just DAXSS version 3.0.0
+#        python minxss_fix_netcdf_format.py 3 3.0.0 ~/Dropbox/minxss_dropbox/data 4 256 default 1
+#                                                          daily update: only add the new records to DAXSS files
+#        python minxss_fix_netcdf_format.py 3 3.0.0 ~/Dropbox/minxss_dropbox/data 4 256 time-slice 0 1
+#                                                          compare profiles: time the reads of each fixed file
+# profile is one of output_profiles (default, time-slice, spectrum-series); append and benchmark are 0 or 1
+def main(script='', fms='3', version='3.0.0', base_path=None, num_workers=None, max_chunk_mb=default_max_chunk_mb,
+         profile=default_profile, append='0', benchmark='0'):
+    if base_path is None:
+        # Get user's home directory
+        home_dir = os.path.expanduser('~')
+        base_path = os.path.join(home_dir, 'Dropbox/minxss_dropbox/data')
+    if num_workers is not None:
+        num_workers = int(num_workers)
+
+    fix_all(base_path, list(fms), version, num_workers, float(max_chunk_mb), profile, int(append) == 1, int(benchmark) == 1)
 
-            if level != '2': 
-                process_netcdf_file(src_file, instrument)
-            else: 
-                process_netcdf_file(src_file_minute, instrument)
-                process_netcdf_file(src_file_hour, instrument)
 
 if __name__ == "__main__":
-    main()
+    main(*sys.argv)
@@ -0,0 +1,5 @@
+# minxss_fix_netcdf_format.py is a script in the folder above, so the tests import it by name
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
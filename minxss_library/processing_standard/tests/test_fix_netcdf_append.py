@@ -0,0 +1,147 @@
+# Append mode of minxss_fix_netcdf_format: adding new records to a fixed file gives the same file as fixing the
+# whole source again, and files that can't just be appended to are made from scratch
+import os
+import shutil
+
+import netCDF4 as nc
+import numpy as np
+import pytest
+
+import minxss_fix_netcdf_format as fix_netcdf
+
+num_channels = 40
+max_records = 3000
+src_name = 'daxss_solarSXR_level1_2022-02-14-mission_v2.0.0.nc'
+dst_name = 'daxss_solarSXR_x123_level1_2022-02-14-mission_v2.0.0.nc'
+
+
+# a DAXSS level 1 source with the first num_records records of the same made-up mission
+def make_source(filename, num_records, time_offset=0.0):
+    rng = np.random.default_rng(0)
+    with nc.Dataset(filename, 'w', format='NETCDF4') as dataset:
+        dataset.createDimension('structure_elements', num_records)
+        dataset.createDimension('dim1_ENERGY', num_channels)
+        dataset.title = 'DAXSS level 1 with {0} records'.format(num_records)
+        time_var = dataset.createVariable('TIME_TAI', 'f8', ('structure_elements',))
+        time_var[:] = np.arange(num_records) * 9.0 + 2.0e9 + time_offset
+        for name in ['IRRADIANCE', 'SPECTRUM', 'ENERGY']:
+            var = dataset.createVariable(name, 'f4', ('structure_elements', 'dim1_ENERGY'))
+            var[:] = rng.random((max_records, num_channels))[:num_records]
+            var.UNITS = 'counts'
+        var = dataset.createVariable('VALID_FLAG', 'i2', ('structure_elements', 'dim1_ENERGY'))
+        var[:] = rng.integers(0, 2, (max_records, num_channels))[:num_records]
+        var = dataset.createVariable('X123_DETECTOR_TEMPERATURE', 'f4', ('structure_elements',))
+        var[:] = rng.random(max_records)[:num_records]
+        var = dataset.createVariable('X123_APERTURE_AREA', 'f8', ())
+        var[:] = 0.002
+
+
+# netCDF's default chunking depends on how many records there were when a variable was made, so the chunking is
+# only compared for the profiles that set it
+def assert_same_dataset(filename, expected_filename, profile='default'):
+    with nc.Dataset(filename) as dataset, nc.Dataset(expected_filename) as expected:
+        assert {k: dataset.getncattr(k) for k in dataset.ncattrs()} == {k: expected.getncattr(k) for k in expected.ncattrs()}
+        assert list(dataset.variables) == list(expected.variables)
+        for name in expected.variables:
+            var = dataset.variables[name]
+            expected_var = expected.variables[name]
+            assert var.dimensions == expected_var.dimensions and var.dtype == expected_var.dtype, name
+            if profile != 'default':
+                assert var.chunking() == expected_var.chunking(), name
+            assert {k: var.getncattr(k) for k in var.ncattrs()} == {k: expected_var.getncattr(k) for k in expected_var.ncattrs()}, name
+            assert np.array_equal(np.ma.filled(var[:], 0), np.ma.filled(expected_var[:], 0)), name
+
+
+# the fixed file made from scratch from a source with num_records records
+def fixed_from_scratch(tmp_path, num_records, profile):
+    scratch_dir = tmp_path / 'scratch_{0}'.format(num_records)
+    scratch_dir.mkdir()
+    make_source(str(scratch_dir / src_name), num_records)
+    return fix_netcdf.process_netcdf_file(str(scratch_dir / src_name), 'x123', profile=profile)
+
+
+@pytest.mark.parametrize('profile', ['default', 'time-slice'])
+@pytest.mark.parametrize('max_chunk_mb', [fix_netcdf.default_max_chunk_mb, 0.1])
+def test_append_matches_full_fix(tmp_path, profile, max_chunk_mb):
+    src_file = str(tmp_path / src_name)
+    make_source(src_file, 1500)
+    dst_file = fix_netcdf.process_netcdf_file(src_file, 'x123', max_chunk_mb, profile)
+    make_source(src_file, 2000)
+    assert fix_netcdf.append_netcdf_file(src_file, 'x123', max_chunk_mb) == dst_file
+    assert_same_dataset(dst_file, fixed_from_scratch(tmp_path, 2000, profile), profile)
+
+
+def test_append_nothing_new(tmp_path):
+    src_file = str(tmp_path / src_name)
+    make_source(src_file, 700)
+    dst_file = fix_netcdf.process_netcdf_file(src_file, 'x123')
+    assert fix_netcdf.append_netcdf_file(src_file, 'x123') == dst_file
+    assert_same_dataset(dst_file, fixed_from_scratch(tmp_path, 700, 'default'))
+
+
+@pytest.mark.parametrize('change', ['times', 'fewer_records', 'new_variable', 'channels'])
+def test_cant_append(tmp_path, change):
+    src_file = str(tmp_path / src_name)
+    make_source(src_file, 1500)
+    dst_file = fix_netcdf.process_netcdf_file(src_file, 'x123')
+    dst_stat = os.stat(dst_file)
+    if change == 'times':
+        make_source(src_file, 2000, time_offset=1.0)
+    elif change == 'fewer_records':
+        make_source(src_file, 1000)
+    elif change == 'new_variable':
+        make_source(src_file, 2000)
+        with nc.Dataset(src_file, 'a') as dataset:
+            dataset.createVariable('X123_FAST_COUNT', 'f4', ('structure_elements',))[:] = 1.0
+    else:
+        global num_channels
+        num_channels += 1
+        try:
+            make_source(src_file, 2000)
+        finally:
+            num_channels -= 1
+    assert fix_netcdf.append_netcdf_file(src_file, 'x123') is None
+    # the fixed file is left alone, to be made again from scratch
+    assert os.stat(dst_file).st_mtime_ns == dst_stat.st_mtime_ns and os.stat(dst_file).st_size == dst_stat.st_size
+
+
+def test_no_fixed_file_yet(tmp_path):
+    make_source(str(tmp_path / src_name), 100)
+    assert fix_netcdf.append_netcdf_file(str(tmp_path / src_name), 'x123') is None
+
+
+def test_batch_append(tmp_path, capfd):
+    base_path = tmp_path / 'data'
+    (base_path / 'fm3' / 'level1').mkdir(parents=True)
+    src_file = str(base_path / 'fm3' / 'level1' / src_name)
+    dst_file = str(base_path / 'fm3' / 'level1' / dst_name)
+
+    make_source(src_file, 1500)
+    fix_netcdf.fix_all(str(base_path), ['3'], num_workers=1, append=True)
+    assert 'Fixed NetCDF file saved' in capfd.readouterr().out
+
+    # new records are appended
+    make_source(src_file, 2000)
+    fix_netcdf.fix_all(str(base_path), ['3'], num_workers=1, append=True)
+    out = capfd.readouterr().out
+    assert 'Appended 500 new records' in out and 'Fixed NetCDF file saved' not in out
+    assert_same_dataset(dst_file, fixed_from_scratch(tmp_path, 2000, 'default'))
+
+    fix_netcdf.fix_all(str(base_path), ['3'], num_workers=1, append=True)
+    assert '0 files to fix, 1 already up to date' in capfd.readouterr().out
+
+    # a fixed file that was changed since (e.g. an interrupted append) is made again from scratch
+    make_source(src_file, 2500)
+    with nc.Dataset(dst_file, 'a') as dataset:
+        dataset.title = 'edited'
+    fix_netcdf.fix_all(str(base_path), ['3'], num_workers=1, append=True)
+    out = capfd.readouterr().out
+    assert 'Fixed NetCDF file saved' in out and 'Appended' not in out
+    assert_same_dataset(dst_file, fixed_from_scratch(tmp_path, 2500, 'default'))
+
+    # and so is one made with another profile
+    make_source(src_file, 2600)
+    fix_netcdf.fix_all(str(base_path), ['3'], num_workers=1, profile='time-slice', append=True)
+    out = capfd.readouterr().out
+    assert 'Fixed NetCDF file saved' in out and 'Appended' not in out
+    assert_same_dataset(dst_file, fixed_from_scratch(tmp_path, 2600, 'time-slice'), 'time-slice')
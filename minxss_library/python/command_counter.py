@@ -0,0 +1,259 @@
+#This script is to be run after starting HYDRA!!!
+#
+#The purpose of this script is to real-time tracks how many commands have been sent from HYDRA
+# and which scripts have been run in the current HYDRA session on a graphic interface.
+#
+#Each ground station has its own ini file (Rundirs folder, label, window placement, scripts to leave out),
+# e.g. command_counter_lasp.ini and command_counter_fb.ini
+#
+#How to run:
+#  1. open a command prompt (Windows)
+#  2. copy and paste this line: python C:/Users/OPS/Dropbox/minxss_dropbox/code/Python/command_counter.py command_counter_lasp.ini
+#  3. press enter
+#The ini file is looked for in the same folder as this script, unless a full path is given.
+#The counter follows the newest rundir, so when HYDRA is restarted it switches to the new session by itself.
+#Tests: from this folder, run python -m pytest tests (needs pytest, but not HYDRA or a Rundirs folder)
+#
+#Version Control:
+#11/20/18 - Bennet Schwab - Initial Release of command_counter.py for MinXSS-2 commissioning from Fairbanks
+#
+
+import os
+import re
+import sys
+import glob
+import json
+import configparser
+from collections import deque
+
+#What we look for in each EventLog line. The first rule (in this order) that matches a line decides what is done
+# with it, the same as the if/elif chain this replaced. Named groups pick out the text to display.
+#  command        - a command was sent
+#  ignored_script - a script that always runs (the patterns come from [script_ignore] in the ini file)
+#  script         - any other script
+#  tlm_closed     - HYDRA closed a tlm file (not displayed)
+#  tlm_file       - HYDRA started a new tlm file
+#  cancel_deploy  - commissioning has no script for cancelling the deployment retry, it just happens in the wrapper
+rule_table = [('command', r'Sending command'),
+              ('ignored_script', r'(?=.*(?:{ignore})).*Starting script'),
+              ('script', r'Starting script\s*(?P<script_name>.*)'),
+              ('tlm_closed', r'(?i:(?=.*tlm_packets).*closing)'),
+              ('tlm_file', r'(?i:(?P<tlm_name>\S*tlm_packets\S*))'),
+              ('cancel_deploy', r'Canceling deployment retry')]
+
+
+#builds one regex that tries every rule at the start of the line, in order. Each rule is a lookahead, so
+# the first one that matches anywhere in the line wins, and the empty group named after it tells us which one it was.
+def compile_rules(ignore_patterns):
+	alternatives = []
+	for [name, pattern] in rule_table:
+		pattern = pattern.replace('{ignore}', '|'.join(ignore_patterns) if len(ignore_patterns) > 0 else '(?!)')
+		alternatives.append('(?=.*?{0})(?P<{1}>)'.format(pattern, name))
+	return re.compile('^(?:' + '|'.join(alternatives) + ')')
+
+
+class CommandCounterConfig:
+	def __init__(self, ini_filename):
+		if not os.path.exists(ini_filename):
+			print("ERROR: Couldn't find the command counter config file:", ini_filename)
+			sys.exit()
+		config = configparser.ConfigParser()
+		config.read(ini_filename)
+
+		try:
+			#[station]
+			self.station_label = config['station']['station_label']
+			self.rundirs_dir = config['station']['rundirs_dir']
+
+			#[display]
+			self.width = int(config['display']['width'])
+			self.height = int(config['display']['height'])
+			self.x = int(config['display']['x'])
+			self.y = int(config['display']['y'])
+			self.refresh_ms = int(config['display']['refresh_ms'])
+			self.max_scripts_shown = int(config['display']['max_scripts_shown'])
+		except KeyError as e:
+			print("ERROR:", ini_filename, "is missing", e)
+			sys.exit()
+
+		#[script_ignore]
+		self.ignore_patterns = []
+		if 'script_ignore' in config:
+			for key in config['script_ignore']:
+				self.ignore_patterns.append(config['script_ignore'][key])
+
+		if not os.path.exists(self.rundirs_dir):
+			print("ERROR: [station] rundirs_dir does not exist! Listed as:")
+			print(self.rundirs_dir)
+			sys.exit()
+
+
+#finds the most recent rundir. The pass manager keeps an index of the rundirs next to the Rundirs folder
+# (see pass_planning_tool/python/rundir_index.py); only list the whole folder if the index is missing or out of date
+def find_latest_rundir(rundirs_dir):
+	try:
+		with open(os.path.join(os.path.dirname(os.path.abspath(rundirs_dir)), 'rundir_index.json')) as f:
+			rundir_index = json.load(f)
+		if rundir_index['rundirs_dir_mtime_ns'] == os.stat(rundirs_dir).st_mtime_ns and rundir_index['latest'] != '':
+			return os.path.join(rundirs_dir, rundir_index['latest'])
+	except (OSError, ValueError, KeyError):
+		pass
+	rundirs = [entry.name for entry in os.scandir(rundirs_dir) if entry.is_dir()]
+	if len(rundirs) == 0:
+		return ''
+	return os.path.join(rundirs_dir, max(rundirs))
+
+
+#EventLog lines are bytes until they're complete
+def decode_line(line):
+	return line.decode('ascii', errors='replace').strip()
+
+
+#follows the EventLog of one rundir like "tail -f": each call only returns what HYDRA has added since the last one
+class EventLogTail:
+	def __init__(self, rundir):
+		self.rundir = rundir
+		self.filename = ''
+		self.offset = 0
+		self.partial_line = b''
+		self.rundir_mtime_ns = None
+
+	#HYDRA starts a new EventLog file if the current one gets too big; keep reading from the newest one.
+	#Returns the newest EventLog if it isn't the one we're reading, otherwise ''
+	def find_logfile(self):
+		rundir_mtime_ns = os.stat(self.rundir).st_mtime_ns
+		if rundir_mtime_ns == self.rundir_mtime_ns:
+			return ''
+		self.rundir_mtime_ns = rundir_mtime_ns
+		logfiles = sorted(glob.glob(os.path.join(self.rundir, "EventLog*")))
+		if len(logfiles) > 0 and logfiles[-1] != self.filename:
+			return logfiles[-1]
+		return ''
+
+	#returns the complete lines added to the log since the last call, and whether the log was rewritten
+	def read_new_lines(self):
+		lines = []
+		is_rewritten = 0
+		new_filename = self.find_logfile()
+		if new_filename != '':
+			#finish the old file first, so nothing HYDRA wrote to it since the last call is missed.
+			#It won't be written to again, so its last line is complete even without a newline.
+			if self.filename != '':
+				[lines, is_rewritten] = self.read_file()
+				if len(self.partial_line) > 0:
+					lines.append(decode_line(self.partial_line))
+			self.filename = new_filename
+			self.offset = 0
+			self.partial_line = b''
+		[new_lines, is_new_rewritten] = self.read_file()
+		return [lines + new_lines, max(is_rewritten, is_new_rewritten)]
+
+	#returns the complete lines added to the current file since the last read, and whether it was rewritten
+	def read_file(self):
+		try:
+			size = os.stat(self.filename).st_size
+		except OSError:
+			return [[], 0]
+		#if the file got smaller it was rewritten, so start over
+		is_rewritten = 0
+		if size < self.offset:
+			self.offset = 0
+			self.partial_line = b''
+			is_rewritten = 1
+		if size == self.offset:
+			return [[], is_rewritten]
+		with open(self.filename, 'rb') as f:
+			f.seek(self.offset)
+			data = f.read(size - self.offset)
+		self.offset += len(data)
+		lines = (self.partial_line + data).split(b'\n')
+		#the last piece doesn't end in a newline yet (HYDRA is still writing it), so save it for next time
+		self.partial_line = lines.pop()
+		return [[decode_line(line) for line in lines], is_rewritten]
+
+
+#keeps the running command count and script list for the newest rundir
+class CommandCounter:
+	def __init__(self, cfg):
+		self.cfg = cfg
+		self.rules = compile_rules(cfg.ignore_patterns)
+		self.rundir = ''
+		self.rundirs_dir_mtime_ns = None
+		self.tail = None
+		self.reset()
+
+	def reset(self):
+		self.cmdCount = 0
+		self.scripts = deque(maxlen=self.cfg.max_scripts_shown)
+
+	def parse_line(self, line):
+		m = self.rules.match(line)
+		if m is None:
+			return
+		rule = m.lastgroup
+		if rule == 'command':
+			self.cmdCount += 1
+		elif rule == 'script':
+			self.scripts.append(m.group('script_name'))
+		elif rule == 'tlm_file':
+			self.scripts.append('New ' + m.group('tlm_name'))
+		elif rule == 'cancel_deploy':
+			self.scripts.append('cancel_ant_deploy_retry')
+
+	#switches to a new rundir if HYDRA has made one, then parses whatever has been added to the EventLog
+	def update(self):
+		#a new rundir changes the Rundirs folder's mtime, so only look for one when that changes
+		rundirs_dir_mtime_ns = os.stat(self.cfg.rundirs_dir).st_mtime_ns
+		if rundirs_dir_mtime_ns != self.rundirs_dir_mtime_ns:
+			self.rundirs_dir_mtime_ns = rundirs_dir_mtime_ns
+			latest_rundir = find_latest_rundir(self.cfg.rundirs_dir)
+			if latest_rundir != self.rundir and latest_rundir != '':
+				self.rundir = latest_rundir
+				self.tail = EventLogTail(latest_rundir)
+				self.reset()
+		if self.tail is None:
+			return
+
+		[lines, is_rewritten] = self.tail.read_new_lines()
+		if is_rewritten == 1:
+			self.reset()
+		for line in lines:
+			self.parse_line(line)
+
+	def display_text(self):
+		scripts = ''.join('\n' + script for script in self.scripts)
+		return self.cfg.station_label + '\n\nCommand Counter: ' + str(self.cmdCount) + '\n\nScripts Ran:' + scripts
+
+
+def main(script, ini_filename='command_counter_lasp.ini'):
+	from tkinter import Tk, Label, W, LEFT
+
+	#a relative ini path is in this script's folder, wherever the prompt is
+	if not os.path.isabs(ini_filename):
+		ini_filename = os.path.join(os.path.dirname(os.path.abspath(__file__)), ini_filename)
+	cfg = CommandCounterConfig(ini_filename)
+	counter = CommandCounter(cfg)
+
+	#controls the GUI display
+	root = Tk()
+	# set the dimensions of the screen and where it is placed
+	root.geometry('%dx%d+%d+%d' % (cfg.width, cfg.height, cfg.x, cfg.y))
+	lab = Label(root)
+	lab.pack()
+
+	#function to run GUI and output the live command counter and scripts sent
+	def output():
+		counter.update()
+		#configure the text to be left justified
+		lab.config(text=counter.display_text(), anchor=W, justify=LEFT)
+		root.after(cfg.refresh_ms, output)
+
+	# run first time
+	output()
+
+	# rest of main loop
+	root.mainloop()
+
+
+if __name__ == '__main__':
+	main(*sys.argv)
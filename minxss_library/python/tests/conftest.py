@@ -0,0 +1,5 @@
+# command_counter.py is a script in the folder above, so the tests import it by name
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,187 @@
+# compile_rules / CommandCounter against the if/elif chain in the old command_counter_lasp.py, and EventLogTail
+# following an EventLog as HYDRA writes it
+import itertools
+import os
+import re
+import types
+
+import pytest
+
+from command_counter import CommandCounter, CommandCounterConfig, EventLogTail, compile_rules
+
+lasp_ignore_patterns = ['engine 0', 'Auto', '_bct', 'init.prc', 'bctReader']
+
+line_pieces = ['Sending command MINXSS_NOOP',
+               'Starting script Scripts\\sci_mode.prc',
+               'Starting script Scripts\\Auto\\pass.prc',
+               'Starting script engine 0',
+               'Starting script Scripts\\init_prc_check.prc',
+               'Opened file tlm_packets_2018_348_14_05_22.out',
+               'Closing file TLM_PACKETS_2018_348_14_05_22.out',
+               'Canceling deployment retry',
+               'cmdTry: 12']
+
+
+# which branch of the old chain a line took (the ignored scripts were listed in the code, not an ini file)
+def old_rule(line):
+    if re.search('Sending command', line):
+        return 'command'
+    elif re.search('Starting script', line):
+        for pattern in lasp_ignore_patterns:
+            if re.search(pattern, line):
+                return 'ignored_script'
+        return 'script'
+    elif re.search('tlm_packets', line, re.IGNORECASE):
+        if re.search('closing', line, re.IGNORECASE):
+            return 'tlm_closed'
+        return 'tlm_file'
+    elif re.search('Canceling deployment retry', line):
+        return 'cancel_deploy'
+    return None
+
+
+def make_cfg(rundirs_dir='', ignore_patterns=lasp_ignore_patterns, max_scripts_shown=30):
+    return types.SimpleNamespace(station_label='Test Station', rundirs_dir=rundirs_dir,
+                                 ignore_patterns=ignore_patterns, max_scripts_shown=max_scripts_shown)
+
+
+def test_rules_match_old_chain():
+    rules = compile_rules(lasp_ignore_patterns)
+    # every line with one or two of the pieces, in both orders, so lines that match several rules are covered
+    lines = ['', 'nothing to see here'] + line_pieces
+    lines += ['2018/12/14 14:05:22.123 ' + a + ' ' + b for (a, b) in itertools.permutations(line_pieces, 2)]
+    for line in lines:
+        m = rules.match(line)
+        assert (m.lastgroup if m is not None else None) == old_rule(line), line
+
+
+def test_no_ignore_patterns():
+    rules = compile_rules([])
+    assert rules.match('Starting script engine 0').lastgroup == 'script'
+    assert rules.match('Sending command from Starting script').lastgroup == 'command'
+
+
+def test_parse_line():
+    counter = CommandCounter(make_cfg(max_scripts_shown=3))
+    for line in ['2018/12/14 14:05:22.123 Sending command MINXSS_NOOP',
+                 '2018/12/14 14:05:23.000 Starting script Scripts\\engine 0.prc',
+                 '2018/12/14 14:05:24.000 Starting script   Scripts\\sci_mode.prc',
+                 '2018/12/14 14:05:25.000 Closing file tlm_packets_1.out',
+                 '2018/12/14 14:05:26.000 Opened file C:\\Hydra\\tlm_packets_2.out',
+                 '2018/12/14 14:05:27.000 Sending command MINXSS_NOOP',
+                 '2018/12/14 14:05:28.000 Canceling deployment retry',
+                 'cmdTry: 2']:
+        counter.parse_line(line)
+    assert counter.cmdCount == 2
+    assert list(counter.scripts) == ['Scripts\\sci_mode.prc', 'New C:\\Hydra\\tlm_packets_2.out', 'cancel_ant_deploy_retry']
+
+    counter.parse_line('Starting script Scripts\\playback.prc')
+    assert list(counter.scripts)[0] == 'New C:\\Hydra\\tlm_packets_2.out'
+    assert counter.display_text() == ('Test Station\n\nCommand Counter: 2\n\nScripts Ran:'
+                                      '\nNew C:\\Hydra\\tlm_packets_2.out\ncancel_ant_deploy_retry\nScripts\\playback.prc')
+
+
+def write_ini(filename, rundirs_dir, display=True):
+    with open(filename, 'w') as f:
+        f.write('[station]\nstation_label = Test Station\nrundirs_dir = ' + rundirs_dir + '\n')
+        if display:
+            f.write('[display]\nwidth = 250\nheight = 500\nx = 0\ny = 720\nrefresh_ms = 100\nmax_scripts_shown = 30\n')
+        f.write('[script_ignore]\nignore_1 = engine 0\nignore_2 = _bct\n')
+
+
+def test_config(tmp_path):
+    ini_filename = str(tmp_path / 'command_counter_test.ini')
+    write_ini(ini_filename, str(tmp_path))
+    cfg = CommandCounterConfig(ini_filename)
+    assert cfg.station_label == 'Test Station' and cfg.rundirs_dir == str(tmp_path)
+    assert (cfg.width, cfg.height, cfg.x, cfg.y, cfg.refresh_ms, cfg.max_scripts_shown) == (250, 500, 0, 720, 100, 30)
+    assert cfg.ignore_patterns == ['engine 0', '_bct']
+
+    write_ini(ini_filename, str(tmp_path), display=False)
+    with pytest.raises(SystemExit):
+        CommandCounterConfig(ini_filename)
+    write_ini(ini_filename, str(tmp_path / 'missing'))
+    with pytest.raises(SystemExit):
+        CommandCounterConfig(ini_filename)
+
+
+def append(filename, data):
+    with open(filename, 'ab') as f:
+        f.write(data)
+
+
+# HYDRA can add files faster than the directory mtime ticks over, so move it on by hand
+def touch_dir(path, step):
+    mtime_ns = os.stat(path).st_mtime_ns + step * 1000000000
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_tail_partial_lines(tmp_path):
+    eventlog = str(tmp_path / 'EventLog_2018_348_14_05_22.txt')
+    append(eventlog, b'line 1\r\nline 2\r\nline ')
+    tail = EventLogTail(str(tmp_path))
+    assert tail.read_new_lines() == [['line 1', 'line 2'], 0]
+    assert tail.read_new_lines() == [[], 0]
+    append(eventlog, b'3 continued')
+    assert tail.read_new_lines() == [[], 0]
+    append(eventlog, b'\r\nline 4\r\n')
+    assert tail.read_new_lines() == [['line 3 continued', 'line 4'], 0]
+
+
+def test_tail_rewritten_log(tmp_path):
+    eventlog = str(tmp_path / 'EventLog_2018_348_14_05_22.txt')
+    append(eventlog, b'line 1\nline 2\npartial')
+    tail = EventLogTail(str(tmp_path))
+    tail.read_new_lines()
+    with open(eventlog, 'wb') as f:
+        f.write(b'new 1\n')
+    assert tail.read_new_lines() == [['new 1'], 1]
+
+
+def test_tail_new_logfile(tmp_path):
+    old_eventlog = str(tmp_path / 'EventLog_2018_348_14_05_22.txt')
+    append(old_eventlog, b'old 1\nold ')
+    tail = EventLogTail(str(tmp_path))
+    assert tail.read_new_lines() == [['old 1'], 0]
+    # HYDRA finishes the old file and starts a new one between reads; nothing from the old one is lost
+    append(old_eventlog, b'2\nold 3\nold last')
+    append(str(tmp_path / 'EventLog_2018_348_15_00_00.txt'), b'new 1\nnew ')
+    touch_dir(str(tmp_path), 1)
+    assert tail.read_new_lines() == [['old 2', 'old 3', 'old last', 'new 1'], 0]
+    assert tail.filename.endswith('EventLog_2018_348_15_00_00.txt')
+    append(str(tmp_path / 'EventLog_2018_348_15_00_00.txt'), b'2\n')
+    assert tail.read_new_lines() == [['new 2'], 0]
+
+
+def test_counter_counts_across_logfiles(tmp_path):
+    rundirs_dir = tmp_path / 'Rundirs'
+    rundir = rundirs_dir / '2018_348_14_05_22'
+    rundir.mkdir(parents=True)
+    append(str(rundir / 'EventLog_1.txt'), b'Sending command A\n')
+    counter = CommandCounter(make_cfg(str(rundirs_dir)))
+    counter.update()
+    append(str(rundir / 'EventLog_1.txt'), b'Sending command B\nSending command C\n')
+    append(str(rundir / 'EventLog_2.txt'), b'Sending command D\n')
+    touch_dir(str(rundir), 1)
+    counter.update()
+    assert counter.cmdCount == 4
+
+
+def test_missing_logfile(tmp_path):
+    assert EventLogTail(str(tmp_path)).read_new_lines() == [[], 0]
+
+
+def test_counter_follows_newest_rundir(tmp_path):
+    rundirs_dir = tmp_path / 'Rundirs'
+    (rundirs_dir / '2018_348_14_05_22').mkdir(parents=True)
+    append(str(rundirs_dir / '2018_348_14_05_22' / 'EventLog_1.txt'), b'Sending command A\nSending command B\n')
+    counter = CommandCounter(make_cfg(str(rundirs_dir)))
+    counter.update()
+    assert counter.cmdCount == 2
+
+    (rundirs_dir / '2018_348_15_00_00').mkdir()
+    append(str(rundirs_dir / '2018_348_15_00_00' / 'EventLog_1.txt'), b'Starting script Scripts\\a.prc\n')
+    touch_dir(str(rundirs_dir), 1)
+    counter.update()
+    assert counter.rundir == str(rundirs_dir / '2018_348_15_00_00')
+    assert counter.cmdCount == 0 and list(counter.scripts) == ['Scripts\\a.prc']